@@ -0,0 +1,111 @@
+# Simulated browser sessions for the benchmarks.
+#
+# A `Client` sends events through `reflex.app.process`, the same path the
+# websocket handler takes, against the app's own state manager (in memory,
+# or Redis when REDIS_URL is set). Events a handler returns are sent next,
+# as the browser would, and background tasks an event starts are waited
+# for, so `fire` times what a user waits for.
+
+import asyncio
+import contextvars
+import time
+from typing import Optional
+
+import dill
+from reflex.app import App, process
+from reflex.event import Event
+from reflex.state import BaseState, State, StateUpdate
+
+
+_client: contextvars.ContextVar[Optional["Client"]] = contextvars.ContextVar(
+    "client", default=None
+)
+
+
+def _task_factory(loop, coro, **kwargs):
+    # Tasks inherit the context of the code creating them, so the client an
+    # event came from is known for the background tasks it starts ...
+    task = asyncio.Task(coro, loop=loop, **kwargs)
+    client = _client.get()
+    if client is not None:
+        client.tasks.add(task)
+    return task
+
+
+class Inbox:
+    # Stands in for the socket.io namespace: counts the updates and bytes
+    # the app would send to each browser.
+
+    def __init__(self):
+        self.updates = 0
+        self.bytes = 0
+
+    async def emit_update(self, update: StateUpdate, sid: str):
+        self.updates += 1
+        self.bytes += len(update.json())
+
+
+def tree(state: BaseState) -> list[BaseState]:
+    states = [state]
+    for substate in state.substates.values():
+        states += tree(substate)
+    return states
+
+
+def pickled(state: BaseState) -> int:
+    # Bytes of one substate as StateManagerRedis writes it ...
+    return len(dill.dumps(state, byref=True))
+
+
+def attach(app: App) -> Inbox:
+    # Set the app up as the backend does on startup, with an inbox in place
+    # of the websocket server ...
+    app._enable_state()
+    app.event_namespace = Inbox()
+    asyncio.get_running_loop().set_task_factory(_task_factory)
+    return app.event_namespace
+
+
+class Client:
+    def __init__(self, app: App, token: str):
+        self.app = app
+        self.token = token
+        self.tasks: set[asyncio.Task] = set()
+        self.updates = 0
+        self.bytes = 0
+
+    async def fire(self, state_cls: type[BaseState], handler: str, **payload) -> float:
+        started = time.perf_counter()
+        reset = _client.set(self)
+        try:
+            pending = [
+                Event(
+                    token=self.token,
+                    name=f"{state_cls.get_full_name()}.{handler}",
+                    payload=payload,
+                )
+            ]
+            while pending:
+                event = pending.pop(0)
+                event.router_data = {"pathname": "/", "query": {}}
+                async for update in process(
+                    self.app, event, self.token, {}, "127.0.0.1"
+                ):
+                    self.updates += 1
+                    self.bytes += len(update.json())
+                    pending += update.events
+                while self.tasks:
+                    await asyncio.gather(*self.tasks, return_exceptions=True)
+                    self.tasks = {task for task in self.tasks if not task.done()}
+        finally:
+            _client.reset(reset)
+        return time.perf_counter() - started
+
+    async def root(self) -> State:
+        return await self.app.state_manager.get_state(
+            f"{self.token}_{State.get_full_name()}"
+        )
+
+    async def state(self, state_cls: type[BaseState]) -> BaseState:
+        root = await self.root()
+        return root.get_substate(state_cls.get_full_name().split(".")[1:])
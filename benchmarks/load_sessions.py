@@ -0,0 +1,182 @@
+# Concurrent sessions per core across several backend workers.
+#
+#     python -m benchmarks.load_sessions --workers 2 --sessions 20,50,100
+#
+# Starts the stand-in upstream and, unless REDIS_URL points at a real one,
+# the Redis stand-in, then for each `--sessions` step runs `--workers`
+# processes. Each plays its share of the sessions through the app's event
+# path against the shared Redis state manager, the way sticky routing pins
+# a browser to one backend. A session loads `--rows` rows, then pages,
+# sorts, searches and opens rows with about `--think` ms between events
+# for `--seconds`. Reported per step:
+#
+# - events/s: events handled by all workers together
+# - p50/p95/p99: interaction latency in ms, loads are reported apart
+# - cores: CPU seconds the workers used per second of wall time
+# - per core: sessions divided by cores, for steps whose p95 stays under
+#   `--p95`
+#
+# The stand-ins run in this process and are not counted in `cores`.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from benchmarks.standin import RedisStandin, build_server
+from leomaine.backend.batch import percentile
+
+
+# what a session does after loading its rows, one step per event ...
+SCRIPT = [
+    ("next", {}),
+    ("next", {}),
+    ("sort_by", {"column": "score"}),
+    ("display_selected_row", {"index": 2}),
+    ("search", {"text": "user 3"}),
+    ("previous", {}),
+    ("search", {"text": ""}),
+    ("sort_by", {"column": "title"}),
+]
+
+
+async def _play(worker: int, sessions: int, url: str, args: dict) -> dict:
+    # Imported here, the app reads REDIS_URL when it is loaded ...
+    from benchmarks.client import Client, attach
+    from leomaine.backend.http_pool import http_pool
+    from leomaine.leomaine import app
+    from leomaine.queries import QueryAPI, QueryState
+
+    inbox = attach(app)
+    run = uuid.uuid4().hex[:8]
+    clients = [Client(app, f"load-{run}-{worker}-{i}") for i in range(sessions)]
+    loads, events = [], []
+    think = args["think"] / 1000
+
+    async def session(client: Client, deadline: float):
+        await client.fire(QueryState, "set_req_url", value=url)
+        loads.append(await client.fire(QueryAPI, "run_request"))
+        step = random.randrange(len(SCRIPT))
+        while time.monotonic() < deadline:
+            await asyncio.sleep(think * random.uniform(0.5, 1.5))
+            handler, payload = SCRIPT[step % len(SCRIPT)]
+            events.append(await client.fire(QueryAPI, handler, **payload))
+            step += 1
+
+    # One session first, so compiling the state tree isn't timed ...
+    warm = Client(app, f"load-{run}-{worker}-warm")
+    await warm.fire(QueryState, "set_req_url", value=url)
+    await warm.fire(QueryAPI, "run_request")
+
+    cpu, started = time.process_time(), time.monotonic()
+    deadline = started + args["seconds"]
+    await asyncio.gather(*(session(client, deadline) for client in clients))
+    wall = time.monotonic() - started
+    await http_pool.aclose()
+    return {
+        "loads": loads,
+        "events": events,
+        "cpu": time.process_time() - cpu,
+        "wall": wall,
+        "updates": inbox.updates,
+        "bytes": inbox.bytes,
+    }
+
+
+def _worker(worker: int, sessions: int, url: str, redis_url: str, args: dict):
+    os.environ["REDIS_URL"] = redis_url
+    os.environ["LEOMAINE_HISTORY_DB"] = args["history"]
+    return asyncio.run(_play(worker, sessions, url, args))
+
+
+async def _step(sessions: int, url: str, redis_url: str, args: dict) -> dict:
+    workers = min(args["workers"], sessions)
+    shares = [sessions // workers + (i < sessions % workers) for i in range(workers)]
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(workers, mp_context=get_context("spawn")) as pool:
+        results = await asyncio.gather(
+            *(
+                loop.run_in_executor(pool, _worker, i, share, url, redis_url, args)
+                for i, share in enumerate(shares)
+            )
+        )
+
+    events = sorted(took for result in results for took in result["events"])
+    loads = sorted(took for result in results for took in result["loads"])
+    wall = max(result["wall"] for result in results)
+    cores = sum(result["cpu"] for result in results) / wall
+    p95 = percentile(events, 0.95) * 1000
+    fits = p95 <= args["p95"] and cores
+    return {
+        "sessions": sessions,
+        "events_per_s": round(len(events) / wall, 1),
+        "p50_ms": round(percentile(events, 0.50) * 1000, 2),
+        "p95_ms": round(p95, 2),
+        "p99_ms": round(percentile(events, 0.99) * 1000, 2),
+        "load_p95_ms": round(percentile(loads, 0.95) * 1000, 2),
+        "cores": round(cores, 2),
+        "per_core": round(sessions / cores, 1) if fits else None,
+    }
+
+
+async def main(args: dict) -> list[dict]:
+    upstream = await build_server(delay=0).start("127.0.0.1", 0)
+    port = upstream.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/rows?count={args['rows']}&text={args['text']}"
+
+    redis = None
+    redis_url = os.environ.get("REDIS_URL")
+    if not redis_url:
+        redis = await RedisStandin().start("127.0.0.1", 0)
+        redis_url = f"redis://127.0.0.1:{redis.sockets[0].getsockname()[1]}"
+
+    print(f"{args['workers']} workers, state in {redis_url}")
+    print(
+        f"{'sessions':>8}{'events/s':>10}{'p50':>9}{'p95':>9}{'p99':>9}"
+        f"{'load p95':>10}{'cores':>7}{'per core':>10}"
+    )
+    steps = []
+    for sessions in args["sessions"]:
+        step = await _step(sessions, url, redis_url, args)
+        steps.append(step)
+        per_core = "-" if step["per_core"] is None else step["per_core"]
+        print(
+            f"{sessions:>8}{step['events_per_s']:>10}{step['p50_ms']:>9}"
+            f"{step['p95_ms']:>9}{step['p99_ms']:>9}{step['load_p95_ms']:>10}"
+            f"{step['cores']:>7}{per_core:>10}"
+        )
+
+    upstream.close()
+    if redis is not None:
+        redis.close()
+    return steps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument(
+        "--sessions",
+        type=lambda value: [int(part) for part in value.split(",")],
+        default=[10, 25, 50],
+        help="comma separated session counts, one step each",
+    )
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--think", type=float, default=500, help="ms between events")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--text", type=int, default=80, help="characters per body")
+    parser.add_argument("--p95", type=float, default=100, help="ms target for p95")
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = vars(parser.parse_args())
+    with tempfile.TemporaryDirectory() as scratch:
+        # The workers share one history database, as backends on a host do ...
+        args["history"] = os.path.join(scratch, "history.db")
+        results = asyncio.run(main(args))
+    if args["json"]:
+        print(json.dumps(results, indent=2))
@@ -0,0 +1,487 @@
+import argparse
+import asyncio
+import fnmatch
+import functools
+import json
+import re
+import time
+from typing import AsyncIterator, Awaitable, Callable, Optional, Union
+from urllib.parse import parse_qsl, urlsplit
+
+
+# Small stdlib HTTP/1.1 server standing in for the services Leomaine talks
+# to (a JSON API, Ollama, Kong's ai-proxy route), plus a Redis for the
+# shared state manager, so everything can be exercised offline:
+#
+#     python -m benchmarks.standin --port 11434 --redis-port 6379
+
+
+class Request:
+    def __init__(self, method: str, target: str, headers: dict[str, str], body: bytes):
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path
+        self.query = dict(parse_qsl(parts.query))
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body or b"null")
+
+
+class Response:
+    # `body` is either the whole payload or an async iterator of chunks,
+    # which is sent with chunked transfer encoding.
+
+    def __init__(
+        self,
+        body: Union[bytes, str, AsyncIterator[bytes]] = b"",
+        status: int = 200,
+        headers: Optional[dict[str, str]] = None,
+        content_type: str = "application/json",
+    ):
+        self.body = body.encode() if isinstance(body, str) else body
+        self.status = status
+        self.headers = {"Content-Type": content_type, **(headers or {})}
+
+    @classmethod
+    def json(cls, payload, status: int = 200, headers: Optional[dict] = None):
+        return cls(json.dumps(payload), status, headers)
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+class StandinServer:
+    def __init__(self):
+        self.routes: list[tuple[str, str, Handler]] = []
+
+    def route(self, method: str, prefix: str):
+        def register(handler: Handler) -> Handler:
+            self.routes.append((method, prefix, handler))
+            return handler
+
+        return register
+
+    def _match(self, request: Request) -> Optional[Handler]:
+        for method, prefix, handler in self.routes:
+            if method in (request.method, "*") and request.path.startswith(prefix):
+                return handler
+        return None
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    return
+                method, target, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while (header := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+
+                request = Request(method, target, headers, body)
+                handler = self._match(request)
+                response = (
+                    await handler(request)
+                    if handler
+                    else Response.json({"error": "not found"}, 404)
+                )
+                await self._write(writer, response)
+                if headers.get("connection", "").lower() == "close":
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+        finally:
+            writer.close()
+
+    async def _write(self, writer: asyncio.StreamWriter, response: Response):
+        head = [f"HTTP/1.1 {response.status} Standin"]
+        head += [f"{name}: {value}" for name, value in response.headers.items()]
+        if isinstance(response.body, bytes):
+            head.append(f"Content-Length: {len(response.body)}")
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + response.body)
+            await writer.drain()
+            return
+
+        head.append("Transfer-Encoding: chunked")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode())
+        async for chunk in response.body:
+            writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+        return await asyncio.start_server(self._handle, host, port)
+
+
+def _reply_for(messages: list[dict]) -> str:
+    question = next(
+        (m.get("content", "") for m in reversed(messages) if m.get("role") == "user"),
+        "",
+    )
+    return (
+        f"This is the offline stand-in model. You asked: {question.strip()!r}. "
+        "Connect a real Ollama or Kong upstream for actual answers."
+    )
+
+
+def _plan_for(messages: list[dict]) -> str:
+    # Crude stand-in for structured output: method, "user N" and "N per page"
+    question = next(
+        (m.get("content", "") for m in reversed(messages) if m.get("role") == "user"),
+        "",
+    ).lower()
+    method = next(
+        (m for m in ("post", "put", "patch", "delete") if m in question.split()),
+        "get",
+    )
+    user = re.search(r"user (\d+)", question)
+    limit = re.search(r"(\d+) (?:per|a) page", question)
+    return json.dumps(
+        {
+            "method": method.upper(),
+            "url": "",
+            "params": {"userId": user.group(1)} if user else {},
+            "headers": {},
+            "body": {},
+            "limit": int(limit.group(1)) if limit else None,
+        }
+    )
+
+
+def add_llm_routes(server: StandinServer, delay: float = 0.02):
+    # Ollama's /api/chat (NDJSON) and Kong's llm/v1/chat (OpenAI style SSE) ...
+
+    async def tokens(text: str) -> AsyncIterator[str]:
+        for word in text.split(" "):
+            await asyncio.sleep(delay)
+            yield word + " "
+
+    @server.route("POST", "/api/chat")
+    async def ollama_chat(request: Request) -> Response:
+        payload = request.json() or {}
+        reply = _plan_for if payload.get("format") == "json" else _reply_for
+        text = reply(payload.get("messages", []))
+        if not payload.get("stream", True):
+            return Response.json(
+                {"message": {"role": "assistant", "content": text}, "done": True}
+            )
+
+        async def body():
+            async for token in tokens(text):
+                chunk = {"message": {"role": "assistant", "content": token}}
+                yield (json.dumps({**chunk, "done": False}) + "\n").encode()
+            last = {"message": {"content": ""}, "done": True}
+            yield (json.dumps(last) + "\n").encode()
+
+        return Response(body(), content_type="application/x-ndjson")
+
+    @server.route("POST", "/")
+    async def openai_chat(request: Request) -> Response:
+        payload = request.json() or {}
+        reply = _plan_for if payload.get("response_format") else _reply_for
+        text = reply(payload.get("messages", []))
+        created = int(time.time())
+        if not payload.get("stream"):
+            return Response.json(
+                {
+                    "object": "chat.completion",
+                    "created": created,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": text},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                }
+            )
+
+        async def body():
+            async for token in tokens(text):
+                chunk = {
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "choices": [
+                        {"index": 0, "delta": {"content": token}, "finish_reason": None}
+                    ],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n".encode()
+            yield b"data: [DONE]\n\n"
+
+        return Response(body(), content_type="text/event-stream")
+
+
+def make_rows(count: int, offset: int = 0, text: int = 80) -> list[dict]:
+    # Deterministic rows shaped like the jsonplaceholder posts, with `text`
+    # characters of body each ...
+    return [
+        {
+            "userId": i % 10 + 1,
+            "id": i + 1,
+            "title": f"post {i + 1} by user {i % 10 + 1}",
+            "body": (f"body of post {i + 1} " * (text // 12 + 1))[:text],
+            "score": round((i * 7919 % 1000) / 10, 1),
+            "published": i % 3 != 0,
+        }
+        for i in range(offset, offset + count)
+    ]
+
+
+def make_nested_rows(count: int, offset: int = 0, text: int = 80) -> list[dict]:
+    # The same rows with an author object two levels deep, a list of tags
+    # and the counters grouped, for the flattening and nested column paths ...
+    return [
+        {
+            "id": row["id"],
+            "title": row["title"],
+            "author": {
+                "id": row["userId"],
+                "name": f"user {row['userId']}",
+                "address": {
+                    "city": f"city {row['userId'] % 4}",
+                    "geo": {"lat": row["score"] - 50, "lng": 50 - row["score"]},
+                },
+            },
+            "tags": [f"tag{row['id'] % 7}", f"tag{row['id'] % 11}"],
+            "stats": {"score": row["score"], "published": row["published"]},
+            "body": row["body"],
+        }
+        for row in make_rows(count, offset, text)
+    ]
+
+
+@functools.lru_cache(maxsize=4)
+def _rows_body(count: int, offset: int, text: int, shape: str) -> bytes:
+    # The rows are deterministic, so the encoded body of the last few asked
+    # for is kept, and large ones cost the stand-in nothing the second time ...
+    make = make_nested_rows if shape == "nested" else make_rows
+    return json.dumps(make(count, offset, text)).encode()
+
+
+def add_data_routes(server: StandinServer):
+    # GET /rows?count=N&offset=M&text=T&shape=S answers a JSON array of N
+    # generated rows, flat or (shape=nested) with nested objects, cacheable
+    # for `max_age` seconds if given ...
+
+    @server.route("GET", "/rows")
+    async def rows(request: Request) -> Response:
+        count = int(request.query.get("count", 100))
+        offset = int(request.query.get("offset", 0))
+        text = int(request.query.get("text", 80))
+        shape = request.query.get("shape", "flat")
+        headers = {}
+        if "max_age" in request.query:
+            headers["Cache-Control"] = f"max-age={int(request.query['max_age'])}"
+        return Response(_rows_body(count, offset, text, shape), headers=headers)
+
+
+def add_paged_routes(server: StandinServer):
+    # GET /pages?style=S&total=N&size=M answers N generated rows, M per page,
+    # paginated the way style S says:
+    #
+    # - page: `page=K` (from 1), a plain array per page
+    # - offset: `offset=K`, a plain array per page
+    # - link: an array plus a `Link: rel="next"` header with an opaque token
+    # - cursor: {"data": [...], "meta": {"next_cursor": ...}}, `cursor=...`
+
+    @server.route("GET", "/pages")
+    async def pages(request: Request) -> Response:
+        query = request.query
+        style = query.get("style", "page")
+        total = int(query.get("total", 1000))
+        size = int(query.get("size", 100))
+        if style == "page":
+            start = (int(query.get("page", 1)) - 1) * size
+        elif style == "offset":
+            start = int(query.get("offset", 0))
+        else:
+            token = query.get("cursor") or query.get("token") or ""
+            start = int(token[1:]) if token.startswith("c") else 0
+        rows = make_rows(max(min(size, total - start), 0), start)
+        after = start + size
+        if style == "cursor":
+            cursor = f"c{after}" if after < total else None
+            return Response.json({"data": rows, "meta": {"next_cursor": cursor}})
+        headers = {}
+        if style == "link" and after < total:
+            next_url = f"/pages?style=link&total={total}&size={size}&token=c{after}"
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        return Response.json(rows, headers=headers)
+
+
+def _resp(value) -> bytes:
+    # One RESP2 reply: None is the nil bulk string, str a status line ...
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, Exception):
+        return f"-ERR {value}\r\n".encode()
+    if isinstance(value, str):
+        return f"+{value}\r\n".encode()
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    return b"*%d\r\n" % len(value) + b"".join(_resp(item) for item in value)
+
+
+class RedisStandin:
+    # In-memory server speaking enough of the Redis protocol for Reflex's
+    # StateManagerRedis: GET, SET with EX/PX/NX, EXISTS, DEL, key expiry and
+    # keyspace notifications through PSUBSCRIBE, which lock waiters listen
+    # on. Lets several backend workers share state without a Redis install.
+
+    def __init__(self):
+        self.data: dict[bytes, tuple[bytes, Optional[float]]] = {}
+        self.subscribers: dict[asyncio.StreamWriter, set[str]] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def _alive(self, key: bytes) -> bool:
+        entry = self.data.get(key)
+        if entry is None:
+            return False
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            self._notify(key, b"expired")
+            return False
+        return True
+
+    def _notify(self, key: bytes, event: bytes):
+        channel = f"__keyspace@0__:{key.decode('latin-1')}"
+        for writer, patterns in self.subscribers.items():
+            for pattern in patterns:
+                if fnmatch.fnmatchcase(channel, pattern):
+                    message = [b"pmessage", pattern.encode(), channel.encode(), event]
+                    writer.write(_resp(message))
+
+    async def _sweep(self):
+        # Expire keys nobody reads, so their waiters hear about it ...
+        while True:
+            await asyncio.sleep(0.05)
+            for key in list(self.data):
+                self._alive(key)
+
+    def _set(self, key: bytes, value: bytes, options: list[bytes]):
+        expires, only_new = None, False
+        words = iter(options)
+        for word in words:
+            word = word.upper()
+            if word == b"EX":
+                expires = time.monotonic() + int(next(words))
+            elif word == b"PX":
+                expires = time.monotonic() + int(next(words)) / 1000
+            elif word == b"NX":
+                only_new = True
+        if only_new and self._alive(key):
+            return None
+        self.data[key] = (value, expires)
+        self._notify(key, b"set")
+        return "OK"
+
+    def _pubsub(self, writer, command: bytes, patterns: list[bytes]) -> list:
+        subscribed = self.subscribers.setdefault(writer, set())
+        replies = []
+        if command == b"PSUBSCRIBE":
+            for pattern in patterns:
+                subscribed.add(pattern.decode("latin-1"))
+                replies.append([b"psubscribe", pattern, len(subscribed)])
+        else:
+            for pattern in patterns or [p.encode("latin-1") for p in subscribed]:
+                subscribed.discard(pattern.decode("latin-1"))
+                replies.append([b"punsubscribe", pattern, len(subscribed)])
+            if not replies:
+                replies.append([b"punsubscribe", None, 0])
+        return replies
+
+    def _run(self, writer, args: list[bytes]) -> list:
+        command, args = args[0].upper(), args[1:]
+        if command in (b"PSUBSCRIBE", b"PUNSUBSCRIBE"):
+            return self._pubsub(writer, command, args)
+        if command == b"GET":
+            reply = self.data[args[0]][0] if self._alive(args[0]) else None
+        elif command == b"SET":
+            reply = self._set(args[0], args[1], args[2:])
+        elif command == b"EXISTS":
+            reply = sum(self._alive(key) for key in args)
+        elif command == b"DEL":
+            reply = 0
+            for key in args:
+                if self._alive(key):
+                    del self.data[key]
+                    self._notify(key, b"del")
+                    reply += 1
+        elif command == b"PING":
+            reply = [b"pong", b""] if self.subscribers.get(writer) else "PONG"
+        elif command in (b"FLUSHDB", b"FLUSHALL"):
+            self.data.clear()
+            reply = "OK"
+        elif command in (b"CLIENT", b"CONFIG", b"SELECT"):
+            reply = [] if args and args[0].upper() == b"GET" else "OK"
+        else:
+            reply = ValueError(f"unknown command '{command.decode('latin-1')}'")
+        return [reply]
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        try:
+            while line := await reader.readline():
+                if line[:1] != b"*":
+                    args = line.split()
+                else:
+                    args = []
+                    for _ in range(int(line[1:])):
+                        size = int((await reader.readline())[1:])
+                        args.append((await reader.readexactly(size + 2))[:-2])
+                if args:
+                    for reply in self._run(writer, args):
+                        writer.write(_resp(reply))
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+        except asyncio.CancelledError:
+            # The stand-in is shutting down with clients still connected ...
+            return
+        finally:
+            self.subscribers.pop(writer, None)
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep())
+        return await asyncio.start_server(self._handle, host, port)
+
+
+def build_server(delay: float = 0.02) -> StandinServer:
+    server = StandinServer()
+    add_data_routes(server)
+    add_paged_routes(server)
+    add_llm_routes(server, delay)
+    return server
+
+
+async def _serve(host: str, port: int, delay: float, redis_port: Optional[int]):
+    server = await build_server(delay).start(host, port)
+    print(f"Stand-in listening on http://{host}:{port}")
+    if redis_port is not None:
+        await RedisStandin().start(host, redis_port)
+        print(f"Redis stand-in listening on redis://{host}:{redis_port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline stand-in upstreams.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--delay", type=float, default=0.02)
+    parser.add_argument("--redis-port", type=int, help="also serve a Redis stand-in")
+    args = parser.parse_args()
+    asyncio.run(_serve(args.host, args.port, args.delay, args.redis_port))
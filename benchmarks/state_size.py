@@ -0,0 +1,116 @@
+# Serialized state size and event round-trip time for one session.
+#
+#     python -m benchmarks.state_size --rows 5000 --events 200 --text 2000
+#
+# Loads `--rows` rows (with `--text` characters of body each) from the
+# stand-in upstream into a session, then fires the events users send most
+# (typing in the builder, paging, sorting, editing, the chat box) and
+# reports for each:
+#
+# - state: bytes of every substate the state manager would write to Redis
+#   (dill, as StateManagerRedis pickles it), summed over the whole tree
+# - written: bytes re-pickled per event, only the substates it touched
+# - delta: bytes of the JSON delta sent to the browser
+# - ms: average time to process the event and pickle the touched states
+#
+# Runs against the in-memory state manager; the Redis cost is the pickling
+# measured here plus one network round trip per touched substate.
+
+import argparse
+import asyncio
+import json
+import time
+
+from reflex.event import Event
+from reflex.state import BaseState, State
+
+from benchmarks.client import Client, attach, pickled, tree
+from benchmarks.standin import build_server
+from leomaine.backend.http_pool import http_pool
+from leomaine.components.query_output import ChatState
+from leomaine.leomaine import app
+from leomaine.queries import QueryAPI, QueryState
+
+
+TOKEN = "benchmark-session"
+
+
+async def _fire(root: State, name: str, payload: dict) -> tuple[float, int, int]:
+    for state in tree(root):
+        state._was_touched = False
+    start = time.perf_counter()
+    delta = {}
+    async for update in root._process(Event(token=TOKEN, name=name, payload=payload)):
+        delta.update(update.delta)
+    written = sum(pickled(state) for state in tree(root) if state._get_was_touched())
+    return time.perf_counter() - start, written, len(json.dumps(delta, default=str))
+
+
+def _event_name(state_cls: type[BaseState], handler: str) -> str:
+    return f"{state_cls.get_full_name()}.{handler}"
+
+
+async def main(rows: int, events: int, text: int):
+    server = await build_server(delay=0).start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    # The rows are fetched by a background task, so the session is loaded
+    # through the app's event path ...
+    attach(app)
+    client = Client(app, TOKEN)
+    url = f"http://127.0.0.1:{port}/rows?count={rows}&text={text}"
+    await client.fire(QueryState, "add_header")
+    await client.fire(QueryState, "set_req_url", value=url)
+    await client.fire(QueryAPI, "run_request")
+    root = await client.root()
+    builder = root.get_substate(QueryAPI.get_full_name().split(".")[1:])
+    header = dict(builder.headers[0])
+    size = sum(pickled(state) for state in tree(root))
+    print(f"{rows} rows loaded, state {size} bytes")
+    print(f"{'event':<16}{'written':>10}{'delta':>10}{'ms':>10}")
+
+    cases = [
+        ("type header", QueryState, "update_value", lambda i: {
+            "value": "x" * (i % 40), "data": header}),
+        ("next page", QueryAPI, "next", lambda i: {}),
+        ("sort", QueryAPI, "sort_by", lambda i: {"column": ["id", "title"][i % 2]}),
+        ("open row", QueryAPI, "display_selected_row", lambda i: {"index": i % 5}),
+        ("edit cell", QueryAPI, "update_data", lambda i: {
+            "value": "t" * (i % 40), "data": ["title", ""]}),
+        ("type chat", ChatState, "set_user_query", lambda i: {"value": "q" * i}),
+    ]
+    results = {"rows": rows, "state_bytes": size, "events": {}}
+    for label, state_cls, handler, payload in cases:
+        name = _event_name(state_cls, handler)
+        elapsed = written = delta = 0
+        for number in range(events):
+            took, wrote, sent = await _fire(root, name, payload(number))
+            elapsed += took
+            written += wrote
+            delta += sent
+        results["events"][label] = {
+            "written": written // events,
+            "delta": delta // events,
+            "ms": round(elapsed / events * 1000, 3),
+        }
+        print(
+            f"{label:<16}{written // events:>10}{delta // events:>10}"
+            f"{elapsed / events * 1000:>10.3f}"
+        )
+
+    await http_pool.aclose()
+    server.close()
+    await server.wait_closed()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--text", type=int, default=80, help="characters per body")
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args()
+    results = asyncio.run(main(args.rows, args.events, args.text))
+    if args.json:
+        print(json.dumps(results, indent=2))
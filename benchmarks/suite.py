@@ -0,0 +1,387 @@
+# Latency, memory peak and state size of the state handlers and the request
+# pipeline, checked against stored baselines.
+#
+#     python -m benchmarks.suite --rows 1000,10000,100000 --shapes flat,nested
+#     python -m benchmarks.suite --save
+#
+# The stand-in upstream runs as its own process (so its memory isn't
+# counted) and serves synthetic JSON, flat rows or rows with nested objects.
+# For each shape and row count a session loads the rows, then every case
+# runs through two drivers:
+#
+# - pipeline: events go through `reflex.app.process` and the app's state
+#   manager, as from a browser. In memory, or Redis with `--redis` (the
+#   stand-in's, or REDIS_URL), which adds the locking and pickling
+# - direct: the handler runs on the loaded root state with
+#   `State._process`, no state manager in between. Loads are pipeline only,
+#   the fetch runs as a background task
+#
+# Reported per case:
+#
+# - p50/p95: ms per event, over `--events` untraced runs (`--loads` for loads)
+# - peak: KiB, tracemalloc peak of one more, traced run
+# - state: bytes of the whole state tree pickled afterwards
+# - delta: bytes of the update sent to the browser
+#
+# `--save` stores the results as baselines (benchmarks/baselines.json, or
+# baselines-redis.json with Redis). Otherwise they are compared with them,
+# and a p95, peak or state size more than `--tolerance` above its baseline
+# is a regression: the run lists them and exits 1. Baselines only hold for
+# the machine they were saved on, so none are committed, see "Benchmarks" in
+# the README for the workflow.
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Optional
+
+from reflex.event import Event
+
+from leomaine.backend.batch import percentile
+
+
+# baselines per state manager, Redis adds a round trip and pickling to every
+# pipeline event ...
+BASELINES = {
+    "memory": Path(__file__).with_name("baselines.json"),
+    "redis": Path(__file__).with_name("baselines-redis.json"),
+}
+
+# a case: label, state, handler, the payload of run i and the events to the
+# table sent (untimed) before run i ...
+Case = tuple[str, type, str, Callable[[int], dict], Callable[[int], list]]
+
+# numbers the edits of commit_changes across both drivers, so every commit
+# writes a value the row doesn't hold yet, rather than one a run of the other
+# driver already wrote ...
+_edits = itertools.count()
+
+
+def _cases(builder: type, table: type, header: dict) -> list[Case]:
+    return [
+        ("paginate", table, "paginate", lambda i: {}, lambda i: []),
+        ("next page", table, "next", lambda i: {}, lambda i: []),
+        (
+            "delta_limit",
+            table,
+            "delta_limit",
+            lambda i: {"limit": ["10", "50"][i % 2]},
+            lambda i: [],
+        ),
+        (
+            "sort",
+            table,
+            "sort_by",
+            lambda i: {"column": ["title", "id"][i % 2]},
+            lambda i: [],
+        ),
+        (
+            "search",
+            table,
+            "search",
+            lambda i: {"text": f"user {i % 10}" if i % 2 else ""},
+            lambda i: [],
+        ),
+        (
+            "update_attribute",
+            builder,
+            "update_attribute",
+            lambda i: {"data": header, "attribute": "value", "value": "v" * (i % 40)},
+            lambda i: [],
+        ),
+        (
+            "commit_changes",
+            table,
+            "commit_changes",
+            lambda i: {},
+            lambda i: [
+                ("display_selected_row", {"index": i % 5}),
+                (
+                    "update_data",
+                    {"value": f"edited {next(_edits)}", "data": ["title", ""]},
+                ),
+            ],
+        ),
+    ]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_standin(redis: bool) -> tuple[subprocess.Popen, int, Optional[str]]:
+    port = _free_port()
+    command = [sys.executable, "-m", "benchmarks.standin"]
+    command += ["--port", str(port), "--delay", "0"]
+    redis_url = None
+    if redis:
+        redis_port = _free_port()
+        command += ["--redis-port", str(redis_port)]
+        redis_url = f"redis://127.0.0.1:{redis_port}"
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            break
+        except OSError:
+            if time.monotonic() > deadline or process.poll() is not None:
+                process.kill()
+                raise RuntimeError("the stand-in upstream didn't start")
+            time.sleep(0.1)
+    return process, port, redis_url
+
+
+def _summary(took: list[float], peak: int, state: int, delta: int) -> dict:
+    ordered = sorted(took)
+    return {
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "peak_kib": round(peak / 1024, 1),
+        "state_bytes": state,
+        "delta_bytes": delta,
+    }
+
+
+async def _timed(send, traced: bool) -> tuple[float, int, int]:
+    # Time one event and, if `traced`, its tracemalloc peak above what was
+    # allocated when it started. `send` answers the delta bytes ...
+    if traced:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        delta = await send()
+        took = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        if traced:
+            tracemalloc.stop()
+    return took, max(peak, 0), delta
+
+
+def _event_name(state_cls: type, handler: str) -> str:
+    return f"{state_cls.get_full_name()}.{handler}"
+
+
+async def _session(app, url: str, shape: str, rows: int, args: dict) -> dict:
+    from benchmarks.client import Client, pickled, tree
+    from leomaine.backend.store import result_store
+    from leomaine.queries import QueryAPI, QueryState
+
+    token = f"suite-{shape}-{rows}"
+    client = Client(app, token)
+    await client.fire(QueryState, "add_header")
+    await client.fire(QueryState, "set_req_url", value=url)
+    await client.fire(QueryAPI, "run_request")
+    root = await client.root()
+    loaded = root.get_substate(QueryAPI.get_full_name().split(".")[1:])
+    if loaded.request_error or not loaded.number_of_rows:
+        raise RuntimeError(f"loading {url} failed: {loaded.request_error}")
+    header = dict(loaded.headers[0])
+
+    async def state_bytes() -> int:
+        return sum(pickled(state) for state in tree(await client.root()))
+
+    async def fire(state_cls: type, handler: str, payload: dict) -> int:
+        sent = client.bytes
+        await client.fire(state_cls, handler, **payload)
+        return client.bytes - sent
+
+    async def pipeline(case: Case, i: int, traced: bool):
+        _, state_cls, handler, payload, steps = case
+        for name, step in steps(i):
+            await client.fire(QueryAPI, name, **step)
+        return await _timed(lambda: fire(state_cls, handler, payload(i)), traced)
+
+    async def direct(case: Case, i: int, traced: bool):
+        _, state_cls, handler, payload, steps = case
+        root = await client.root()
+        for name, step in steps(i):
+            event = Event(token=token, name=_event_name(QueryAPI, name), payload=step)
+            async for _ in root._process(event):
+                pass
+
+        async def process() -> int:
+            name = _event_name(state_cls, handler)
+            delta = {}
+            async for update in root._process(
+                Event(token=token, name=name, payload=payload(i))
+            ):
+                delta.update(update.delta)
+            return len(json.dumps(delta, default=str))
+
+        return await _timed(process, traced)
+
+    # A fresh URL per load, so the response cache doesn't answer it, or the
+    # same one again, so it does (the stand-in marks the rows cacheable) ...
+    async def load(case: Case, i: int, traced: bool):
+        fresh = case[0] == "load"
+        await client.fire(
+            QueryState, "set_req_url", value=f"{url}&run={i}" if fresh else url
+        )
+        return await _timed(lambda: fire(QueryAPI, "run_request", {}), traced)
+
+    results = {}
+
+    async def measure(key: str, runs: int, run, case: Case):
+        took = [(await run(case, i, False))[0] for i in range(runs)]
+        _, peak, delta = await run(case, runs, True)
+        results[key] = _summary(took, peak, await state_bytes(), delta)
+
+    for label in ("load", "load cached"):
+        case = (label, QueryAPI, "run_request", lambda i: {}, lambda i: [])
+        await measure(f"pipeline/{label}", args["loads"], load, case)
+    for case in _cases(QueryState, QueryAPI, header):
+        for driver, run in (("pipeline", pipeline), ("direct", direct)):
+            await measure(f"{driver}/{case[0]}", args["events"], run, case)
+
+    result_store.drop(token)
+    return results
+
+
+async def run(args: dict) -> dict:
+    own_redis = args["redis"] and not os.environ.get("REDIS_URL")
+    process, port, redis_url = _start_standin(own_redis)
+    if redis_url:
+        os.environ["REDIS_URL"] = redis_url
+    # Imported here, the app reads REDIS_URL when it is loaded ...
+    from benchmarks.client import attach
+    from leomaine.backend.http_pool import http_pool
+    from leomaine.leomaine import app
+
+    attach(app)
+    results = {}
+    try:
+        for shape in args["shapes"]:
+            for rows in args["rows"]:
+                url = (
+                    f"http://127.0.0.1:{port}/rows?count={rows}"
+                    f"&text={args['text']}&shape={shape}&max_age=600"
+                )
+                cases = await _session(app, url, shape, rows, args)
+                for case, summary in cases.items():
+                    results[f"{shape}/{rows}/{case}"] = summary
+                    _print_row(f"{shape}/{rows}/{case}", summary)
+    finally:
+        await http_pool.aclose()
+        process.terminate()
+        process.wait()
+    return results
+
+
+def _print_row(key: str, summary: dict, note: str = ""):
+    print(
+        f"{key:<44}{summary['p50_ms']:>10}{summary['p95_ms']:>10}"
+        f"{summary['peak_kib']:>10}{summary['state_bytes']:>10}"
+        f"{summary['delta_bytes']:>10}{note}"
+    )
+
+
+def _machine() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results: dict, baselines: dict, tolerance: float, floor: float) -> list:
+    # Cases slower, hungrier or larger than their baseline by more than
+    # `tolerance`. Latency moves of less than `floor` ms are noise ...
+    regressions = []
+    for key, summary in results.items():
+        base = baselines.get(key)
+        if base is None:
+            continue
+        for metric in ("p95_ms", "peak_kib", "state_bytes"):
+            limit = base[metric] * (1 + tolerance)
+            if metric == "p95_ms":
+                limit = max(limit, base[metric] + floor)
+            if summary[metric] > limit:
+                regressions.append((key, metric, base[metric], summary[metric]))
+    return regressions
+
+
+def main(args: dict) -> int:
+    print(
+        f"{'case':<44}{'p50 ms':>10}{'p95 ms':>10}{'peak KiB':>10}"
+        f"{'state':>10}{'delta':>10}"
+    )
+    with tempfile.TemporaryDirectory() as scratch:
+        os.environ["LEOMAINE_HISTORY_DB"] = os.path.join(scratch, "history.db")
+        results = asyncio.run(run(args))
+
+    manager = "redis" if args["redis"] or os.environ.get("REDIS_URL") else "memory"
+    path = Path(args["baselines"] or BASELINES[manager])
+    if args["save"]:
+        path.write_text(
+            json.dumps({"machine": _machine(), "cases": results}, indent=2) + "\n"
+        )
+        print(f"saved {len(results)} baselines to {path}")
+        return 0
+    if args["json"]:
+        print(json.dumps(results, indent=2))
+    if not path.exists():
+        print(f"no baselines in {path}, run with --save to store these")
+        return 0
+
+    stored = json.loads(path.read_text())
+    if stored.get("machine") != _machine():
+        print(f"baselines were saved on {stored.get('machine')}, compare with care")
+    regressions = compare(results, stored["cases"], args["tolerance"], args["floor"])
+    for key, metric, before, after in regressions:
+        print(f"regression: {key} {metric} {before} -> {after}")
+    if not regressions:
+        print(f"no regressions against {path}")
+    return 1 if regressions else 0
+
+
+def _counts(value: str) -> list[int]:
+    return [int(part) for part in value.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--rows",
+        type=_counts,
+        default=[1000, 10000, 100000],
+        help="comma separated row counts, up to 1000000",
+    )
+    parser.add_argument(
+        "--shapes",
+        type=lambda value: value.split(","),
+        default=["flat", "nested"],
+        help="comma separated, flat and/or nested",
+    )
+    parser.add_argument("--events", type=int, default=50, help="runs per case")
+    parser.add_argument("--loads", type=int, default=3, help="runs per load case")
+    parser.add_argument("--text", type=int, default=80, help="characters per body")
+    parser.add_argument(
+        "--redis", action="store_true", help="use the Redis state manager"
+    )
+    parser.add_argument(
+        "--baselines", help="file of baselines, one per state manager unless given"
+    )
+    parser.add_argument("--save", action="store_true", help="store as baselines")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="allowed growth, 0.25 = 25%%"
+    )
+    parser.add_argument(
+        "--floor", type=float, default=1.0, help="ms of p95 growth always allowed"
+    )
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    sys.exit(main(vars(parser.parse_args())))
@@ -0,0 +1,124 @@
+import asyncio
+import math
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Iterator, Optional
+
+import httpx
+
+
+# the request a batch fires, called with one parameter set per run ...
+Sender = Callable[[dict[str, str]], Awaitable[httpx.Response]]
+
+# the most requests one batch fires, and the most it has in flight ...
+MAX_BATCH_REQUESTS = 10_000
+MAX_BATCH_CONCURRENCY = 200
+
+# failures recorded as the sample's status instead of ending the batch: bad
+# URLs, missing upload files, unencodable bodies ...
+SEND_ERRORS = (httpx.HTTPError, httpx.InvalidURL, OSError, ValueError)
+
+
+class RateLimiter:
+    # Hands out evenly spaced start slots, `rate` per second (0 = unlimited).
+
+    def __init__(self, rate: float = 0):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(self._next, now)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    # Nearest rank: the smallest sample with at least `fraction` of the
+    # sorted samples at or below it. The product is rounded first so float
+    # noise (0.29 * 100 = 28.999...) doesn't move the rank ...
+    if not ordered:
+        return 0.0
+    rank = math.ceil(round(fraction * len(ordered), 9)) - 1
+    return ordered[min(max(rank, 0), len(ordered) - 1)]
+
+
+class BatchRun:
+    # Fires `send` once per parameter set with at most `concurrency` requests
+    # in flight, and records latency, status and size for every one of them.
+    # `concurrency` workers take the parameter sets one at a time, so only
+    # the requests in flight exist at any moment, not one per set.
+
+    def __init__(
+        self,
+        send: Sender,
+        param_sets: list[dict[str, str]],
+        concurrency: int = 10,
+        rate: float = 0,
+    ):
+        self.send = send
+        self.param_sets = param_sets
+        self.concurrency = min(max(concurrency, 1), MAX_BATCH_CONCURRENCY)
+        self.limiter = RateLimiter(rate)
+        self.samples: list[dict] = []
+        self.started = 0.0
+        self.finished: Optional[float] = None
+
+    @property
+    def total(self) -> int:
+        return len(self.param_sets)
+
+    @property
+    def completed(self) -> int:
+        return len(self.samples)
+
+    async def _fire(self, params: dict[str, str]):
+        await self.limiter.wait()
+        start = time.perf_counter()
+        try:
+            res = await self.send(params)
+            sample = {"status": str(res.status_code), "size": len(res.content)}
+        except SEND_ERRORS as error:
+            sample = {"status": type(error).__name__, "size": 0}
+        sample["latency"] = time.perf_counter() - start
+        self.samples.append(sample)
+
+    async def _worker(self, pending: Iterator[dict[str, str]]):
+        for params in pending:
+            await self._fire(params)
+
+    async def run(self):
+        pending = iter(self.param_sets)
+        self.started = time.perf_counter()
+        try:
+            await asyncio.gather(
+                *(
+                    self._worker(pending)
+                    for _ in range(min(self.concurrency, self.total))
+                )
+            )
+        finally:
+            self.finished = time.perf_counter()
+
+    def summary(self) -> dict[str, float]:
+        latencies = sorted(sample["latency"] for sample in self.samples)
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        errors = sum(
+            1 for sample in self.samples if not sample["status"].startswith(("2", "3"))
+        )
+        return {
+            "requests": self.completed,
+            "errors": errors,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+            "throughput_rps": self.completed / elapsed if elapsed > 0 else 0.0,
+            "bytes": sum(sample["size"] for sample in self.samples),
+        }
+
+    def histogram(self) -> dict[str, int]:
+        return dict(Counter(sample["status"] for sample in self.samples))
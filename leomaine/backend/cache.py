@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from leomaine.backend.shape import FLATTEN_DEPTH, RecordShaper
+from leomaine.backend.store import ResultSet
+
+
+# memory budget and optional on-disk tier for cached responses ...
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+MAX_DISK_BYTES = 512 * 1024 * 1024
+CACHE_DIR = os.environ.get("LEOMAINE_CACHE_DIR")
+
+# request headers that never change what the upstream sends back ...
+_IGNORED_HEADERS = {"cache-control", "pragma", "if-none-match", "if-modified-since"}
+
+
+def cache_key(method: str, url: str, headers: dict[str, str]) -> str:
+    # Every other request header is part of the key, the Cookie header
+    # included, so sessions sending different cookies or credentials never
+    # share a response, and whatever a response's Vary names is covered.
+    # Responses that vary on anything else aren't stored ...
+    normalized = sorted(
+        (key.strip().lower(), value.strip())
+        for key, value in headers.items()
+        if key.strip().lower() not in _IGNORED_HEADERS
+    )
+    digest = hashlib.sha256()
+    digest.update(f"{method.upper()} {url}\n".encode())
+    digest.update(json.dumps(normalized).encode())
+    return digest.hexdigest()
+
+
+def _vary_names(value: Optional[str]) -> set[str]:
+    return {name.strip().lower() for name in (value or "").split(",") if name.strip()}
+
+
+def cache_directives(value: Optional[str]) -> dict[str, Optional[str]]:
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+class CacheEntry:
+    # One cached response: the raw body (used by the disk tier), the parsed
+    # result set with the shape it was flattened to, and the validators and
+    # expiry needed to revalidate it.
+
+    def __init__(
+        self,
+        raw: bytes,
+        result: Optional[ResultSet] = None,
+        shape: Optional[RecordShaper] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        expires_at: float = 0.0,
+        must_revalidate: bool = False,
+    ):
+        self.raw = raw
+        self.result = result
+        self.shape = shape
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+        self.must_revalidate = must_revalidate
+
+    @property
+    def size(self) -> int:
+        # The parsed columns are roughly as large as the JSON they came from ...
+        return 2 * len(self.raw)
+
+    @property
+    def is_fresh(self) -> bool:
+        return not self.must_revalidate and time.time() < self.expires_at
+
+    @property
+    def can_revalidate(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+    def validators(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def refresh(self, headers: httpx.Headers):
+        # A 304 carries the new freshness lifetime and possibly new validators ...
+        fresh = CacheEntry.from_headers(self.raw, headers)
+        self.etag = fresh.etag or self.etag
+        self.last_modified = fresh.last_modified or self.last_modified
+        self.expires_at = fresh.expires_at
+        self.must_revalidate = fresh.must_revalidate
+
+    def parsed(self, depth: int = FLATTEN_DEPTH) -> tuple[ResultSet, RecordShaper]:
+        # Reshaped from the raw body when loaded from disk or asked for a
+        # different flattening depth ...
+        if self.result is None or self.shape is None or self.shape.depth != depth:
+            self.shape = RecordShaper(depth)
+            self.result = ResultSet(self.shape.records(json.loads(self.raw)))
+        return self.result.copy(), self.shape.copy()
+
+    @classmethod
+    def from_headers(
+        cls,
+        raw: bytes,
+        headers: httpx.Headers,
+        result: Optional[ResultSet] = None,
+        shape: Optional[RecordShaper] = None,
+    ) -> "CacheEntry":
+        directives = cache_directives(headers.get("cache-control"))
+        expires_at = 0.0
+        max_age = directives.get("s-maxage") or directives.get("max-age")
+        age = headers.get("age", "0")
+        if max_age and max_age.isdigit():
+            expires_at = time.time() + int(max_age) - (int(age) if age.isdigit() else 0)
+        elif headers.get("expires"):
+            try:
+                expires_at = parsedate_to_datetime(headers["expires"]).timestamp()
+            except (TypeError, ValueError):
+                expires_at = 0.0
+
+        return cls(
+            raw,
+            result,
+            shape,
+            etag=headers.get("etag"),
+            last_modified=headers.get("last-modified"),
+            expires_at=expires_at,
+            must_revalidate="no-cache" in directives,
+        )
+
+    def to_meta(self) -> dict:
+        return {
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "expires_at": self.expires_at,
+            "must_revalidate": self.must_revalidate,
+        }
+
+
+class ResponseCache:
+    # Size bounded LRU of responses in memory, with an optional directory
+    # holding raw bodies and their metadata that survives restarts.
+
+    def __init__(
+        self,
+        max_bytes: int = MAX_CACHE_BYTES,
+        disk_dir: Optional[str] = CACHE_DIR,
+        max_disk_bytes: int = MAX_DISK_BYTES,
+    ):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.total_bytes = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def is_storable(response: httpx.Response) -> bool:
+        if response.request.method not in ("GET", "HEAD"):
+            return False
+        if response.status_code != 200:
+            return False
+        directives = cache_directives(response.headers.get("cache-control"))
+        if "no-store" in directives:
+            return False
+        # The key can't tell requests apart by headers it leaves out ...
+        vary = _vary_names(response.headers.get("vary"))
+        return "*" not in vary and not vary & _IGNORED_HEADERS
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+        if self.disk_dir:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                self._remember(key, entry)
+        return entry
+
+    async def put(self, key: str, entry: CacheEntry):
+        if not (entry.is_fresh or entry.can_revalidate) or entry.size > self.max_bytes:
+            return
+        self._remember(key, entry)
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, entry)
+
+    def _remember(self, key: str, entry: CacheEntry):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.total_bytes -= previous.size
+        self._entries[key] = entry
+        self.total_bytes += entry.size
+        while self.total_bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= evicted.size
+
+    def _read_disk(self, key: str) -> Optional[CacheEntry]:
+        body, meta = self.disk_dir / f"{key}.body", self.disk_dir / f"{key}.json"
+        try:
+            entry = CacheEntry(body.read_bytes(), **json.loads(meta.read_text()))
+        except (OSError, ValueError, TypeError):
+            return None
+        os.utime(body)
+        return entry
+
+    def _write_disk(self, key: str, entry: CacheEntry):
+        (self.disk_dir / f"{key}.body").write_bytes(entry.raw)
+        (self.disk_dir / f"{key}.json").write_text(json.dumps(entry.to_meta()))
+
+        # Trim the least recently used bodies once the directory is too big ...
+        bodies = sorted(
+            self.disk_dir.glob("*.body"), key=lambda path: path.stat().st_mtime
+        )
+        total = sum(path.stat().st_size for path in bodies)
+        for path in bodies:
+            if total <= self.max_disk_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+            path.with_suffix(".json").unlink(missing_ok=True)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import math
+import os
+from array import array
+from collections import Counter
+from typing import Any, Optional
+
+from leomaine.backend.indexing import ResultIndex, tokenize
+
+
+# tokens of data context put in front of each chat question ...
+CONTEXT_BUDGET = int(os.environ.get("LEOMAINE_CONTEXT_TOKENS", "4000"))
+
+# sample rows in the summary, longest value rendered in a row ...
+SAMPLE_ROWS = 3
+MAX_VALUE_CHARS = 80
+
+# words too common in questions to say anything about which rows matter ...
+STOPWORDS = frozenset(
+    "a an and are as at be by do does for from has have how i in is it me "
+    "of on or show tell than that the their there these this to was what "
+    "when where which who why with".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text and JSON, close
+    # enough to keep prompts bounded without shipping a tokenizer ...
+    return math.ceil(len(text) / 4)
+
+
+def _clip(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > MAX_VALUE_CHARS:
+        return value[:MAX_VALUE_CHARS] + "..."
+    if isinstance(value, (dict, list)):
+        text = json.dumps(value, default=str)
+        return value if len(text) <= MAX_VALUE_CHARS else _clip(text)
+    return value
+
+
+def render_row(row: dict) -> str:
+    return json.dumps(
+        {key: _clip(value) for key, value in row.items() if value is not None},
+        default=str,
+    )
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def describe_column(name: str, values, index: ResultIndex) -> str:
+    if isinstance(values, array):
+        kinds = Counter({type(values[0]).__name__: len(values)}) if values else {}
+        numbers = strings = values
+    else:
+        kinds = Counter(type(value).__name__ for value in values)
+        numbers = [value for value in values if _is_number(value)]
+        strings = [value for value in values if isinstance(value, str)]
+
+    nulls = kinds.pop("NoneType", 0)
+    parts = ["/".join(kind for kind, _ in kinds.most_common()) or "null"]
+    parts.append(f"{len(index.value_postings(name))} distinct")
+    if nulls:
+        parts.append(f"{nulls} null")
+    if len(numbers):
+        parts.append(f"min {min(numbers)}, max {max(numbers)}")
+    elif strings:
+        parts.append(f"min {_clip(min(strings))!r}, max {_clip(max(strings))!r}")
+    return f"- {name}: " + ", ".join(parts)
+
+
+class DatasetContext:
+    # Compact description of one result set for the chat prompt: a schema
+    # and statistics summary built once, plus the rows that best match each
+    # question, all kept inside a token budget however large the data is.
+
+    def __init__(self, result, index: ResultIndex):
+        self.result = result
+        self.index = index
+        self.version = result.version
+        self.summary = self._summarize()
+        # identifies the data the answers were given over, see semantic_cache
+        self.fingerprint = hashlib.sha1("\n".join(self.summary).encode()).hexdigest()
+
+    @property
+    def is_stale(self) -> bool:
+        return self.version != self.result.version
+
+    def _summarize(self) -> list[str]:
+        result = self.result
+        lines = [f"Dataset: {len(result)} rows, {len(result.headers)} columns."]
+        lines.append("Columns:")
+        lines += [
+            describe_column(name, result.column(name), self.index)
+            for name in result.headers
+        ]
+        lines.append("Sample rows:")
+        lines += [render_row(row) for row in result.rows(0, SAMPLE_ROWS)]
+        return lines
+
+    def relevant_rows(self, question: str, limit: int = 50) -> list[int]:
+        # Rank rows by the summed rarity (idf) of the question terms they
+        # contain, using the result index's token postings ...
+        postings = self.index.token_postings()
+        total = max(len(self.result), 1)
+        scores: Counter[int] = Counter()
+        for term in set(tokenize(question)) - STOPWORDS:
+            positions = postings.get(term)
+            if not positions:
+                continue
+            weight = math.log(1 + total / len(positions))
+            for position in set(positions):
+                scores[position] += weight
+        return [position for position, _ in scores.most_common(limit)]
+
+    def build(self, question: str, budget: int = CONTEXT_BUDGET) -> str:
+        # The summary gets up to half the budget, matching rows the rest ...
+        lines, used = [], 0
+        for number, line in enumerate(self.summary):
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget // 2:
+                lines.append(f"... {len(self.summary) - number} more lines omitted")
+                break
+            lines.append(line)
+            used += cost
+
+        matched = self.relevant_rows(question)
+        if matched:
+            lines.append("Rows matching the question:")
+            for row in self.result.rows_at(matched):
+                line = render_row(row)
+                cost = estimate_tokens(line) + 1
+                if used + cost > budget:
+                    break
+                lines.append(line)
+                used += cost
+        return "\n".join(lines)
+
+
+def system_prompt(context: Optional[DatasetContext], question: str, budget: int):
+    if context is None or not len(context.result):
+        return (
+            "You are the assistant of Leomaine, an API client. No response "
+            "has been loaded yet."
+        )
+    return (
+        "You are the assistant of Leomaine, an API client. Answer questions "
+        "about the API response the user has loaded, summarized below. Only "
+        "some rows are shown, say so when the answer may depend on others.\n\n"
+        + context.build(question, budget)
+    )
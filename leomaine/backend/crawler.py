@@ -0,0 +1,240 @@
+import asyncio
+from typing import AsyncIterator, Optional
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import httpx
+
+from leomaine.backend import fetcher
+from leomaine.backend.http_pool import http_pool
+from leomaine.backend.shape import find_records
+
+
+# pagination styles the builder offers, "auto" detects one from the first
+# response ...
+CRAWL_STYLES = ["auto", "link", "cursor", "page", "offset"]
+
+# ceilings for one crawl, and how many pages a click loads at a time ...
+MAX_CRAWL_ROWS = 100_000
+MAX_CRAWL_PAGES = 2000
+FIRST_PAGES = 5
+MORE_PAGES = 5
+
+# predictable pages (page numbers, offsets) fetched at once ...
+PREFETCH = 4
+
+# statuses that mean the page asked for is past the last one, any other
+# error status is reported (401/403, a 429 left after the retries) ...
+_PAST_LAST_PAGE = frozenset({404, 410})
+
+# names APIs commonly use, checked in this order ...
+_CURSOR_KEYS = (
+    "next_cursor",
+    "nextCursor",
+    "next_page_token",
+    "nextPageToken",
+    "cursor",
+    "after",
+    "next",
+)
+_CURSOR_PARAMS = ("cursor", "after", "page_token", "pageToken", "starting_after")
+_CURSOR_PARAM_FOR = {
+    "next_page_token": "page_token",
+    "nextPageToken": "pageToken",
+    "after": "after",
+}
+_CURSOR_CONTAINERS = ("meta", "pagination", "paging", "links", "cursor")
+_PAGE_PARAMS = ("page", "_page", "page_number", "pageNumber")
+_OFFSET_PARAMS = ("offset", "_start", "skip", "start")
+_LIMIT_PARAMS = ("limit", "_limit", "per_page", "page_size", "pageSize", "size")
+
+
+def next_cursor(payload) -> Optional[tuple[str, str]]:
+    # (key, value) of the next page's cursor in an object body, if any ...
+    if not isinstance(payload, dict) or payload.get("has_more") is False:
+        return None
+    places = [payload] + [
+        payload[key] for key in _CURSOR_CONTAINERS if isinstance(payload.get(key), dict)
+    ]
+    for place in places:
+        for key in _CURSOR_KEYS:
+            value = place.get(key)
+            if isinstance(value, (str, int)) and not isinstance(value, bool):
+                if value != "":
+                    return key, str(value)
+    return None
+
+
+def _with_params(url: str, **params) -> str:
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    query.update({key: str(value) for key, value in params.items()})
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _find_param(url: str, names: tuple[str, ...]) -> Optional[tuple[str, str]]:
+    query = dict(parse_qsl(urlsplit(url).query))
+    return next(((name, query[name]) for name in names if name in query), None)
+
+
+class Crawler:
+    # Follows an upstream API's pagination from one GET request. The style
+    # is either configured or detected from the first response: a
+    # `Link: rel="next"` header, a cursor in the body, or page number and
+    # offset query parameters. Page numbers and offsets can be predicted,
+    # so those pages are fetched `concurrency` at a time; links and cursors
+    # are only known once the previous page arrived. `fetch` yields the
+    # records page by page and can be called again to continue from there.
+
+    def __init__(
+        self,
+        url: str,
+        headers: dict[str, str],
+        style: str = "auto",
+        max_rows: int = MAX_CRAWL_ROWS,
+        concurrency: int = PREFETCH,
+    ):
+        if style not in CRAWL_STYLES:
+            raise ValueError(f"unknown pagination style '{style}'")
+        self.url = url
+        self.headers = headers
+        self.style = style
+        self.max_rows = max_rows
+        self.concurrency = max(concurrency, 1)
+        self.pages = 0
+        self.rows = 0
+        self.has_more = True
+        self.truncated = False
+        self.status: Optional[int] = None
+
+        # where the next page is: a URL for links and cursors, a page
+        # number or offset for the predictable styles ...
+        self._next_url: Optional[str] = url
+        self._param = ""
+        self._position = 0
+        self._step = 0
+        self._page_size = 0
+
+    async def _get(self, url: str) -> httpx.Response:
+        async with http_pool.client(url) as client:
+            res = await fetcher.send(client, "GET", url, headers=self.headers)
+            await res.aread()
+        res.raise_for_status()
+        return res
+
+    def _detect(self, res: httpx.Response, payload, rows: list):
+        # Query parameters win over a Link header, since the pages they
+        # name can be fetched ahead ...
+        page = _find_param(self.url, _PAGE_PARAMS)
+        offset = _find_param(self.url, _OFFSET_PARAMS)
+        if self.style == "auto":
+            if page:
+                self.style = "page"
+            elif offset:
+                self.style = "offset"
+            elif "next" in res.links:
+                self.style = "link"
+            elif next_cursor(payload):
+                self.style = "cursor"
+            else:
+                self.style = "single"
+
+        if self.style == "page":
+            self._param, first = page or ("page", "1")
+            self._position, self._step = int(first) + 1, 1
+        elif self.style == "offset":
+            self._param, first = offset or ("offset", "0")
+            limit = _find_param(self.url, _LIMIT_PARAMS)
+            self._step = int(limit[1]) if limit else len(rows)
+            self._position = int(first) + self._step
+        self._page_size = len(rows)
+
+    def _follow(self, res: httpx.Response, payload) -> Optional[str]:
+        # The URL of the page after `res` for the link and cursor styles ...
+        if self.style == "link":
+            link = res.links.get("next", {}).get("url")
+            return urljoin(str(res.url), link) if link else None
+        if self.style == "cursor":
+            cursor = next_cursor(payload)
+            if cursor is None:
+                return None
+            key, value = cursor
+            if value.startswith(("http://", "https://", "/")):
+                return urljoin(str(res.url), value)
+            param = _find_param(self.url, _CURSOR_PARAMS)
+            name = param[0] if param else _CURSOR_PARAM_FOR.get(key, "cursor")
+            return _with_params(self.url, **{name: value})
+        return None
+
+    def _take(self, rows: list) -> list:
+        # Count a page in, clipping it to the row cap ...
+        room = self.max_rows - self.rows
+        if len(rows) >= room:
+            self.truncated = len(rows) > room or self.has_more
+            rows = rows[:room]
+            self.has_more = False
+        self.pages += 1
+        self.rows += len(rows)
+        if self.pages >= MAX_CRAWL_PAGES:
+            self.has_more = False
+        return rows
+
+    async def fetch(self, pages: int) -> AsyncIterator[list]:
+        fetched = 0
+        while self.has_more and fetched < pages:
+            # The first page is always fetched alone, it settles the style ...
+            if self.pages and self.style in ("page", "offset"):
+                batch = min(self.concurrency, pages - fetched)
+                urls = [
+                    _with_params(
+                        self.url, **{self._param: self._position + i * self._step}
+                    )
+                    for i in range(batch)
+                ]
+                responses = await asyncio.gather(
+                    *(self._get(url) for url in urls), return_exceptions=True
+                )
+                start = self._position
+                self._position += batch * self._step
+                for i, res in enumerate(responses):
+                    status = (
+                        res.response.status_code
+                        if isinstance(res, httpx.HTTPStatusError)
+                        else None
+                    )
+                    # Some APIs answer past the last page with a 404, not [] ...
+                    if status in _PAST_LAST_PAGE:
+                        self.has_more = False
+                        return
+                    if isinstance(res, BaseException):
+                        # The next fetch starts again at the failed page. Still
+                        # rate limited after the retries, pages are fetched
+                        # one at a time from now on ...
+                        self._position = start + i * self._step
+                        if status == 429:
+                            self.concurrency = 1
+                        raise res
+                    rows, _ = find_records(res.json())
+                    # A short or empty page is the last one ...
+                    if len(rows) < self._page_size or not rows:
+                        self.has_more = False
+                    fetched += 1
+                    yield self._take(rows)
+                    if not self.has_more:
+                        return
+                continue
+
+            url = self._next_url
+            res = await self._get(url)
+            payload = res.json()
+            rows, _ = find_records(payload)
+            if self.pages == 0:
+                self.status = res.status_code
+                self._detect(res, payload, rows)
+            if self.style in ("page", "offset"):
+                self.has_more = bool(rows)
+            else:
+                # A cursor that points back at the same page ends the crawl ...
+                self._next_url = self._follow(res, payload)
+                self.has_more = self._next_url not in (None, url) and bool(rows)
+            fetched += 1
+            yield self._take(rows)
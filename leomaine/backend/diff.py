@@ -0,0 +1,207 @@
+from array import array
+from collections import defaultdict
+from itertools import count, repeat
+from typing import Any, Optional
+
+import numpy as np
+
+from leomaine.backend.shape import Subtree, canonical_json
+from leomaine.backend.store import ResultSet
+
+
+# how many changed rows a diff keeps field level detail for ...
+MAX_CHANGES = 1000
+
+
+def _hashable(value: Any) -> Any:
+    # Nested values compare by their canonical JSON text ...
+    if isinstance(value, (dict, list)):
+        return canonical_json(value)
+    return value
+
+
+# cell types coded through `_cell_key` ...
+_NESTED = frozenset((Subtree, list, dict))
+
+# splitmix64 constants, the row fingerprints are folded and mixed with ...
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    # Spreads the small cell codes over all 64 bits, so folded columns
+    # don't cancel out ...
+    x = (x ^ (x >> np.uint64(30))) * _MIX_1
+    x = (x ^ (x >> np.uint64(27))) * _MIX_2
+    return x ^ (x >> np.uint64(31))
+
+
+def _same(a: Any, b: Any) -> bool:
+    # Cells are equal when type and value are, 1, 1.0 and True differ ...
+    return type(a) is type(b) and _hashable(a) == _hashable(b)
+
+
+def _cell_key(value: Any) -> tuple:
+    # A nested cell by its type and text: inline arrays (plain values only,
+    # see `shape.flatten`) by their repr, which tells 1, 1.0 and True apart,
+    # anything else by canonical JSON, compared as text rather than through
+    # `Subtree.__eq__` ...
+    kind = type(value)
+    if kind is Subtree:
+        return kind, canonical_json(value.value)
+    if kind is list:
+        return kind, repr(value)
+    return kind, _hashable(value)
+
+
+def _codes(
+    column: list | array, size: int, codes: dict, counter: count
+) -> np.ndarray:
+    # A code per distinct (type, value) of the column, looked up by value
+    # rather than by Python's hash (where -1 and -2 collide), and shared by
+    # both sides through `codes`, so equal cells always get equal codes ...
+    if _NESTED.isdisjoint(map(type, column)):
+        keys = zip(map(type, column), column)
+    else:
+        keys = map(_cell_key, column)
+    return np.fromiter(map(codes.setdefault, keys, counter), np.int64, size)
+
+
+def _fingerprints(
+    result: ResultSet, headers: list[str], codes: dict[str, dict], counter: count
+) -> np.ndarray:
+    # One 64-bit fingerprint per row over `headers`, None where this side
+    # lacks a column, built a column at a time rather than from per row
+    # tuples ...
+    size = len(result)
+    rows = np.zeros(size, np.uint64)
+    for name in headers:
+        known = codes.setdefault(name, {})
+        if name in result.index:
+            cells = _codes(result.column(name), size, known, counter)
+        else:
+            missing = known.setdefault((type(None), None), next(counter))
+            cells = np.full(size, missing, np.int64)
+        rows = _mix(rows * _GOLDEN + cells.view(np.uint64))
+    return rows
+
+
+def _keys(column: list | array) -> list:
+    try:
+        # Building the set is a C level check that every value hashes ...
+        set(column)
+    except TypeError:
+        return [_hashable(value) for value in column]
+    return list(column)
+
+
+def _join_keys(old: list, new: list) -> tuple[list, list]:
+    # Repeated keys are paired by their order of appearance, on both sides
+    # as soon as either one repeats a key ...
+    if len(set(old)) == len(old) and len(set(new)) == len(new):
+        return old, new
+
+    def occurrences(keys: list) -> list[tuple]:
+        seen: dict[Any, int] = defaultdict(int)
+        paired = []
+        for key in keys:
+            paired.append((key, seen[key]))
+            seen[key] += 1
+        return paired
+
+    return occurrences(old), occurrences(new)
+
+
+class ResultDiff:
+    # Added, removed and modified rows between two result sets. Rows are
+    # matched through a hash join: either on a key column or, without one,
+    # on the full row content (where a changed row reads as removed plus
+    # added). Cells are coded by their type and value, exactly, and a row's
+    # content is compared by a 64-bit fingerprint of its cell codes, so a
+    # false match is as likely as a collision of two such fingerprints.
+    # Positions refer to rows of `before` and `after` respectively.
+
+    def __init__(self, before: ResultSet, after: ResultSet, key: str = ""):
+        self.before = before
+        self.after = after
+        self.key = key
+        self.headers = before.headers + [
+            name for name in after.headers if name not in before.index
+        ]
+        self.added: list[int] = []
+        self.removed: list[int] = []
+        self.modified: list[tuple[int, int]] = []
+        self.unchanged = 0
+        self._compute()
+
+    def _compute(self):
+        if self.key and (
+            self.key not in self.before.index or self.key not in self.after.index
+        ):
+            raise ValueError(f"key column '{self.key}' is not in both results")
+        codes: dict[str, dict] = {}
+        counter = count()
+        old = _fingerprints(self.before, self.headers, codes, counter)
+        new = _fingerprints(self.after, self.headers, codes, counter)
+        if self.key:
+            old_keys, new_keys = _join_keys(
+                _keys(self.before.column(self.key)), _keys(self.after.column(self.key))
+            )
+        else:
+            old_keys, new_keys = _join_keys(old.tolist(), new.tolist())
+
+        lookup = dict(zip(old_keys, range(len(old_keys))))
+        matches = np.fromiter(
+            map(lookup.get, new_keys, repeat(-1)), np.int64, len(new_keys)
+        )
+        found = matches >= 0
+        new_matched = np.flatnonzero(found)
+        old_matched = matches[found]
+        changed = old[old_matched] != new[new_matched]
+
+        self.added = np.flatnonzero(~found).tolist()
+        matched = np.zeros(len(old), bool)
+        matched[old_matched] = True
+        self.removed = np.flatnonzero(~matched).tolist()
+        self.modified = list(
+            zip(old_matched[changed].tolist(), new_matched[changed].tolist())
+        )
+        self.unchanged = len(new_matched) - len(self.modified)
+
+    def changes(self, limit: int = MAX_CHANGES) -> list[dict]:
+        # Per field (old, new) values of the first `limit` modified rows ...
+        changes = []
+        for old_position, new_position in self.modified[:limit]:
+            old = self.before.row(old_position)
+            new = self.after.row(new_position)
+            fields = {
+                name: (old.get(name), new.get(name))
+                for name in self.headers
+                if not _same(old.get(name), new.get(name))
+            }
+            changes.append(
+                {
+                    "key": new.get(self.key) if self.key else None,
+                    "before": old_position,
+                    "after": new_position,
+                    "fields": fields,
+                }
+            )
+        return changes
+
+    def summary(self) -> dict[str, int]:
+        return {
+            "before": len(self.before),
+            "after": len(self.after),
+            "added": len(self.added),
+            "removed": len(self.removed),
+            "modified": len(self.modified),
+            "unchanged": self.unchanged,
+        }
+
+
+def diff_results(
+    before: ResultSet, after: ResultSet, key: Optional[str] = None
+) -> ResultDiff:
+    return ResultDiff(before, after, key or "")
@@ -0,0 +1,153 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import mimetypes
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Iterator
+
+
+# body values starting with this name a file uploaded by the session ...
+FILE_PREFIX = "@"
+CHUNK_SIZE = 64 * 1024
+
+BODY_MODES = ["JSON", "Raw", "x-www-form-urlencoded", "Form Data", "Binary", "None"]
+
+
+def entries_to_dict(entries: list[dict[str, str]]) -> dict[str, str]:
+    return {item["key"]: item["value"] for item in entries if item.get("key")}
+
+
+def cookie_header(cookies: list[dict[str, str]]) -> str:
+    return "; ".join(
+        f"{key}={value}" for key, value in entries_to_dict(cookies).items()
+    )
+
+
+def session_dir(root: Path, token: str) -> Path:
+    # Where one session's uploads are kept under the app's upload directory,
+    # named by a hash of its client token. A session only reads its own ...
+    return root / "sessions" / hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+def resolve_file(value: str, root: Path) -> Path:
+    # Only files inside `root` (a session's directory) may be sent ...
+    path = (root / value[len(FILE_PREFIX) :].strip()).resolve()
+    if not path.is_relative_to(root.resolve()) or not path.is_file():
+        raise FileNotFoundError(f"no uploaded file named {value!r}")
+    return path
+
+
+def uploaded_files(root: Path) -> list[str]:
+    if not root.is_dir():
+        return []
+    return sorted(path.name for path in root.iterdir() if path.is_file())
+
+
+async def save_upload(
+    root: Path, filename: str, read: Callable[[int], Awaitable[bytes]]
+) -> str:
+    # Write an uploaded file into `root` a chunk at a time, under its base
+    # name only, and answer the name it can be sent by ...
+    name = Path(filename or "").name
+    if not name or name in (".", ".."):
+        raise ValueError(f"can't store an upload named {filename!r}")
+    root.mkdir(parents=True, exist_ok=True)
+    with (root / name).open("wb") as file:
+        while chunk := await read(CHUNK_SIZE):
+            await asyncio.to_thread(file.write, chunk)
+    return name
+
+
+async def file_chunks(
+    path: Path, chunk_size: int = CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    with path.open("rb") as file:
+        while chunk := await asyncio.to_thread(file.read, chunk_size):
+            yield chunk
+
+
+def _json_value(value: str):
+    # Let "3", "true" or '{"a": 1}' through as JSON, anything else as text ...
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def encode_body(
+    mode: str,
+    entries: list[dict[str, str]],
+    root: Path,
+    stack: contextlib.ExitStack,
+) -> dict:
+    entries = [item for item in entries if item.get("key") or item.get("value")]
+    if mode == "None" or not entries:
+        return {}
+
+    if mode == "JSON":
+        return {
+            "json": {
+                key: _json_value(value)
+                for key, value in entries_to_dict(entries).items()
+            }
+        }
+
+    if mode == "Raw":
+        return {"content": "\n".join(item["value"] for item in entries)}
+
+    if mode == "x-www-form-urlencoded":
+        return {"data": entries_to_dict(entries)}
+
+    if mode == "Form Data":
+        # httpx reads multipart file fields in chunks while sending ...
+        data, files = {}, {}
+        for key, value in entries_to_dict(entries).items():
+            if value.startswith(FILE_PREFIX):
+                path = resolve_file(value, root)
+                files[key] = (
+                    path.name,
+                    stack.enter_context(path.open("rb")),
+                    mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+                )
+            else:
+                data[key] = value
+        return {"data": data, "files": files}
+
+    if mode == "Binary":
+        path = resolve_file(entries[0]["value"], root)
+        return {
+            "content": file_chunks(path),
+            "headers": {
+                "Content-Type": mimetypes.guess_type(path.name)[0]
+                or "application/octet-stream",
+                "Content-Length": str(path.stat().st_size),
+            },
+        }
+
+    raise ValueError(f"unknown body mode {mode!r}")
+
+
+@contextlib.contextmanager
+def request_kwargs(
+    headers: dict[str, str],
+    body_mode: str,
+    body: list[dict[str, str]],
+    cookies: list[dict[str, str]],
+    root: Path,
+) -> Iterator[dict]:
+    # Keyword arguments for `client.request`/`client.stream`, keeping any
+    # uploaded files open until the request has been sent ...
+    with contextlib.ExitStack() as stack:
+        kwargs = encode_body(body_mode, body, root, stack)
+        merged = dict(headers)
+        present = {key.lower() for key in headers}
+        for key, value in kwargs.pop("headers", {}).items():
+            if key.lower() not in present or key == "Content-Length":
+                merged[key] = value
+        cookie = cookie_header(cookies)
+        if cookie:
+            merged["Cookie"] = cookie
+        kwargs["headers"] = merged
+        yield kwargs
+
@@ -0,0 +1,183 @@
+import asyncio
+import contextlib
+import random
+import time
+from typing import Awaitable, Callable, Iterator, Optional
+
+import httpx
+
+from leomaine.backend.metrics import metrics
+
+
+# methods that can be sent again without changing the outcome ...
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+# statuses worth another attempt, and how attempts are spaced: a random
+# delay up to BACKOFF_BASE * 2**attempt, never longer than BACKOFF_MAX ...
+RETRY_STATUSES = frozenset({408, 429, 502, 503, 504})
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 8.0
+
+# how often a background fetch publishes its progress to the state ...
+PUBLISH_INTERVAL = 0.25
+
+# failures that happen before the request left, safe to retry for any
+# method ...
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+_TIMEOUT_PHASES = {
+    httpx.ConnectTimeout: "connect",
+    httpx.ReadTimeout: "read",
+    httpx.WriteTimeout: "write",
+    httpx.PoolTimeout: "pool",
+}
+
+
+def backoff(attempt: int) -> float:
+    # "Full jitter", so clients failing together don't retry together ...
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def retry_after(res: httpx.Response) -> Optional[float]:
+    # Seconds asked for by a Retry-After header, HTTP dates are ignored ...
+    value = res.headers.get("retry-after", "")
+    return float(value) if value.strip().isdigit() else None
+
+
+def describe(error: BaseException) -> str:
+    for kind, phase in _TIMEOUT_PHASES.items():
+        if isinstance(error, kind):
+            return f"Upstream {phase} timed out"
+    if isinstance(error, httpx.HTTPStatusError):
+        res = error.response
+        return f"Upstream answered {res.status_code} {res.reason_phrase} for {res.url}"
+    return str(error) or type(error).__name__
+
+
+class Progress:
+    # What a background fetch has done so far. `report` is the handler's
+    # callback publishing it to the state, called at most every
+    # PUBLISH_INTERVAL unless forced.
+
+    def __init__(
+        self,
+        report: Optional[Callable[["Progress"], Awaitable[None]]] = None,
+        interval: float = PUBLISH_INTERVAL,
+    ):
+        self.received = 0
+        self.total = 0
+        self.attempt = 0
+        self.note = ""
+        self._report = report
+        self._interval = interval
+        self._published = 0.0
+
+    async def update(self, force: bool = False):
+        if self._report is None:
+            return
+        if force or time.monotonic() - self._published > self._interval:
+            self._published = time.monotonic()
+            await self._report(self)
+
+
+async def send(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    progress: Optional[Progress] = None,
+    max_retries: int = MAX_RETRIES,
+    **kwargs,
+) -> httpx.Response:
+    # Sends one request and returns once its headers are in, with the body
+    # left to stream. Idempotent methods are retried on transport errors and
+    # RETRY_STATUSES, any method when the connection never opened. A body
+    # streamed from a file can't be replayed and is never retried ...
+    replayable = not hasattr(kwargs.get("content"), "__aiter__")
+    attempt = 0
+    while True:
+        request = client.build_request(method, url, **kwargs)
+        try:
+            res = await client.send(request, stream=True)
+        except httpx.TransportError as error:
+            retry = isinstance(error, _NOT_SENT) or method in IDEMPOTENT_METHODS
+            if not (replayable and retry and attempt < max_retries):
+                raise
+            delay, reason = backoff(attempt), describe(error)
+        else:
+            retry = res.status_code in RETRY_STATUSES and method in IDEMPOTENT_METHODS
+            if not (replayable and retry and attempt < max_retries):
+                return res
+            delay = retry_after(res)
+            if delay is None:
+                delay = backoff(attempt)
+            elif delay > BACKOFF_MAX:
+                # The upstream asked for a longer pause than we wait for ...
+                return res
+            reason = str(res.status_code)
+            await res.aclose()
+
+        attempt += 1
+        metrics.inc("leomaine_upstream_retries_total", method=method)
+        if progress is not None:
+            progress.attempt = attempt
+            progress.note = f"Retry {attempt}/{max_retries} in {delay:.1f}s ({reason})"
+            await progress.update(force=True)
+        await asyncio.sleep(delay)
+
+
+async def read(res: httpx.Response, progress: Optional[Progress] = None) -> bytes:
+    # The (decoded) body of a streamed response, counted as it arrives ...
+    chunks = []
+    try:
+        if progress is not None:
+            progress.note = ""
+            length = res.headers.get("content-length", "")
+            progress.total = int(length) if length.isdigit() else 0
+        async for chunk in res.aiter_bytes():
+            chunks.append(chunk)
+            if progress is not None:
+                progress.received = res.num_bytes_downloaded
+                await progress.update()
+    finally:
+        await res.aclose()
+    return b"".join(chunks)
+
+
+async def fetch(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    progress: Optional[Progress] = None,
+    **kwargs,
+) -> tuple[httpx.Response, bytes]:
+    res = await send(client, method, url, progress, **kwargs)
+    return res, await read(res, progress)
+
+
+class RunningRequests:
+    # The background task fetching for each client. A cancel event is
+    # handled by the worker owning the client's socket, the same one that
+    # runs its background tasks, so it can cancel the task outright, even
+    # while it waits on the upstream.
+
+    def __init__(self):
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    @contextlib.contextmanager
+    def track(self, token: str) -> Iterator[None]:
+        task = asyncio.current_task()
+        self._tasks[token] = task
+        try:
+            yield
+        finally:
+            if self._tasks.get(token) is task:
+                del self._tasks[token]
+
+    def cancel(self, token: str) -> bool:
+        task = self._tasks.pop(token, None)
+        return task is not None and task.cancel()
+
+
+# process wide, like the result store ...
+running_requests = RunningRequests()
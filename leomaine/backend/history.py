@@ -0,0 +1,313 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+HISTORY_PATH = os.environ.get("LEOMAINE_HISTORY_DB", "leomaine_history.db")
+
+# responses larger than this are recorded without their body ...
+MAX_BODY_BYTES = 8 * 1024 * 1024
+PAGE_SIZE = 50
+
+# headers, body fields and query parameters whose values are credentials,
+# matched on the lowercased name. Their values and every cookie value are
+# blanked before a request is recorded, the names are kept so a restored
+# request shows what to fill in ...
+_CREDENTIAL_NAME = re.compile(
+    r"authorization|cookie|token|secret|password|passwd|api[-_]?key|session"
+    r"|credential|signature|csrf|xsrf"
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bodies (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS requests (
+    id INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    created REAL NOT NULL,
+    method TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status INTEGER,
+    elapsed_ms REAL,
+    request TEXT NOT NULL,
+    body_hash TEXT REFERENCES bodies (hash)
+);
+CREATE INDEX IF NOT EXISTS requests_owner ON requests (owner, id);
+CREATE INDEX IF NOT EXISTS requests_owner_url ON requests (owner, url, id);
+CREATE INDEX IF NOT EXISTS requests_owner_method ON requests (owner, method, id);
+CREATE INDEX IF NOT EXISTS requests_owner_status ON requests (owner, status, id);
+CREATE INDEX IF NOT EXISTS requests_created ON requests (created);
+
+CREATE TABLE IF NOT EXISTS collections (
+    id INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    name TEXT NOT NULL,
+    created REAL NOT NULL,
+    UNIQUE (owner, name)
+);
+
+CREATE TABLE IF NOT EXISTS collection_items (
+    collection_id INTEGER NOT NULL REFERENCES collections (id) ON DELETE CASCADE,
+    request_id INTEGER NOT NULL REFERENCES requests (id) ON DELETE CASCADE,
+    added REAL NOT NULL,
+    PRIMARY KEY (collection_id, request_id)
+) WITHOUT ROWID;
+"""
+
+_SUMMARY = "id, created, method, url, status, elapsed_ms, body_hash"
+
+
+def _summary(row: tuple) -> dict:
+    keys = ("id", "created", "method", "url", "status", "elapsed_ms", "body_hash")
+    return dict(zip(keys, row))
+
+
+def _is_credential(name: str) -> bool:
+    return _CREDENTIAL_NAME.search(name.lower()) is not None
+
+
+def _blank(pairs: list) -> list[list[str]]:
+    return [[key, "" if _is_credential(key) else value] for key, value in pairs]
+
+
+def redact(request: dict) -> dict:
+    # The builder snapshot without credentials: cookie values and the
+    # values of credential headers and body fields are blanked ...
+    redacted = dict(request)
+    redacted["headers"] = _blank(request.get("headers", []))
+    redacted["body"] = _blank(request.get("body", []))
+    redacted["cookies"] = [[key, ""] for key, _ in request.get("cookies", [])]
+    return redacted
+
+
+def redact_url(url: str) -> str:
+    # The URL without credentials: the password of its user info and the
+    # values of credential query parameters are blanked, anything else is
+    # kept as it was typed ...
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if any(_is_credential(key) for key, _ in query):
+        parts = parts._replace(query=urlencode(list(map(tuple, _blank(query)))))
+    if parts.password:
+        host = parts.netloc.rpartition("@")[2]
+        parts = parts._replace(netloc=f"{parts.username}:@{host}")
+    return urlunsplit(parts)
+
+
+class RequestHistory:
+    # Every request sent from the builder plus named collections, in one
+    # SQLite file (WAL mode, so reads never wait on the writer). Response
+    # bodies are stored zlib compressed, once per distinct content hash.
+    # Listings page by id (keyset), so they cost the same at any depth.
+    # Requests and collections belong to an `owner` (the browser's history
+    # cookie), every read and write is limited to that owner's rows, and
+    # requests are stored without their credentials (see `redact` and
+    # `redact_url`).
+
+    def __init__(self, path: str = HISTORY_PATH):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            db.executescript(_SCHEMA)
+            self._db = db
+        return self._db
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def record(
+        self,
+        owner: str,
+        method: str,
+        url: str,
+        request: dict,
+        status: Optional[int],
+        elapsed_ms: float,
+        body: Optional[bytes],
+    ) -> int:
+        body_hash = None
+        if body is not None and len(body) <= MAX_BODY_BYTES:
+            body_hash = hashlib.sha256(body).hexdigest()
+        with self._lock, self.db:
+            if body_hash is not None:
+                exists = self.db.execute(
+                    "SELECT 1 FROM bodies WHERE hash = ?", (body_hash,)
+                ).fetchone()
+                if not exists:
+                    # Another backend on the host may store the same body
+                    # between the check and the insert ...
+                    self.db.execute(
+                        "INSERT OR IGNORE INTO bodies (hash, size, data) "
+                        "VALUES (?, ?, ?)",
+                        (body_hash, len(body), zlib.compress(body, 6)),
+                    )
+            cursor = self.db.execute(
+                "INSERT INTO requests (owner, created, method, url, status, "
+                "elapsed_ms, request, body_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    owner,
+                    time.time(),
+                    method,
+                    redact_url(url),
+                    status,
+                    elapsed_ms,
+                    json.dumps(redact(request)),
+                    body_hash,
+                ),
+            )
+            return cursor.lastrowid
+
+    def page(
+        self,
+        owner: str,
+        before: Optional[int] = None,
+        limit: int = PAGE_SIZE,
+        search: str = "",
+        method: str = "",
+        status: Optional[int] = None,
+    ) -> list[dict]:
+        # Newest first, starting below the `before` id of the last page ...
+        clauses, args = ["owner = ?"], [owner]
+        if before is not None:
+            clauses.append("id < ?")
+            args.append(before)
+        if method:
+            clauses.append("method = ?")
+            args.append(method)
+        if status is not None:
+            clauses.append("status = ?")
+            args.append(status)
+        search = search.strip()
+        if search.startswith(("http://", "https://")):
+            # A URL prefix can use the url index ...
+            clauses.append("url >= ? AND url < ?")
+            args += [search, search + "\uffff"]
+        elif search:
+            clauses.append("instr(lower(url), ?) > 0")
+            args.append(search.lower())
+
+        where = " AND ".join(clauses)
+        with self._lock:
+            rows = self.db.execute(
+                f"SELECT {_SUMMARY} FROM requests WHERE {where} "
+                "ORDER BY id DESC LIMIT ?",
+                (*args, limit),
+            ).fetchall()
+        return [_summary(row) for row in rows]
+
+    def get(self, owner: str, request_id: int) -> Optional[dict]:
+        with self._lock:
+            row = self.db.execute(
+                f"SELECT {_SUMMARY}, request FROM requests WHERE id = ? AND owner = ?",
+                (request_id, owner),
+            ).fetchone()
+        if row is None:
+            return None
+        entry = _summary(row[:-1])
+        entry["request"] = json.loads(row[-1])
+        return entry
+
+    def body(self, body_hash: str) -> Optional[bytes]:
+        with self._lock:
+            row = self.db.execute(
+                "SELECT data FROM bodies WHERE hash = ?", (body_hash,)
+            ).fetchone()
+        return zlib.decompress(row[0]) if row else None
+
+    def create_collection(self, owner: str, name: str) -> int:
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR IGNORE INTO collections (owner, name, created) "
+                "VALUES (?, ?, ?)",
+                (owner, name, time.time()),
+            )
+            return self.db.execute(
+                "SELECT id FROM collections WHERE owner = ? AND name = ?",
+                (owner, name),
+            ).fetchone()[0]
+
+    def collections(self, owner: str) -> list[dict]:
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT c.id, c.name, count(i.request_id) FROM collections c "
+                "LEFT JOIN collection_items i ON i.collection_id = c.id "
+                "WHERE c.owner = ? GROUP BY c.id ORDER BY c.name",
+                (owner,),
+            ).fetchall()
+        return [{"id": row[0], "name": row[1], "size": row[2]} for row in rows]
+
+    def add_to_collection(self, owner: str, collection_id: int, request_id: int):
+        # Only the owner's own request, into the owner's own collection ...
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR IGNORE INTO collection_items "
+                "(collection_id, request_id, added) "
+                "SELECT c.id, r.id, ? FROM collections c, requests r "
+                "WHERE c.id = ? AND c.owner = ? AND r.id = ? AND r.owner = ?",
+                (time.time(), collection_id, owner, request_id, owner),
+            )
+
+    def collection_page(
+        self,
+        owner: str,
+        collection_id: int,
+        before: Optional[int] = None,
+        limit: int = PAGE_SIZE,
+    ) -> list[dict]:
+        columns = ", ".join(f"r.{name}" for name in _SUMMARY.split(", "))
+        with self._lock:
+            rows = self.db.execute(
+                f"SELECT {columns} FROM collection_items i "
+                "JOIN requests r ON r.id = i.request_id "
+                "WHERE i.collection_id = ? AND i.request_id < ? AND r.owner = ? "
+                "ORDER BY i.request_id DESC LIMIT ?",
+                (
+                    collection_id,
+                    before if before is not None else 2**63 - 1,
+                    owner,
+                    limit,
+                ),
+            ).fetchall()
+        return [_summary(row) for row in rows]
+
+    def stats(self, owner: str) -> dict[str, int]:
+        with self._lock:
+            requests = self.db.execute(
+                "SELECT count(*) FROM requests WHERE owner = ?", (owner,)
+            ).fetchone()[0]
+            bodies, raw, stored = self.db.execute(
+                "SELECT count(*), coalesce(sum(size), 0), "
+                "coalesce(sum(length(data)), 0) FROM bodies WHERE hash IN "
+                "(SELECT body_hash FROM requests WHERE owner = ?)",
+                (owner,),
+            ).fetchone()
+        return {
+            "requests": requests,
+            "bodies": bodies,
+            "raw_bytes": raw,
+            "stored_bytes": stored,
+        }
+
+
+request_history = RequestHistory()
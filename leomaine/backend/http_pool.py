@@ -0,0 +1,142 @@
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from urllib.parse import urlsplit
+
+import httpx
+
+from leomaine.backend.metrics import count_response
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+# limits applied to every upstream host ...
+MAX_CONNECTIONS_PER_HOST = 20
+MAX_KEEPALIVE_CONNECTIONS = 10
+KEEPALIVE_EXPIRY = 30.0
+MAX_HOSTS = 64
+
+# seconds allowed for each phase of a request: opening a connection,
+# waiting for a free one, sending the body and every read of the response ...
+CONNECT_TIMEOUT = 10.0
+POOL_TIMEOUT = 10.0
+WRITE_TIMEOUT = 30.0
+READ_TIMEOUT = 60.0
+
+
+def host_key(url: str) -> str:
+    parts = urlsplit(url)
+    scheme = parts.scheme or "http"
+    port = parts.port or (443 if scheme == "https" else 80)
+    return f"{scheme}://{parts.hostname}:{port}"
+
+
+class ClientPool:
+    # One httpx.AsyncClient (and so one connection pool) per upstream host,
+    # shared by every session of this backend process. Clients are leased
+    # through `client`, which counts their users: a host dropped from the
+    # pool while a request still runs on its client is closed by the last
+    # user instead. `created` and `reused` count clients, not connections,
+    # each client keeps its own connections alive.
+
+    def __init__(
+        self,
+        max_connections: int = MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = KEEPALIVE_EXPIRY,
+        http2: bool = HTTP2_AVAILABLE,
+        max_hosts: int = MAX_HOSTS,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(
+            connect=CONNECT_TIMEOUT,
+            read=READ_TIMEOUT,
+            write=WRITE_TIMEOUT,
+            pool=POOL_TIMEOUT,
+        )
+        self.http2 = http2
+        self.max_hosts = max_hosts
+        self.created = 0
+        self.reused = 0
+        self._clients: OrderedDict[str, httpx.AsyncClient] = OrderedDict()
+        self._users: Counter[httpx.AsyncClient] = Counter()
+        self._evicted: set[httpx.AsyncClient] = set()
+
+    def _create_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            limits=self.limits,
+            http2=self.http2,
+            timeout=self.timeout,
+            event_hooks={"response": [count_response]},
+        )
+
+    def _acquire(self, url: str) -> tuple[httpx.AsyncClient, list]:
+        # The client for `url` with its user counted, and the clients it
+        # pushed out of the pool that nobody uses any more ...
+        key = host_key(url)
+        client = self._clients.get(key)
+        if client is not None and not client.is_closed:
+            self.reused += 1
+            self._clients.move_to_end(key)
+        else:
+            self.created += 1
+            client = self._create_client()
+            self._clients[key] = client
+        self._users[client] += 1
+
+        # Drop the least recently used hosts once we go over the cap, a
+        # client still in use is closed by its last user ...
+        idle = []
+        while len(self._clients) > self.max_hosts:
+            _, stale = self._clients.popitem(last=False)
+            if self._users[stale]:
+                self._evicted.add(stale)
+            else:
+                idle.append(stale)
+        return client, idle
+
+    async def _release(self, client: httpx.AsyncClient):
+        self._users[client] -= 1
+        if self._users[client]:
+            return
+        del self._users[client]
+        if client in self._evicted:
+            self._evicted.discard(client)
+            await client.aclose()
+
+    @asynccontextmanager
+    async def client(self, url: str) -> AsyncIterator[httpx.AsyncClient]:
+        client, idle = self._acquire(url)
+        try:
+            for stale in idle:
+                await stale.aclose()
+            yield client
+        finally:
+            await self._release(client)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "created": self.created,
+            "reused": self.reused,
+            "hosts": len(self._clients),
+        }
+
+    async def aclose(self):
+        clients = [*self._clients.values(), *self._evicted]
+        self._clients.clear()
+        self._evicted.clear()
+        for client in clients:
+            await client.aclose()
+
+
+# process wide pool used by every state ...
+http_pool = ClientPool()
@@ -0,0 +1,130 @@
+import bisect
+import re
+from collections import defaultdict
+from typing import Any, Optional
+
+from leomaine.backend.shape import Subtree
+
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(value: Any) -> list[str]:
+    return _TOKEN.findall(str(value).lower()) if value is not None else []
+
+
+def _sort_key(value: Any) -> tuple:
+    # None sorts last, numbers before text, everything else by its text ...
+    if value is None:
+        return (3, 0)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value)
+    if isinstance(value, str):
+        return (1, value.lower())
+    return (2, str(value))
+
+
+class ResultIndex:
+    # Sort permutations, per-column value postings and an inverted token
+    # index over one result set. Each structure is built on first use and
+    # reused until the result set changes (tracked through its `version`).
+
+    def __init__(self, result):
+        self.result = result
+        self.version = result.version
+        self._orders: dict[str, list[int]] = {}
+        self._values: dict[str, dict[str, list[int]]] = {}
+        self._tokens: Optional[dict[str, list[int]]] = None
+        self._vocabulary: list[str] = []
+
+    @property
+    def is_stale(self) -> bool:
+        return self.version != self.result.version
+
+    def sort_order(self, column: str) -> list[int]:
+        order = self._orders.get(column)
+        if order is None:
+            values = self.result.column(column)
+            keys = [_sort_key(value) for value in values]
+            order = self._orders[column] = sorted(
+                range(len(values)), key=keys.__getitem__
+            )
+        return order
+
+    def value_postings(self, column: str) -> dict[str, list[int]]:
+        postings = self._values.get(column)
+        if postings is None:
+            postings = self._values[column] = {}
+            for position, value in enumerate(self.result.column(column)):
+                # Subtrees are searched by their content, not their summary ...
+                if isinstance(value, Subtree):
+                    value = value.to_json()
+                key = "" if value is None else str(value).lower()
+                postings.setdefault(key, []).append(position)
+        return postings
+
+    def token_postings(self) -> dict[str, list[int]]:
+        if self._tokens is None:
+            tokens: dict[str, list[int]] = defaultdict(list)
+            # Tokenize each distinct (already lowercased) value once, not
+            # every cell. Postings may repeat a row matched by two columns ...
+            for column in self.result.headers:
+                for value, positions in self.value_postings(column).items():
+                    for token in set(_TOKEN.findall(value)):
+                        tokens[token].extend(positions)
+            self._tokens = dict(tokens)
+            self._vocabulary = sorted(self._tokens)
+        return self._tokens
+
+    def filter(self, column: str, needle: str) -> set[int]:
+        needle = needle.lower()
+        matched: set[int] = set()
+        for value, positions in self.value_postings(column).items():
+            if needle in value:
+                matched.update(positions)
+        return matched
+
+    def search(self, text: str) -> set[int]:
+        postings = self.token_postings()
+        terms = tokenize(text)
+        matched: Optional[set[int]] = None
+        for number, term in enumerate(terms):
+            ids = set(postings.get(term, ()))
+            # The last term is still being typed, so match it as a prefix ...
+            if number == len(terms) - 1:
+                start = bisect.bisect_left(self._vocabulary, term)
+                stop = bisect.bisect_left(self._vocabulary, term + "\uffff", start)
+                for token in self._vocabulary[start:stop]:
+                    ids.update(postings[token])
+            matched = ids if matched is None else matched & ids
+            if not matched:
+                return set()
+        return matched if matched is not None else set()
+
+    def query(
+        self,
+        sort_column: str = "",
+        descending: bool = False,
+        filters: Optional[dict[str, str]] = None,
+        search: str = "",
+    ) -> list[int]:
+        matched: Optional[set[int]] = None
+        for column, needle in (filters or {}).items():
+            if needle and column in self.result.index:
+                ids = self.filter(column, needle)
+                matched = ids if matched is None else matched & ids
+        if search.strip():
+            ids = self.search(search)
+            matched = ids if matched is None else matched & ids
+
+        if sort_column in self.result.index:
+            order = self.sort_order(sort_column)
+            if descending:
+                order = order[::-1]
+            if matched is None:
+                return list(order)
+            return [position for position in order if position in matched]
+
+        if matched is None:
+            return list(range(len(self.result)))
+        return sorted(matched)
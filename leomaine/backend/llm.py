@@ -0,0 +1,211 @@
+import asyncio
+import json
+import os
+from collections import Counter
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+import httpx
+import yaml
+
+from leomaine.backend.http_pool import http_pool
+
+
+ROUTE_CONFIG = Path(__file__).resolve().parents[2] / "leomaine.yml"
+
+# The Kong route serving `ai-proxy`, e.g. http://localhost:8000/chat. Without
+# it the chat talks to the model's upstream (Ollama) directly ...
+AI_PROXY_URL = os.environ.get("LEOMAINE_AI_PROXY_URL")
+
+# generations allowed at once per session and per backend process ...
+MAX_PER_SESSION = 1
+MAX_GLOBAL = 8
+
+# how many pending tokens may pile up before reading from upstream pauses,
+# and how often buffered tokens are pushed to the UI ...
+QUEUE_SIZE = 256
+FLUSH_INTERVAL = 0.05
+
+TIMEOUT = httpx.Timeout(10.0, read=120.0)
+
+_DONE = object()
+
+
+class ChatBusy(Exception):
+    pass
+
+
+class ChatError(Exception):
+    pass
+
+
+def load_route_config(path: Path = ROUTE_CONFIG) -> dict:
+    with open(path) as file:
+        return yaml.safe_load(file) or {}
+
+
+class ChatSettings:
+    # Where and how to reach the model configured in `leomaine.yml`.
+
+    def __init__(self, route: dict, proxy_url: Optional[str] = AI_PROXY_URL):
+        config = route.get("config", {})
+        model = config.get("model", {})
+        options = model.get("options", {}) or {}
+        self.model = (model.get("name") or "mistral").lower()
+        self.temperature = options.get("temperature")
+        self.max_tokens = options.get("max_tokens") or 4096
+        self.streaming = config.get("response_streaming", "allow") != "deny"
+
+        if proxy_url:
+            # Kong's llm/v1/chat speaks the OpenAI chat format ...
+            self.url = proxy_url
+            self.format = "openai"
+        else:
+            upstream = options.get("upstream_url") or "http://127.0.0.1:11434/"
+            path = options.get("upstream_path") or "/api/chat"
+            self.url = upstream.rstrip("/") + path
+            self.format = options.get("mistral_format") or "ollama"
+
+    @classmethod
+    def from_config(cls, path: Path = ROUTE_CONFIG) -> "ChatSettings":
+        return cls(load_route_config(path))
+
+    def payload(
+        self, messages: list[dict[str, str]], stream: bool, json_output: bool = False
+    ) -> dict:
+        payload = {"messages": messages, "stream": stream and self.streaming}
+        if self.format == "ollama":
+            payload["model"] = self.model
+            if self.temperature is not None:
+                payload["options"] = {"temperature": self.temperature}
+            if json_output:
+                payload["format"] = "json"
+        else:
+            if self.temperature is not None:
+                payload["temperature"] = self.temperature
+            if json_output:
+                payload["response_format"] = {"type": "json_object"}
+        return payload
+
+    def parse_line(self, line: str) -> tuple[str, bool]:
+        # One streamed line to (text, finished), for SSE and NDJSON bodies ...
+        line = line.strip()
+        if not line or line.startswith(":"):
+            return "", False
+        if line.startswith("data:"):
+            line = line[5:].strip()
+            if line == "[DONE]":
+                return "", True
+        chunk = json.loads(line)
+        if "error" in chunk:
+            raise ChatError(str(chunk["error"]))
+        if "choices" in chunk:
+            choice = (chunk["choices"] or [{}])[0]
+            delta = choice.get("delta") or choice.get("message") or {}
+            return delta.get("content") or "", choice.get("finish_reason") is not None
+        message = chunk.get("message") or {}
+        return message.get("content") or "", bool(chunk.get("done"))
+
+
+class ChatEngine:
+    # Streams completions for the chat box, limiting concurrent generations
+    # per session and process. Tokens travel through a bounded queue, so a
+    # slow consumer pauses reading from the upstream instead of buffering
+    # the whole completion.
+
+    def __init__(
+        self,
+        settings: Optional[ChatSettings] = None,
+        max_per_session: int = MAX_PER_SESSION,
+        max_global: int = MAX_GLOBAL,
+    ):
+        self._settings = settings
+        self.max_per_session = max_per_session
+        self._global = asyncio.Semaphore(max_global)
+        self._active: Counter[str] = Counter()
+
+    @property
+    def settings(self) -> ChatSettings:
+        if self._settings is None:
+            self._settings = ChatSettings.from_config()
+        return self._settings
+
+    @asynccontextmanager
+    async def session_slot(self, token: str):
+        if self._active[token] >= self.max_per_session:
+            raise ChatBusy("a reply is already being generated for this session")
+        self._active[token] += 1
+        try:
+            async with self._global:
+                yield
+        finally:
+            self._active[token] -= 1
+            if not self._active[token]:
+                del self._active[token]
+
+    async def complete(
+        self, messages: list[dict[str, str]], json_output: bool = False
+    ) -> str:
+        settings = self.settings
+        async with http_pool.client(settings.url) as client:
+            res = await client.post(
+                settings.url,
+                json=settings.payload(messages, stream=False, json_output=json_output),
+                timeout=TIMEOUT,
+            )
+        res.raise_for_status()
+        text, _ = settings.parse_line(res.text)
+        return text
+
+    async def _read(self, messages: list[dict[str, str]], queue: asyncio.Queue):
+        settings = self.settings
+        try:
+            async with http_pool.client(settings.url) as client, client.stream(
+                "POST",
+                settings.url,
+                json=settings.payload(messages, stream=True),
+                timeout=TIMEOUT,
+            ) as res:
+                if res.status_code >= 400:
+                    await res.aread()
+                    raise ChatError(f"{res.status_code}: {res.text[:200]}")
+                async for line in res.aiter_lines():
+                    text, finished = settings.parse_line(line)
+                    if text:
+                        await queue.put(text)
+                    if finished:
+                        break
+        except Exception as error:
+            await queue.put(error)
+        # Not reached when cancelled, nobody is reading the queue by then ...
+        await queue.put(_DONE)
+
+    async def stream(self, messages: list[dict[str, str]]) -> AsyncIterator[str]:
+        # Yields the completion in batches, one per FLUSH_INTERVAL at most.
+        # Closing the iterator early cancels the upstream request ...
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        reader = asyncio.create_task(self._read(messages, queue))
+        try:
+            finished = False
+            while not finished:
+                parts = [await queue.get()]
+                await asyncio.sleep(FLUSH_INTERVAL)
+                while not queue.empty():
+                    parts.append(queue.get_nowait())
+
+                if parts[-1] is _DONE:
+                    finished = True
+                    parts.pop()
+                for part in parts:
+                    if isinstance(part, Exception):
+                        raise part
+                text = "".join(parts)
+                if text:
+                    yield text
+        finally:
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+
+
+chat_engine = ChatEngine()
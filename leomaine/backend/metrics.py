@@ -0,0 +1,215 @@
+import bisect
+import contextlib
+import time
+from typing import Iterator, Optional
+
+import httpx
+
+
+# upper bounds of the histogram buckets, seconds and bytes ...
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+SIZE_BUCKETS = tuple(1024 * 4**power for power in range(10))
+
+# order of the phases in a waterfall, `pool` is the wait for a client and
+# connection, and `connect` includes the DNS lookup (done inside it) ...
+PHASES = ("pool", "connect", "tls", "send", "wait", "download", "parse", "state")
+
+
+def _labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class Histogram:
+    # Cumulative buckets as Prometheus exposes them, plus count and sum.
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def lines(self, name: str, labels: dict[str, str]) -> list[str]:
+        lines, total = [], 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            bucket = _labels({**labels, "le": str(bound)})
+            lines.append(f"{name}_bucket{bucket} {total}")
+        lines.append(f"{name}_count{_labels(labels)} {self.count}")
+        lines.append(f"{name}_sum{_labels(labels)} {self.sum:.6f}")
+        return lines
+
+
+class MetricsRegistry:
+    # Process wide histograms and counters, keyed by name and label values,
+    # rendered in the Prometheus text format by `render`.
+
+    def __init__(self):
+        self._help: dict[str, tuple[str, str, tuple[float, ...]]] = {}
+        self._histograms: dict[tuple[str, tuple], Histogram] = {}
+        self._counters: dict[tuple[str, tuple], float] = {}
+
+    def histogram(self, name: str, description: str, buckets=LATENCY_BUCKETS):
+        self._help[name] = ("histogram", description, buckets)
+
+    def counter(self, name: str, description: str):
+        self._help[name] = ("counter", description, ())
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram(self._help[name][2])
+        histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def render(self) -> str:
+        lines = []
+        for name, (kind, description, _) in self._help.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (key, labels), histogram in sorted(self._histograms.items()):
+                if key == name:
+                    lines += histogram.lines(name, dict(labels))
+            for (key, labels), value in sorted(self._counters.items()):
+                if key == name:
+                    lines.append(f"{name}{_labels(dict(labels))} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestTrace:
+    # Timestamps of one upstream request, taken from httpcore's `trace`
+    # extension (connect, TLS, send, response headers and body), plus the
+    # phases timed around it by the caller (parsing, state updates).
+    # `waterfall` lays them out on one timeline starting at the request.
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.size = 0
+        self._events: dict[str, float] = {}
+        self._phases: dict[str, tuple[float, float]] = {}
+
+    @property
+    def extensions(self) -> dict:
+        return {"trace": self._trace}
+
+    async def _trace(self, event: str, info: dict):
+        # "http11.send_request_headers.started" -> "send_request_headers.started"
+        self._events.setdefault(event.split(".", 1)[1], time.perf_counter())
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._phases[name] = (started, time.perf_counter())
+
+    def _event(self, *names: str) -> Optional[float]:
+        return next((self._events[n] for n in names if n in self._events), None)
+
+    def _network(self) -> dict[str, tuple[float, float]]:
+        connect = self._event("connect_tcp.started")
+        send = self._event("send_request_headers.started")
+        sent = self._event(
+            "send_request_body.complete", "send_request_headers.complete"
+        )
+        headers = self._event("receive_response_headers.complete")
+        body = self._event(
+            "receive_response_body.complete", "response_closed.started"
+        )
+        if send is None:
+            return {}
+
+        spans = {"pool": (self.started, connect if connect is not None else send)}
+        if connect is not None:
+            tls = self._event("start_tls.started")
+            connected = self._event("connect_tcp.complete") or send
+            spans["connect"] = (connect, connected)
+            if tls is not None:
+                spans["tls"] = (tls, self._event("start_tls.complete") or send)
+        spans["send"] = (send, sent or send)
+        if headers is not None:
+            spans["wait"] = (sent or send, headers)
+            if body is not None:
+                spans["download"] = (headers, body)
+        return spans
+
+    def spans(self) -> dict[str, tuple[float, float]]:
+        return {**self._network(), **self._phases}
+
+    def waterfall(self) -> list[dict[str, str]]:
+        spans = self.spans()
+        if not spans:
+            return []
+        end = max(stop for _, stop in spans.values())
+        total = max(end - self.started, 1e-9)
+        rows = []
+        for name in PHASES:
+            if name not in spans:
+                continue
+            start, stop = spans[name]
+            rows.append(
+                {
+                    "phase": name,
+                    "ms": f"{(stop - start) * 1000:.2f}",
+                    "left": f"{(start - self.started) / total * 100:.1f}%",
+                    "width": f"{max((stop - start) / total * 100, 0.5):.1f}%",
+                }
+            )
+        return rows
+
+    def total_ms(self) -> float:
+        spans = self.spans()
+        if not spans:
+            return 0.0
+        return (max(stop for _, stop in spans.values()) - self.started) * 1000
+
+    def record(self, registry: "MetricsRegistry"):
+        for name, (start, stop) in self.spans().items():
+            registry.observe("leomaine_request_phase_seconds", stop - start, phase=name)
+        registry.observe("leomaine_request_seconds", self.total_ms() / 1000)
+        registry.observe("leomaine_response_bytes", self.size)
+
+
+async def count_response(response: httpx.Response):
+    # httpx event hook of the pooled clients, called once headers are in ...
+    metrics.inc(
+        "leomaine_upstream_responses_total",
+        method=response.request.method,
+        status=str(response.status_code),
+    )
+
+
+metrics = MetricsRegistry()
+metrics.histogram(
+    "leomaine_request_phase_seconds", "Time spent in each phase of a request."
+)
+metrics.histogram(
+    "leomaine_request_seconds", "Time from sending a request to showing its rows."
+)
+metrics.histogram(
+    "leomaine_response_bytes", "Size of upstream response bodies.", SIZE_BUCKETS
+)
+metrics.histogram("leomaine_handler_seconds", "Time spent in hot state handlers.")
+metrics.counter(
+    "leomaine_upstream_responses_total", "Upstream responses by method and status."
+)
+metrics.counter("leomaine_upstream_retries_total", "Upstream requests sent again.")
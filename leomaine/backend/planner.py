@@ -0,0 +1,174 @@
+import hashlib
+import json
+import re
+from collections import OrderedDict
+from typing import Any, Optional
+from urllib.parse import urljoin, urlsplit
+
+from leomaine.backend.llm import ChatEngine, chat_engine
+
+
+# compiled plans kept per process, and the largest page size a plan may ask for
+MAX_PLANS = 512
+MAX_LIMIT = 500
+
+# filler that does not change what a request should look like ...
+_FILLER = frozenset(
+    "a an the please can could you would me i want to show give fetch list "
+    "all some of".split()
+)
+_WORD = re.compile(r"[a-z0-9_./:-]+")
+_JSON_OBJECT = re.compile(r"\{.*\}", re.S)
+
+_INSTRUCTIONS = """\
+You turn a description of an HTTP request into the fields of an API client's
+request builder. Reply with one JSON object and nothing else:
+{"method": one of %(methods)s,
+ "url": absolute URL, or a path relative to the current URL,
+ "params": {query parameter: value},
+ "headers": {header name: value},
+ "body": {field: value},
+ "limit": rows per page as an integer, or null}
+Leave out nothing, use {} and null for what the description does not mention.
+The current request is %(method)s %(url)s.
+
+Example: "get posts by user 3, 20 per page" with current URL
+https://example.com/posts becomes
+{"method": "GET", "url": "https://example.com/posts", "params": {"userId": "3"},
+ "headers": {}, "body": {}, "limit": 20}"""
+
+
+class PlanError(ValueError):
+    pass
+
+
+def normalize(text: str) -> str:
+    return " ".join(
+        word for word in _WORD.findall(text.lower()) if word not in _FILLER
+    )
+
+
+def plan_key(text: str, base_url: str) -> str:
+    # Plans depend on the phrasing and on the URL they are relative to ...
+    phrase = f"{normalize(text)}\n{base_url.strip().lower()}"
+    return hashlib.sha256(phrase.encode()).hexdigest()
+
+
+def _string_map(entries: Any, field: str) -> dict[str, str]:
+    if entries is None:
+        return {}
+    if not isinstance(entries, dict):
+        raise PlanError(f"{field} must be an object")
+    return {
+        str(key): value if isinstance(value, str) else json.dumps(value)
+        for key, value in entries.items()
+        if str(key).strip()
+    }
+
+
+def validate(raw: Any, methods: list[str], base_url: str) -> dict:
+    # Check a model reply against what the request builder can hold ...
+    if isinstance(raw, str):
+        match = _JSON_OBJECT.search(raw)
+        if match is None:
+            raise PlanError("the model did not reply with a JSON object")
+        try:
+            raw = json.loads(match.group())
+        except ValueError as error:
+            raise PlanError(f"the model replied with invalid JSON: {error}")
+    if not isinstance(raw, dict):
+        raise PlanError("a plan must be a JSON object")
+
+    method = str(raw.get("method") or "GET").upper()
+    if method not in methods:
+        raise PlanError(f"unsupported method {method!r}")
+
+    url = urljoin(base_url, str(raw.get("url") or base_url).strip())
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        raise PlanError(f"not an http(s) URL: {url!r}")
+
+    limit = raw.get("limit")
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise PlanError(f"limit must be an integer, got {limit!r}")
+        if not 1 <= limit <= MAX_LIMIT:
+            raise PlanError(f"limit must be between 1 and {MAX_LIMIT}")
+
+    return {
+        "method": method,
+        "url": url,
+        "params": _string_map(raw.get("params"), "params"),
+        "headers": _string_map(raw.get("headers"), "headers"),
+        "body": _string_map(raw.get("body"), "body"),
+        "limit": limit,
+    }
+
+
+class PlanCache:
+    # Least recently used compiled plans, keyed by `plan_key` ...
+
+    def __init__(self, max_plans: int = MAX_PLANS):
+        self.max_plans = max_plans
+        self._plans: OrderedDict[str, dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        plan = self._plans.get(key)
+        if plan is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._plans.move_to_end(key)
+        return plan
+
+    def put(self, key: str, plan: dict):
+        self._plans[key] = plan
+        self._plans.move_to_end(key)
+        while len(self._plans) > self.max_plans:
+            self._plans.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "plans": len(self._plans)}
+
+
+class Planner:
+    # Compiles a sentence into request builder fields with one structured
+    # output completion, reusing the compiled plan when the same intent is
+    # phrased again.
+
+    def __init__(
+        self, engine: ChatEngine = chat_engine, cache: Optional[PlanCache] = None
+    ):
+        self.engine = engine
+        self.cache = cache if cache is not None else PlanCache()
+
+    async def plan(
+        self, text: str, method: str, base_url: str, methods: list[str]
+    ) -> tuple[dict, bool]:
+        key = plan_key(text, base_url)
+        plan = self.cache.get(key)
+        if plan is not None:
+            return dict(plan), True
+
+        prompt = _INSTRUCTIONS % {
+            "methods": json.dumps(methods),
+            "method": method,
+            "url": base_url,
+        }
+        reply = await self.engine.complete(
+            [
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": text},
+            ],
+            json_output=True,
+        )
+        plan = validate(reply, methods, base_url)
+        self.cache.put(key, plan)
+        return dict(plan), False
+
+
+planner = Planner()
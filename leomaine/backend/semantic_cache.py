@@ -0,0 +1,205 @@
+import itertools
+import os
+import re
+import time
+import zlib
+from typing import Optional
+
+import numpy as np
+
+from leomaine.backend.context import STOPWORDS
+
+
+# Answers are reused when a new question is at least this similar (cosine)
+# to a cached one asked over the same dataset ...
+SIMILARITY = float(os.environ.get("LEOMAINE_SEMANTIC_THRESHOLD", "0.9"))
+TTL = float(os.environ.get("LEOMAINE_SEMANTIC_TTL", "3600"))
+MAX_ENTRIES = 2048
+DIMENSIONS = 1024
+
+_WORD = re.compile(r"\w+")
+# quoted values, numbers and identifiers (anything with a digit or an
+# underscore), which change the answer however similar the rest reads ...
+_LITERAL = re.compile(r'"[^"]*"|`[^`]*`|\w*[\d_][\w.]*')
+
+
+def literals(text: str) -> tuple[str, ...]:
+    return tuple(
+        token if token[0] in "\"`" else token.lower().rstrip(".")
+        for token in _LITERAL.findall(text)
+    )
+
+
+class HashingVectorizer:
+    # Hashing-trick embedding: word unigrams, word bigrams and character
+    # trigrams of the content words, hashed into a fixed number of signed
+    # buckets and L2 normalized.
+    # Close rephrasings and typos keep most of their features, so they land
+    # near each other without needing an embedding model.
+
+    def __init__(self, dimensions: int = DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _features(self, text: str) -> list[tuple[str, float]]:
+        words = [
+            word
+            for word in _WORD.findall(text.lower())
+            if (len(word) > 1 or word.isdigit()) and word not in STOPWORDS
+        ]
+        features = [(word, 1.0) for word in words]
+        features += [(f"{a} {b}", 1.0) for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"<{word}>"
+            features += [
+                (padded[i : i + 3], 0.5) for i in range(len(padded) - 2)
+            ]
+        return features
+
+    def __call__(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, weight in self._features(text):
+            bucket = zlib.crc32(feature.encode())
+            sign = 1.0 if bucket & 0x80000000 else -1.0
+            vector[bucket % self.dimensions] += sign * weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SemanticCache:
+    # Chat answers keyed by question embedding, dataset fingerprint and the
+    # exact literals of the question (see `literals`), so "user 3" never gets
+    # the answer given for "user 7". The
+    # embeddings sit in one matrix (grown by doubling up to `max_entries`),
+    # so a lookup is a single matrix-vector product over the live rows.
+    # Entries expire after `ttl` seconds, never match another dataset's
+    # fingerprint, and the least recently used one is replaced when full.
+
+    def __init__(
+        self,
+        threshold: float = SIMILARITY,
+        ttl: float = TTL,
+        max_entries: int = MAX_ENTRIES,
+        vectorizer: Optional[HashingVectorizer] = None,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.vectorize = vectorizer or HashingVectorizer()
+        self._scope_ids: dict[str, int] = {}
+        self._next_scope = itertools.count()
+
+        # per slot: embedding, dataset scope (-1 = free), hash of the
+        # question's literals, expiry, last use, how long the answer took to
+        # generate, the literals and the answer itself ...
+        capacity = min(64, max_entries)
+        self._vectors = np.zeros((capacity, self.vectorize.dimensions), np.float32)
+        self._scopes = np.full(capacity, -1, np.int64)
+        self._literal_keys = np.zeros(capacity, np.int64)
+        self._expires = np.zeros(capacity)
+        self._used = np.zeros(capacity)
+        self._latency = np.zeros(capacity)
+        self._literals: list[tuple[str, ...]] = [()] * capacity
+        self._answers: list[str] = [""] * capacity
+
+        self.lookups = 0
+        self.hits = 0
+        self.saved_seconds = 0.0
+
+    def _grow(self, capacity: int):
+        def grow(array: np.ndarray, fill: float) -> np.ndarray:
+            grown = np.full((capacity,) + array.shape[1:], fill, array.dtype)
+            grown[: len(array)] = array
+            return grown
+
+        self._vectors = grow(self._vectors, 0.0)
+        self._scopes = grow(self._scopes, -1)
+        self._literal_keys = grow(self._literal_keys, 0)
+        self._expires = grow(self._expires, 0.0)
+        self._used = grow(self._used, 0.0)
+        self._latency = grow(self._latency, 0.0)
+        self._literals += [()] * (capacity - len(self._literals))
+        self._answers += [""] * (capacity - len(self._answers))
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._scopes >= 0))
+
+    def _scope(self, fingerprint: str) -> int:
+        scope = self._scope_ids.get(fingerprint)
+        if scope is None:
+            scope = self._scope_ids[fingerprint] = next(self._next_scope)
+        return scope
+
+    @staticmethod
+    def _literal_key(values: tuple[str, ...]) -> int:
+        return zlib.crc32("\0".join(values).encode())
+
+    def lookup(self, question: str, fingerprint: str) -> Optional[str]:
+        now = time.monotonic()
+        self.lookups += 1
+        scope = self._scope_ids.get(fingerprint)
+        if scope is None:
+            return None
+        values = literals(question)
+        slots = np.flatnonzero(
+            (self._scopes == scope)
+            & (self._literal_keys == self._literal_key(values))
+            & (self._expires > now)
+        )
+        slots = [slot for slot in slots if self._literals[slot] == values]
+        if not slots:
+            return None
+
+        scores = self._vectors[slots] @ self.vectorize(question)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+
+        slot = slots[best]
+        self.hits += 1
+        self.saved_seconds += float(self._latency[slot])
+        self._used[slot] = now
+        return self._answers[slot]
+
+    def _free_slot(self, now: float) -> int:
+        free = np.flatnonzero((self._scopes < 0) | (self._expires <= now))
+        if len(free):
+            return int(free[0])
+        if len(self._answers) < self.max_entries:
+            slot = len(self._answers)
+            self._grow(min(len(self._answers) * 2, self.max_entries))
+            return slot
+        return int(np.argmin(self._used))
+
+    def store(self, question: str, fingerprint: str, answer: str, latency: float):
+        now = time.monotonic()
+        slot = self._free_slot(now)
+        self._vectors[slot] = self.vectorize(question)
+        self._scopes[slot] = self._scope(fingerprint)
+        self._literals[slot] = literals(question)
+        self._literal_keys[slot] = self._literal_key(self._literals[slot])
+        self._answers[slot] = answer
+        self._expires[slot] = now + self.ttl
+        self._used[slot] = now
+        self._latency[slot] = latency
+
+    def invalidate(self, fingerprint: str):
+        # Drop every answer given over a dataset that has since changed ...
+        scope = self._scope_ids.pop(fingerprint, None)
+        if scope is None:
+            return
+        for slot in np.flatnonzero(self._scopes == scope):
+            self._scopes[slot] = -1
+            self._literals[slot] = ()
+            self._answers[slot] = ""
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "entries": len(self),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 2),
+        }
+
+
+semantic_cache = SemanticCache()
@@ -0,0 +1,188 @@
+import json
+import os
+from typing import Any, Iterable, Optional
+
+
+# levels of nested objects flattened into dotted columns, anything deeper
+# is kept as a Subtree until it is expanded ...
+FLATTEN_DEPTH = int(os.environ.get("LEOMAINE_FLATTEN_DEPTH", "2"))
+
+# arrays of plain values up to this length stay inline in their cell ...
+INLINE_ITEMS = 8
+
+# names record arrays are commonly wrapped under, checked before falling
+# back to the largest array of objects in the envelope ...
+ENVELOPE_KEYS = ("data", "items", "results", "records", "rows", "entries")
+ENVELOPE_DEPTH = 3
+
+
+# the text nested values compare by, one encoder for every value since
+# `json.dumps` with options builds a new one per call ...
+canonical_json = json.JSONEncoder(sort_keys=True, default=str).encode
+
+
+class Subtree:
+    # A nested object or array kept whole in one cell. Pages show its
+    # summary ("{4 keys}", "[120 items]"); the JSON text is only produced
+    # when a row is opened, and expanding its column flattens it further.
+
+    __slots__ = ("value", "_text")
+
+    def __init__(self, value: dict | list):
+        self.value = value
+        self._text: Optional[str] = None
+
+    @property
+    def is_object(self) -> bool:
+        return isinstance(self.value, dict)
+
+    def to_json(self, indent: Optional[int] = None) -> str:
+        return json.dumps(self.value, indent=indent, default=str)
+
+    def _key(self) -> str:
+        if self._text is None:
+            self._text = canonical_json(self.value)
+        return self._text
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Subtree) and self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __str__(self) -> str:
+        size = len(self.value)
+        if self.is_object:
+            return f"{{{size} key{'s' * (size != 1)}}}"
+        return f"[{size} item{'s' * (size != 1)}]"
+
+    __repr__ = __str__
+
+
+def _is_records(value: Any) -> bool:
+    return isinstance(value, list) and (
+        not value or any(isinstance(item, dict) for item in value[:10])
+    )
+
+
+def find_records(payload: Any) -> tuple[list, str]:
+    # The record array in a response body and the dotted path it was found
+    # under ("" for the root). A known envelope key wins, otherwise the
+    # largest array of objects within ENVELOPE_DEPTH levels. An object
+    # without any such array is one record, an empty body none ...
+    if isinstance(payload, list):
+        return payload, ""
+    if payload is None:
+        return [], ""
+    if not isinstance(payload, dict):
+        return [payload], ""
+
+    for key in ENVELOPE_KEYS:
+        if _is_records(payload.get(key)):
+            return payload[key], key
+
+    best: tuple[list, str] = ([], "")
+    frontier = [("", payload)]
+    for _ in range(ENVELOPE_DEPTH):
+        deeper = []
+        for path, node in frontier:
+            for key, value in node.items():
+                name = f"{path}.{key}" if path else str(key)
+                if _is_records(value) and len(value) > len(best[0]):
+                    best = (value, name)
+                elif isinstance(value, dict):
+                    deeper.append((name, value))
+        frontier = deeper
+    if best[1]:
+        return best
+    return [payload], ""
+
+
+def _is_inline(value: list) -> bool:
+    return len(value) <= INLINE_ITEMS and not any(
+        isinstance(item, (dict, list)) for item in value
+    )
+
+
+def flatten(
+    record: Any, depth: int = FLATTEN_DEPTH, nested: Optional[set[str]] = None
+) -> dict:
+    # One record as a flat row: nested objects become dotted columns for
+    # `depth` levels, deeper objects and non-trivial arrays become Subtrees.
+    # Columns holding object Subtrees are added to `nested` ...
+    if not isinstance(record, dict):
+        if isinstance(record, list) and not _is_inline(record):
+            record = Subtree(record)
+        return {"value": record}
+
+    row = {}
+
+    def walk(prefix: str, node: dict, level: int):
+        for key, value in node.items():
+            name = f"{prefix}{key}"
+            if isinstance(value, dict) and value:
+                if level < depth:
+                    walk(f"{name}.", value, level + 1)
+                    continue
+                value = Subtree(value)
+                if nested is not None:
+                    nested.add(name)
+            elif isinstance(value, list) and not _is_inline(value):
+                value = Subtree(value)
+            row[name] = value
+
+    walk("", record, 0)
+    return row
+
+
+class RecordShaper:
+    # Shapes every page or chunk of one response the same way, and keeps
+    # what it learned: where the records were and which columns can be
+    # expanded further.
+
+    def __init__(self, depth: int = FLATTEN_DEPTH):
+        self.depth = max(depth, 0)
+        self.path = ""
+        self.nested: set[str] = set()
+
+    def records(self, payload: Any) -> list[dict]:
+        records, self.path = find_records(payload)
+        return self.rows(records)
+
+    def rows(self, records: Iterable[Any]) -> list[dict]:
+        return [flatten(record, self.depth, self.nested) for record in records]
+
+    def copy(self) -> "RecordShaper":
+        clone = RecordShaper(self.depth)
+        clone.path = self.path
+        clone.nested = set(self.nested)
+        return clone
+
+
+def expand_values(
+    column: str, values: Iterable[Any], nested: Optional[set[str]] = None
+) -> dict[str, list]:
+    # One more level of an object column: a list per child column, None
+    # where a row has no such child. Rows holding something other than an
+    # object keep it under `column` itself ...
+    values = list(values)
+    children: dict[str, list] = {}
+    inner: set[str] = set()
+
+    def cells(name: str) -> list:
+        found = children.get(name)
+        if found is None:
+            found = children[name] = [None] * len(values)
+        return found
+
+    for position, value in enumerate(values):
+        if isinstance(value, Subtree) and value.is_object:
+            for key, child in flatten(value.value, 0, inner).items():
+                cells(f"{column}.{key}")[position] = child
+        elif value is not None:
+            cells(column)[position] = value
+
+    if nested is not None:
+        nested.discard(column)
+        nested.update(f"{column}.{key}" for key in inner)
+    return children
@@ -0,0 +1,265 @@
+import uuid
+from array import array
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+from leomaine.backend.context import DatasetContext
+from leomaine.backend.crawler import Crawler
+from leomaine.backend.indexing import ResultIndex
+from leomaine.backend.shape import RecordShaper
+
+
+# how many sessions keep a loaded result set in this process ...
+MAX_SESSIONS = 256
+
+# typed arrays used to pack homogeneous numeric columns ...
+_PACKED_TYPES = {int: "q", float: "d"}
+
+
+def _pack(values: list) -> list | array:
+    if not values:
+        return values
+    kind = type(values[0])
+    typecode = _PACKED_TYPES.get(kind)
+    if typecode is None or any(type(value) is not kind for value in values):
+        return values
+    try:
+        return array(typecode, values)
+    except OverflowError:
+        return values
+
+
+class ResultSet:
+    # Full decoded response, kept on the backend only and stored column-wise:
+    # one list (or packed array) per column plus a shared header index, so
+    # rows never carry their own dict or key strings. Heterogeneous rows
+    # widen the header set, earlier rows read None for the new columns. The
+    # browser only ever receives the dicts rebuilt by `page`.
+
+    def __init__(self, rows: Optional[Iterable[Any]] = None):
+        self.headers: list[str] = []
+        self.index: dict[str, int] = {}
+        self.columns: list[list | array] = []
+        self.size = 0
+        self.version = 0
+        if rows:
+            self.extend(rows)
+            self.compact()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _add_column(self, name: str):
+        self.index[name] = len(self.headers)
+        self.headers.append(name)
+        self.columns.append([None] * self.size)
+
+    def _unpack(self, position: int) -> list:
+        column = self.columns[position]
+        if isinstance(column, array):
+            column = self.columns[position] = column.tolist()
+        return column
+
+    def extend(self, rows: Iterable[Any]):
+        rows = [row if isinstance(row, dict) else {"value": row} for row in rows]
+        if not rows:
+            return
+
+        for row in rows:
+            for key in row:
+                if key not in self.index:
+                    self._add_column(key)
+
+        for position, name in enumerate(self.headers):
+            values = [row.get(name) for row in rows]
+            column = self.columns[position]
+            if isinstance(column, array):
+                packed = _pack(values)
+                if isinstance(packed, array) and packed.typecode == column.typecode:
+                    column.extend(packed)
+                    continue
+                column = self._unpack(position)
+            column.extend(values)
+
+        self.size += len(rows)
+        self.version += 1
+
+    def copy(self) -> "ResultSet":
+        clone = ResultSet()
+        clone.headers = list(self.headers)
+        clone.index = dict(self.index)
+        clone.columns = [column[:] for column in self.columns]
+        clone.size = self.size
+        return clone
+
+    def splice_column(self, name: str, columns: dict[str, list]) -> dict[str, str]:
+        # Replace column `name` by `columns` (each as long as the result) in
+        # its place, e.g. a nested column by its children. A name already
+        # taken by another column gets a numbered suffix ("a.b_2"), the
+        # renamed ones are returned as {name: new name} ...
+        taken = set(self.index) | set(columns)
+        renamed = {}
+        for key in columns:
+            if key != name and key in self.index:
+                suffix = 2
+                while f"{key}_{suffix}" in taken:
+                    suffix += 1
+                renamed[key] = f"{key}_{suffix}"
+                taken.add(renamed[key])
+        columns = {renamed.get(key, key): values for key, values in columns.items()}
+        position = self.index[name]
+        self.headers[position : position + 1] = list(columns)
+        self.columns[position : position + 1] = list(columns.values())
+        self.index = {header: i for i, header in enumerate(self.headers)}
+        self.version += 1
+        return renamed
+
+    def compact(self):
+        self.columns = [
+            column if isinstance(column, array) else _pack(column)
+            for column in self.columns
+        ]
+
+    def column(self, name: str) -> list | array:
+        return self.columns[self.index[name]]
+
+    def row(self, position: int) -> dict:
+        return {
+            name: column[position]
+            for name, column in zip(self.headers, self.columns)
+        }
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> list[dict]:
+        sliced = [column[start:stop] for column in self.columns]
+        return [dict(zip(self.headers, values)) for values in zip(*sliced)]
+
+    def set_row(self, position: int, data: dict):
+        for key in data:
+            if key not in self.index:
+                self._add_column(key)
+
+        for name, value in data.items():
+            column_position = self.index[name]
+            column = self.columns[column_position]
+            if isinstance(column, array) and type(value) is not type(column[0]):
+                column = self._unpack(column_position)
+            column[position] = value
+        self.version += 1
+
+    def rows_at(self, positions: Iterable[int]) -> list[dict]:
+        return [
+            dict(zip(self.headers, [column[position] for column in self.columns]))
+            for position in positions
+        ]
+
+    def page(self, offset: int, limit: int) -> list[dict]:
+        return self.rows(offset, offset + limit)
+
+
+class SessionData:
+    # Everything one session keeps on the backend for its loaded response:
+    # the result set, its lazily built index and chat context, the current
+    # row view (positions after sort/filter/search, None for the natural
+    # order) and the row ids of the page last sent to the browser. A row's
+    # id is its position in the result set, which never changes since rows
+    # are only ever appended, and `run_id` tells this result set from the
+    # one that replaces it. `request` is the (method, URL) the rows were
+    # fetched with (None for an import) and `previous` an earlier result
+    # set, fetched with `previous_request`, kept to diff two runs of one
+    # request against each other. `shape` records where the rows were found
+    # in the body and which columns can still be expanded, and `crawler`
+    # continues an upstream's pagination after a crawl.
+
+    def __init__(
+        self,
+        result: Optional[ResultSet] = None,
+        shape: Optional[RecordShaper] = None,
+    ):
+        self.result = result if result is not None else ResultSet()
+        self.shape = shape if shape is not None else RecordShaper()
+        self.run_id = uuid.uuid4().hex
+        self.request: Optional[tuple[str, str]] = None
+        self.previous: Optional[ResultSet] = None
+        self.previous_request: Optional[tuple[str, str]] = None
+        self.crawler: Optional[Crawler] = None
+        self.view: Optional[list[int]] = None
+        self.page_ids: list[int] = []
+        self._index: Optional[ResultIndex] = None
+        self._context: Optional[DatasetContext] = None
+
+    @property
+    def index(self) -> ResultIndex:
+        if self._index is None or self._index.is_stale:
+            self._index = ResultIndex(self.result)
+        return self._index
+
+    @property
+    def context(self) -> DatasetContext:
+        if self._context is None or self._context.is_stale:
+            self._context = DatasetContext(self.result, self.index)
+        return self._context
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        # Only known once the chat context has been built ...
+        return self._context.fingerprint if self._context is not None else None
+
+    def replaces(self, current: "SessionData"):
+        # Keep the result being replaced as the previous run, unless it came
+        # from another request (or has no rows) while `current` still keeps
+        # an earlier run of this session's request ...
+        if (
+            self.request is not None
+            and current.previous_request == self.request
+            and (current.request != self.request or not len(current.result))
+        ):
+            self.previous = current.previous
+            self.previous_request = current.previous_request
+        elif len(current.result):
+            self.previous = current.result
+            self.previous_request = current.request
+
+    @property
+    def previous_run(self) -> Optional[ResultSet]:
+        # The previous result only diffs against this one if both were
+        # fetched by the same request ...
+        if self.request is None or self.previous_request != self.request:
+            return None
+        return self.previous
+
+    def __len__(self) -> int:
+        return len(self.result) if self.view is None else len(self.view)
+
+    def page(self, offset: int, limit: int) -> list[dict]:
+        if self.view is None:
+            self.page_ids = list(range(offset, min(offset + limit, len(self.result))))
+            return self.result.page(offset, limit)
+        self.page_ids = self.view[offset : offset + limit]
+        return self.result.rows_at(self.page_ids)
+
+
+class SessionStore:
+    # Process local session data keyed by the session's client token, evicting
+    # the least recently used session once `max_sessions` is reached.
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions: OrderedDict[str, SessionData] = OrderedDict()
+
+    def get(self, token: str) -> Optional[SessionData]:
+        session = self._sessions.get(token)
+        if session is not None:
+            self._sessions.move_to_end(token)
+        return session
+
+    def put(self, token: str, session: SessionData):
+        self._sessions[token] = session
+        self._sessions.move_to_end(token)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def drop(self, token: str):
+        self._sessions.pop(token, None)
+
+
+result_store = SessionStore()
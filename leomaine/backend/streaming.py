@@ -0,0 +1,104 @@
+import codecs
+import json
+from typing import Any
+
+
+# default ceilings for a single streamed response ...
+MAX_STREAM_BYTES = 256 * 1024 * 1024
+MAX_STREAM_ROWS = 1_000_000
+
+_WHITESPACE = " \t\n\r"
+
+
+class StreamLimitExceeded(ValueError):
+    # A ValueError, so callers report it like any other unreadable body ...
+    pass
+
+
+class JSONArrayStream:
+    # Incremental parser for a response body whose root is a JSON array.
+    # Chunks go in through `feed`, and every complete top-level element comes
+    # back out as soon as it has been received. Any other root is buffered and
+    # decoded once in `close`.
+
+    def __init__(
+        self, max_bytes: int = MAX_STREAM_BYTES, max_rows: int = MAX_STREAM_ROWS
+    ):
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.bytes_read = 0
+        self.rows_read = 0
+        self.is_array: bool | None = None
+        self.done = False
+        self.truncated = False
+        self._buf = ""
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+
+    def feed(self, chunk: bytes) -> list[Any]:
+        if self.done:
+            return []
+
+        self.bytes_read += len(chunk)
+        if self.bytes_read > self.max_bytes:
+            self.done = self.truncated = True
+            if not self.is_array:
+                raise StreamLimitExceeded(
+                    f"response is larger than {self.max_bytes} bytes"
+                )
+            return []
+
+        self._buf += self._utf8.decode(chunk)
+        if self.is_array is None:
+            stripped = self._buf.lstrip(_WHITESPACE)
+            if not stripped:
+                return []
+            self.is_array = stripped[0] == "["
+            self._buf = stripped[1:] if self.is_array else stripped
+
+        return self._drain() if self.is_array else []
+
+    def _drain(self) -> list[Any]:
+        rows = []
+        buf, pos, size = self._buf, 0, len(self._buf)
+        while pos < size:
+            char = buf[pos]
+            if char in _WHITESPACE or char == ",":
+                pos += 1
+                continue
+            if char == "]":
+                self.done = True
+                break
+
+            try:
+                value, end = self._decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break
+            # A value that runs to the very end of the buffer (e.g. a number)
+            # may still be incomplete, wait for the next chunk ...
+            if end >= size:
+                break
+
+            rows.append(value)
+            pos = end
+            self.rows_read += 1
+            if self.rows_read >= self.max_rows:
+                self.done = self.truncated = True
+                break
+
+        self._buf = buf[pos:]
+        return rows
+
+    def close(self) -> list[Any]:
+        self._buf += self._utf8.decode(b"", final=True)
+        if self.is_array is False:
+            value = json.loads(self._buf)
+            self._buf = ""
+            self.done = True
+            return value if isinstance(value, list) else [value]
+
+        rows = [] if self.done or self.is_array is None else self._drain()
+        if self.is_array and not self.done:
+            raise json.JSONDecodeError("unterminated JSON array", self._buf, 0)
+        self.done = True
+        return rows
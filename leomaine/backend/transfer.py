@@ -0,0 +1,370 @@
+import asyncio
+import csv
+import io
+import json
+from array import array
+from itertools import islice, zip_longest
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterable, Iterator, Optional
+
+from leomaine.backend.shape import Subtree, find_records
+from leomaine.backend.store import ResultSet
+from leomaine.backend.streaming import MAX_STREAM_ROWS, JSONArrayStream
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+
+# rows written per chunk of an export (and per record batch or row group),
+# rows and bytes read per step of an import ...
+EXPORT_ROWS = 5000
+IMPORT_ROWS = 5000
+IMPORT_BYTES = 1024 * 1024
+
+# most rows an import loads, like a streamed response ...
+MAX_IMPORT_ROWS = MAX_STREAM_ROWS
+
+# format -> (media type, file extension) ...
+_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+_ARROW_FORMATS = ("parquet", "arrow")
+
+_SUFFIXES = {
+    ".csv": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".json": "json",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".arrows": "arrow",
+    ".feather": "arrow",
+}
+
+# the formats the optional dependencies allow, offered by the UI ...
+EXPORT_FORMATS = [
+    name for name in _FORMATS if ARROW_AVAILABLE or name not in _ARROW_FORMATS
+]
+IMPORT_FORMATS = sorted(
+    name
+    for name in set(_SUFFIXES.values())
+    if ARROW_AVAILABLE or name not in _ARROW_FORMATS
+)
+
+
+def media_type(fmt: str) -> str:
+    return _FORMATS[fmt][0]
+
+
+def file_name(fmt: str, stem: str = "leomaine") -> str:
+    return f"{stem}.{_FORMATS[fmt][1]}"
+
+
+# why a format can't be used here, shown as the export or import error ...
+ARROW_MISSING = (
+    "{} needs the optional pyarrow package, install it with "
+    "`poetry install --extras arrow` or `pip install pyarrow`"
+)
+
+
+def import_format(path: Path) -> str:
+    fmt = _SUFFIXES.get(path.suffix.lower())
+    if fmt in _ARROW_FORMATS and not ARROW_AVAILABLE:
+        raise ValueError(ARROW_MISSING.format(f"importing '{path.name}'"))
+    if fmt is None or fmt not in IMPORT_FORMATS:
+        raise ValueError(
+            f"can't import '{path.name}', expected one of "
+            + ", ".join(
+                sorted(suffix for suffix, f in _SUFFIXES.items() if f in IMPORT_FORMATS)
+            )
+        )
+    return fmt
+
+
+def _json(value: Any) -> Any:
+    return value.value if isinstance(value, Subtree) else str(value)
+
+
+# one encoder for every cell, `json.dumps` with options builds a new one
+# per call ...
+_encode = json.JSONEncoder(default=_json, ensure_ascii=False).encode
+
+
+def _text(value: Any) -> Optional[str]:
+    # One cell as text, nested values as their JSON ...
+    if type(value) is str or value is None:
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (Subtree, dict, list)):
+        return _encode(value)
+    return str(value)
+
+
+def _batches(
+    result: ResultSet, positions: Optional[list[int]], size: int
+) -> Iterator[list[list | array]]:
+    # The columns to export, `size` rows at a time and in the view's order
+    # if there is one. Only one batch is ever materialized ...
+    if positions is None:
+        for start in range(0, len(result), size):
+            yield [column[start : start + size] for column in result.columns]
+    else:
+        for start in range(0, len(positions), size):
+            chunk = positions[start : start + size]
+            yield [[column[i] for i in chunk] for column in result.columns]
+
+
+def _csv_chunks(result: ResultSet, positions: Optional[list[int]]) -> Iterator[bytes]:
+    # Packed numeric columns go to the writer as they are, it writes None as
+    # an empty cell ...
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(result.headers)
+    for columns in _batches(result, positions, EXPORT_ROWS):
+        writer.writerows(
+            zip(
+                *(
+                    column if isinstance(column, array) else list(map(_text, column))
+                    for column in columns
+                )
+            )
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _ndjson_chunks(
+    result: ResultSet, positions: Optional[list[int]]
+) -> Iterator[bytes]:
+    headers = result.headers
+    for columns in _batches(result, positions, EXPORT_ROWS):
+        yield "".join(
+            _encode(dict(zip(headers, values))) + "\n" for values in zip(*columns)
+        ).encode()
+
+
+def _arrow_type(column: list | array):
+    # One type per column for the whole export, so every batch matches the
+    # schema written up front. Anything mixed or nested is written as text ...
+    if isinstance(column, array):
+        return pa.int64() if column.typecode == "q" else pa.float64()
+    kinds = {type(value) for value in column if value is not None}
+    if kinds == {bool}:
+        return pa.bool_()
+    if kinds == {int}:
+        return pa.int64()
+    if kinds and kinds <= {int, float}:
+        return pa.float64()
+    return pa.string()
+
+
+class _Drain(io.RawIOBase):
+    # File object the Arrow writers write into, emptied after every batch ...
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+        self.written = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.written += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.written
+
+    def take(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def _arrow_chunks(
+    result: ResultSet, positions: Optional[list[int]], fmt: str
+) -> Iterator[bytes]:
+    schema = pa.schema(
+        [(name, _arrow_type(result.column(name))) for name in result.headers]
+    )
+    text = {field.name for field in schema if field.type == pa.string()}
+    sink = _Drain()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    try:
+        for columns in _batches(result, positions, EXPORT_ROWS):
+            arrays = [
+                pa.array(
+                    list(map(_text, column)) if field.name in text else column,
+                    type=field.type,
+                )
+                for field, column in zip(schema, columns)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def export_chunks(
+    result: ResultSet, positions: Optional[list[int]], fmt: str
+) -> Iterator[bytes]:
+    # The rows of `result` (those at `positions`, in that order, if given)
+    # encoded as `fmt`, one chunk of EXPORT_ROWS rows at a time, for a
+    # streaming response ...
+    if fmt in _ARROW_FORMATS and not ARROW_AVAILABLE:
+        raise ValueError(ARROW_MISSING.format(f"{fmt} export"))
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format '{fmt}'")
+    if fmt == "csv":
+        return _csv_chunks(result, positions)
+    if fmt == "ndjson":
+        return _ndjson_chunks(result, positions)
+    return _arrow_chunks(result, positions, fmt)
+
+
+def _number(text: str) -> Optional[int | float]:
+    # A number only if written the way the export writes numbers, so "007",
+    # "1_000" or " 5" stay text ...
+    for kind in (int, float):
+        try:
+            value = kind(text)
+        except ValueError:
+            continue
+        return value if repr(value) == text else None
+    return None
+
+
+def _numeric_columns(rows: list[list[str]]) -> list[bool]:
+    # Numeric columns were exported from packed number columns, so every
+    # cell is a number or empty. Decided on the first chunk of rows ...
+    return [
+        any(column) and all(cell == "" or _number(cell) is not None for cell in column)
+        for column in zip_longest(*rows, fillvalue="")
+    ]
+
+
+def _csv_value(text: str, numeric: bool) -> Any:
+    # CSV cells back to the values they were exported from ...
+    if text == "":
+        return None
+    if numeric:
+        value = _number(text)
+        return text if value is None else value
+    if text in ("true", "false"):
+        return text == "true"
+    if text[0] in "{[":
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
+    return text
+
+
+def _take_csv(
+    reader: Iterable[list[str]], headers: list[str], numeric: list[bool]
+) -> list[dict]:
+    rows = list(islice(reader, IMPORT_ROWS))
+    if rows and not numeric:
+        numeric += _numeric_columns(rows)
+    return [
+        dict(zip(headers, map(_csv_value, values, numeric))) for values in rows
+    ]
+
+
+def _take_lines(file) -> Optional[list]:
+    lines = list(islice(file, IMPORT_ROWS))
+    if not lines:
+        return None
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+class Importer:
+    # Reads a local file into records a chunk at a time, off the event loop.
+    # `read` yields lists of records, `position` and `size` are bytes read
+    # of the file, `truncated` is set when MAX_IMPORT_ROWS was reached.
+
+    def __init__(self, path: Path, fmt: str, max_rows: int = MAX_IMPORT_ROWS):
+        self.path = path
+        self.fmt = fmt
+        self.max_rows = max_rows
+        self.size = path.stat().st_size
+        self.rows = 0
+        self.truncated = False
+        self._file: Optional[io.BufferedReader] = None
+
+    @property
+    def position(self) -> int:
+        return self._file.tell() if self._file is not None else 0
+
+    async def _chunks(self) -> AsyncIterator[list]:
+        file = self._file
+        if self.fmt == "csv":
+            text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+            reader = csv.reader(text)
+            headers = await asyncio.to_thread(next, reader, [])
+            numeric: list[bool] = []
+            while records := await asyncio.to_thread(
+                _take_csv, reader, headers, numeric
+            ):
+                yield records
+        elif self.fmt == "ndjson":
+            text = io.TextIOWrapper(file, encoding="utf-8-sig")
+            while (records := await asyncio.to_thread(_take_lines, text)) is not None:
+                yield records
+        elif self.fmt == "json":
+            parser = JSONArrayStream(max_rows=self.max_rows)
+            while chunk := await asyncio.to_thread(file.read, IMPORT_BYTES):
+                yield parser.feed(chunk)
+                if parser.done:
+                    break
+            # A root other than an array is read whole, envelope and all, an
+            # empty file has no records ...
+            closing = parser.close()
+            if parser.is_array or not closing:
+                yield closing
+            else:
+                yield find_records(closing[0])[0]
+        else:
+            if self.fmt == "parquet":
+                batches = pq.ParquetFile(file).iter_batches(IMPORT_ROWS)
+            else:
+                try:
+                    reader = pa.ipc.open_file(file)
+                    batches = (
+                        reader.get_batch(i) for i in range(reader.num_record_batches)
+                    )
+                except pa.ArrowInvalid:
+                    file.seek(0)
+                    batches = iter(pa.ipc.open_stream(file))
+            while batch := await asyncio.to_thread(next, batches, None):
+                yield batch.to_pylist()
+
+    async def read(self) -> AsyncIterator[list]:
+        self._file = self.path.open("rb")
+        try:
+            async for records in self._chunks():
+                room = self.max_rows - self.rows
+                if len(records) > room:
+                    records, self.truncated = records[:room], True
+                self.rows += len(records)
+                yield records
+                if self.truncated:
+                    break
+        finally:
+            self._file.close()
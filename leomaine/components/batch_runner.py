@@ -0,0 +1,245 @@
+import asyncio
+import json
+
+import httpx
+import reflex as rx
+
+from leomaine.backend import fetcher
+from leomaine.backend.batch import (
+    MAX_BATCH_CONCURRENCY,
+    MAX_BATCH_REQUESTS,
+    BatchRun,
+)
+from leomaine.backend.executor import request_kwargs
+from leomaine.backend.http_pool import http_pool
+from leomaine.queries import QueryAPI
+
+
+def _bounded(kind: type, value: str, low: float, high: float):
+    # A number typed into a field, clamped to [low, high], None when it
+    # isn't one ...
+    try:
+        number = kind(value or 0)
+    except ValueError:
+        return None
+    if number != number:
+        return None
+    return min(max(number, low), high)
+
+
+class BatchState(QueryAPI):
+
+    # vars for configuring a batch run ...
+    show_batch: bool = False
+    batch_count: int = 100
+    batch_concurrency: int = 10
+    batch_rate: float = 0
+    batch_params: str = ""
+
+    # vars for reporting a batch run ...
+    batch_running: bool = False
+    batch_progress: int = 0
+    batch_total: int = 0
+    batch_summary: dict[str, float] = {}
+    batch_histogram: dict[str, int] = {}
+    batch_error: str = ""
+    _batch_cancelled: bool = False
+
+    def toggle_batch(self):
+        self.show_batch = not self.show_batch
+
+    def set_batch_count(self, value: str):
+        count = _bounded(int, value, 0, MAX_BATCH_REQUESTS)
+        if count is None:
+            self.batch_error = f"requests must be a whole number, not {value!r}"
+            return
+        self.batch_count = count
+        self.batch_error = ""
+
+    def set_batch_concurrency(self, value: str):
+        concurrency = _bounded(int, value, 1, MAX_BATCH_CONCURRENCY)
+        if concurrency is None:
+            self.batch_error = f"concurrency must be a whole number, not {value!r}"
+            return
+        self.batch_concurrency = concurrency
+        self.batch_error = ""
+
+    def set_batch_rate(self, value: str):
+        rate = _bounded(float, value, 0, float("inf"))
+        if rate is None:
+            self.batch_error = f"rate must be a number, not {value!r}"
+            return
+        self.batch_rate = rate
+        self.batch_error = ""
+
+    def cancel_batch(self):
+        self._batch_cancelled = True
+
+    def _param_sets(self) -> list[dict[str, str]]:
+        # A JSON list of query parameter objects, each fired once, otherwise
+        # the plain request `batch_count` times ...
+        if not self.batch_params.strip():
+            return [{} for _ in range(self.batch_count)]
+        param_sets = json.loads(self.batch_params)
+        if not isinstance(param_sets, list) or not all(
+            isinstance(params, dict) for params in param_sets
+        ):
+            raise ValueError("parameter sets must be a JSON list of objects")
+        if len(param_sets) > MAX_BATCH_REQUESTS:
+            raise ValueError(
+                f"{len(param_sets)} parameter sets, a batch fires at most "
+                f"{MAX_BATCH_REQUESTS}"
+            )
+        return param_sets
+
+    def _publish_batch(self, run: BatchRun):
+        self.batch_progress = run.completed
+        self.batch_summary = {
+            key: round(value, 2) for key, value in run.summary().items()
+        }
+        self.batch_histogram = run.histogram()
+
+    @rx.background
+    async def run_batch(self):
+        async with self:
+            if self.batch_running:
+                return
+            try:
+                param_sets = self._param_sets()
+            except ValueError as error:
+                self.batch_error = str(error)
+                return
+            method, url = self.current_req, self.req_url
+            headers = self._formatted_headers()
+            body_mode = self.body_mode
+            body = self._entries("body")
+            cookies = self._entries("cookies")
+            uploads = self._upload_dir()
+            concurrency = self.batch_concurrency
+            self.batch_error = ""
+            self.batch_running = True
+            self._batch_cancelled = False
+            self.batch_total = len(param_sets)
+            self.batch_progress = 0
+
+        # A client of its own, sized to the batch, so a load test never
+        # starves the shared pool used by interactive requests ...
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=concurrency, max_keepalive_connections=concurrency
+            ),
+            http2=http_pool.http2,
+            timeout=http_pool.timeout,
+        )
+
+        # Sent like any builder request, retries and all, and read whole so
+        # the run records its size ...
+        async def send(params: dict[str, str]) -> httpx.Response:
+            with request_kwargs(headers, body_mode, body, cookies, uploads) as kwargs:
+                res = await fetcher.send(client, method, url, params=params, **kwargs)
+                try:
+                    await res.aread()
+                finally:
+                    await res.aclose()
+                return res
+
+        run = BatchRun(send, param_sets, concurrency, self.batch_rate)
+        task = asyncio.create_task(run.run())
+        try:
+            while not task.done():
+                await asyncio.sleep(0.25)
+                async with self:
+                    self._publish_batch(run)
+                    if self._batch_cancelled:
+                        task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        finally:
+            await client.aclose()
+            async with self:
+                self._publish_batch(run)
+                self.batch_running = False
+
+
+def create_stat(item: list):
+    return rx.vstack(
+        rx.text(item[0], size="1", color_scheme="gray"),
+        rx.text(f"{item[1]}", weight="bold"),
+        spacing="0",
+    )
+
+
+def create_status_badge(item: list):
+    return rx.badge(f"{item[0]} × {item[1]}", variant="soft")
+
+
+def create_batch_input(title: str, value, on_change):
+    return rx.vstack(
+        rx.text(title, size="1"),
+        rx.input(value=value, on_change=on_change, type="number", width="100px"),
+        spacing="1",
+    )
+
+
+def render_batch_panel():
+    return rx.cond(
+        BatchState.show_batch,
+        rx.vstack(
+            rx.hstack(
+                create_batch_input(
+                    "Requests", BatchState.batch_count, BatchState.set_batch_count
+                ),
+                create_batch_input(
+                    "Concurrency",
+                    BatchState.batch_concurrency,
+                    BatchState.set_batch_concurrency,
+                ),
+                create_batch_input(
+                    "Rate / s", BatchState.batch_rate, BatchState.set_batch_rate
+                ),
+                rx.cond(
+                    BatchState.batch_running,
+                    rx.button(
+                        "Cancel", color_scheme="red", on_click=BatchState.cancel_batch
+                    ),
+                    rx.button("Run batch", on_click=BatchState.run_batch),
+                ),
+                align="end",
+                spacing="3",
+            ),
+            rx.text_area(
+                placeholder=(
+                    'Optional parameter sets, e.g. [{"userId": "1"}, {"userId": "2"}]'
+                ),
+                value=BatchState.batch_params,
+                on_change=BatchState.set_batch_params,
+                width="100%",
+            ),
+            rx.cond(
+                BatchState.batch_error,
+                rx.text(BatchState.batch_error, color_scheme="red", size="1"),
+            ),
+            rx.cond(
+                BatchState.batch_total,
+                rx.vstack(
+                    rx.progress(
+                        value=BatchState.batch_progress,
+                        max=BatchState.batch_total,
+                        width="100%",
+                    ),
+                    rx.hstack(
+                        rx.foreach(BatchState.batch_summary, create_stat),
+                        spacing="5",
+                        wrap="wrap",
+                    ),
+                    rx.hstack(
+                        rx.foreach(BatchState.batch_histogram, create_status_badge),
+                        spacing="2",
+                        wrap="wrap",
+                    ),
+                    width="100%",
+                ),
+            ),
+            width="100%",
+            padding="0.5em 0.75em",
+        ),
+    )
@@ -0,0 +1,164 @@
+import asyncio
+import json
+
+import reflex as rx
+
+from leomaine.backend.diff import ResultDiff, diff_results
+from leomaine.queries import QueryAPI
+
+
+# the key select's value for matching whole rows by their content ...
+ROW_CONTENT = "__row__"
+
+# how many changed rows are listed in the panel, summary counts cover all ...
+SHOWN_CHANGES = 200
+VALUE_CHARS = 120
+
+
+def _text(value) -> str:
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return text if len(text) <= VALUE_CHARS else text[: VALUE_CHARS - 1] + "…"
+
+
+def _listing(diff: ResultDiff) -> list[dict[str, str]]:
+    listing = [
+        {
+            "kind": "modified",
+            "label": _text(change["key"] if diff.key else change["after"]),
+            "detail": ", ".join(
+                f"{name}: {_text(old)} → {_text(new)}"
+                for name, (old, new) in change["fields"].items()
+            ),
+        }
+        for change in diff.changes(SHOWN_CHANGES)
+    ]
+    for kind, result, positions in (
+        ("added", diff.after, diff.added),
+        ("removed", diff.before, diff.removed),
+    ):
+        for position in positions[: SHOWN_CHANGES - len(listing)]:
+            row = result.row(position)
+            listing.append(
+                {
+                    "kind": kind,
+                    "label": _text(row.get(diff.key) if diff.key else position),
+                    "detail": _text(row),
+                }
+            )
+    return listing
+
+
+class DiffState(QueryAPI):
+
+    # vars for comparing the loaded response with the previous run of the
+    # same request ...
+    show_diff: bool = False
+    diff_key: str = ROW_CONTENT
+    diff_summary: dict[str, int] = {}
+    diff_rows: list[dict[str, str]] = []
+    diff_error: str = ""
+    is_diffing: bool = False
+
+    def toggle_diff(self):
+        self.show_diff = not self.show_diff
+
+    def set_diff_key(self, value: str):
+        self.diff_key = value
+
+    async def compare(self):
+        session = self._session()
+        previous = session.previous_run
+        if previous is None:
+            self.diff_error = (
+                "Run the same request (method and URL) twice to compare two responses"
+            )
+            return
+        key = "" if self.diff_key == ROW_CONTENT else self.diff_key
+        self.is_diffing = True
+        yield
+        try:
+            diff = await asyncio.to_thread(
+                diff_results, previous, session.result, key
+            )
+            self.diff_rows = await asyncio.to_thread(_listing, diff)
+            self.diff_summary = diff.summary()
+            self.diff_error = ""
+        except ValueError as error:
+            self.diff_error = str(error)
+            self.diff_summary = {}
+            self.diff_rows = []
+        finally:
+            self.is_diffing = False
+
+
+def create_diff_count(item: list):
+    return rx.vstack(
+        rx.text(item[0], size="1", color_scheme="gray"),
+        rx.text(f"{item[1]}", weight="bold"),
+        spacing="0",
+    )
+
+
+def create_diff_row(row: dict[str, str]):
+    return rx.hstack(
+        rx.badge(
+            row["kind"],
+            color_scheme=rx.match(
+                row["kind"], ("added", "green"), ("removed", "red"), "amber"
+            ),
+            variant="soft",
+            width="80px",
+        ),
+        rx.code(row["label"], size="1"),
+        rx.text(row["detail"], size="1", trim="both", overflow="hidden"),
+        width="100%",
+        align="center",
+        spacing="2",
+    )
+
+
+def create_key_item(name: str):
+    return rx.select.item(name, value=name)
+
+
+def render_diff_panel():
+    return rx.cond(
+        DiffState.show_diff,
+        rx.vstack(
+            rx.hstack(
+                rx.text("Match rows by", size="2"),
+                rx.select.root(
+                    rx.select.trigger(),
+                    rx.select.content(
+                        rx.select.item("Row content", value=ROW_CONTENT),
+                        rx.foreach(DiffState.get_table_headers, create_key_item),
+                    ),
+                    value=DiffState.diff_key,
+                    on_change=DiffState.set_diff_key,
+                ),
+                rx.button(
+                    "Compare with previous run",
+                    on_click=DiffState.compare,
+                    loading=DiffState.is_diffing,
+                ),
+                align="center",
+                spacing="3",
+            ),
+            rx.cond(
+                DiffState.diff_error,
+                rx.text(DiffState.diff_error, color_scheme="red", size="1"),
+            ),
+            rx.hstack(
+                rx.foreach(DiffState.diff_summary, create_diff_count),
+                spacing="5",
+                wrap="wrap",
+            ),
+            rx.vstack(
+                rx.foreach(DiffState.diff_rows, create_diff_row),
+                width="100%",
+                spacing="1",
+            ),
+            width="100%",
+            padding="0.5em 0.75em",
+        ),
+    )
@@ -0,0 +1,237 @@
+import asyncio
+import time
+
+import reflex as rx
+
+from leomaine.backend.history import PAGE_SIZE, request_history
+from leomaine.queries import QueryAPI
+
+
+def _history_row(entry: dict) -> dict[str, str]:
+    return {
+        "id": str(entry["id"]),
+        "method": entry["method"],
+        "url": entry["url"],
+        "status": str(entry["status"] or "-"),
+        "when": time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["created"])),
+        "ms": f"{entry['elapsed_ms'] or 0:.0f}",
+    }
+
+
+class HistoryState(QueryAPI):
+
+    # vars for listing the history, one page at a time (keyset by id) ...
+    show_history: bool = False
+    history_search: str = ""
+    history_rows: list[dict[str, str]] = []
+    history_has_older: bool = False
+    history_has_newer: bool = False
+    history_stats: dict[str, int] = {}
+
+    # vars for collections, "" lists the whole history ...
+    collections: list[dict[str, str]] = []
+    active_collection: str = ""
+    new_collection: str = ""
+
+    # ids the pages before the current one started below ...
+    _history_cursors: list[int] = []
+
+    async def toggle_history(self):
+        self.show_history = not self.show_history
+        if self.show_history:
+            await self._load_collections()
+            await self.first_history_page()
+
+    async def _load_collections(self):
+        collections = await asyncio.to_thread(
+            request_history.collections, self._history_owner()
+        )
+        self.collections = [
+            {"id": str(item["id"]), "name": f"{item['name']} ({item['size']})"}
+            for item in collections
+        ]
+        self.history_stats = await asyncio.to_thread(
+            request_history.stats, self._history_owner()
+        )
+
+    async def _load_page(self, before):
+        if self.active_collection:
+            entries = await asyncio.to_thread(
+                request_history.collection_page,
+                self._history_owner(),
+                int(self.active_collection),
+                before,
+                PAGE_SIZE + 1,
+            )
+        else:
+            entries = await asyncio.to_thread(
+                request_history.page,
+                self._history_owner(),
+                before,
+                PAGE_SIZE + 1,
+                self.history_search,
+            )
+        # One extra row tells whether an older page exists ...
+        self.history_has_older = len(entries) > PAGE_SIZE
+        self.history_has_newer = bool(self._history_cursors)
+        self.history_rows = [_history_row(entry) for entry in entries[:PAGE_SIZE]]
+
+    async def first_history_page(self):
+        self._history_cursors = []
+        await self._load_page(None)
+
+    async def older_history(self):
+        if not self.history_has_older or not self.history_rows:
+            return
+        self._history_cursors.append(int(self.history_rows[0]["id"]) + 1)
+        await self._load_page(int(self.history_rows[-1]["id"]))
+
+    async def newer_history(self):
+        if not self._history_cursors:
+            return
+        await self._load_page(self._history_cursors.pop())
+
+    async def search_history(self, value: str):
+        self.history_search = value
+        await self.first_history_page()
+
+    async def select_collection(self, value: str):
+        self.active_collection = "" if value == "all" else value
+        await self.first_history_page()
+
+    async def create_collection(self):
+        name = self.new_collection.strip()
+        if not name:
+            return
+        collection_id = await asyncio.to_thread(
+            request_history.create_collection, self._history_owner(), name
+        )
+        self.new_collection = ""
+        self.active_collection = str(collection_id)
+        await self._load_collections()
+        await self.first_history_page()
+
+    async def save_to_collection(self, request_id: str):
+        if not self.active_collection and not self.collections:
+            return
+        collection_id = int(self.active_collection or self.collections[0]["id"])
+        await asyncio.to_thread(
+            request_history.add_to_collection,
+            self._history_owner(),
+            collection_id,
+            int(request_id),
+        )
+        await self._load_collections()
+
+    async def restore_history(self, request_id: str):
+        entry = await asyncio.to_thread(
+            request_history.get, self._history_owner(), int(request_id)
+        )
+        if entry is not None:
+            self.restore_request(entry["method"], entry["url"], entry["request"])
+
+
+def create_history_row(row: dict[str, str]):
+    return rx.hstack(
+        rx.badge(row["method"], variant="soft", width="64px"),
+        rx.badge(row["status"], variant="outline"),
+        rx.text(row["url"], size="2", trim="both", flex="1", overflow="hidden"),
+        rx.text(f"{row['ms']} ms", size="1", color_scheme="gray"),
+        rx.text(row["when"], size="1", color_scheme="gray"),
+        rx.button(
+            "Load",
+            size="1",
+            variant="soft",
+            on_click=HistoryState.restore_history(row["id"]),
+        ),
+        rx.button(
+            "Save",
+            size="1",
+            variant="outline",
+            on_click=HistoryState.save_to_collection(row["id"]),
+            disabled=~HistoryState.collections.length(),
+        ),
+        width="100%",
+        align="center",
+        spacing="2",
+    )
+
+
+def create_collection_item(item: dict[str, str]):
+    return rx.select.item(item["name"], value=item["id"])
+
+
+def render_history_panel():
+    return rx.cond(
+        HistoryState.show_history,
+        rx.vstack(
+            rx.hstack(
+                rx.debounce_input(
+                    rx.input(
+                        placeholder="Search URLs, or a URL prefix...",
+                        value=HistoryState.history_search,
+                        on_change=HistoryState.search_history,
+                        width="100%",
+                    ),
+                    debounce_timeout=300,
+                ),
+                rx.select.root(
+                    rx.select.trigger(placeholder="Whole history"),
+                    rx.select.content(
+                        rx.select.item("Whole history", value="all"),
+                        rx.foreach(HistoryState.collections, create_collection_item),
+                    ),
+                    value=rx.cond(
+                        HistoryState.active_collection,
+                        HistoryState.active_collection,
+                        "all",
+                    ),
+                    on_change=HistoryState.select_collection,
+                ),
+                rx.input(
+                    placeholder="New collection",
+                    value=HistoryState.new_collection,
+                    on_change=HistoryState.set_new_collection,
+                    width="160px",
+                ),
+                rx.button(
+                    "Create", variant="soft", on_click=HistoryState.create_collection
+                ),
+                width="100%",
+                spacing="2",
+            ),
+            rx.vstack(
+                rx.foreach(HistoryState.history_rows, create_history_row),
+                width="100%",
+                spacing="1",
+            ),
+            rx.hstack(
+                rx.button(
+                    "Newer",
+                    size="1",
+                    variant="soft",
+                    on_click=HistoryState.newer_history,
+                    disabled=~HistoryState.history_has_newer,
+                ),
+                rx.button(
+                    "Older",
+                    size="1",
+                    variant="soft",
+                    on_click=HistoryState.older_history,
+                    disabled=~HistoryState.history_has_older,
+                ),
+                rx.spacer(),
+                rx.text(
+                    f"{HistoryState.history_stats['requests']} requests, "
+                    f"{HistoryState.history_stats['stored_bytes']} bytes of bodies "
+                    f"stored for {HistoryState.history_stats['raw_bytes']}",
+                    size="1",
+                    color_scheme="gray",
+                ),
+                width="100%",
+                align="center",
+            ),
+            width="100%",
+            padding="0.5em 0.75em",
+        ),
+    )
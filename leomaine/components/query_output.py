@@ -1,35 +1,233 @@
+import asyncio
+import time
+
+import httpx
 import reflex as rx
 
-from leomaine.queries import QueryAPI
+from leomaine.backend.context import CONTEXT_BUDGET, estimate_tokens, system_prompt
+from leomaine.backend.fetcher import running_requests
+from leomaine.backend.llm import ChatBusy, ChatError, chat_engine
+from leomaine.backend.planner import planner
+from leomaine.backend.semantic_cache import semantic_cache
+from leomaine.components.virtual_grid import render_grid
+from leomaine.queries import REQUEST_METHODS, QueryAPI
 
 
 def create_table_header(title: str):
-    return rx.table.column_header_cell(title)
+    return rx.table.column_header_cell(
+        rx.hstack(
+            rx.text(title),
+            rx.cond(
+                QueryAPI.sort_column == title,
+                rx.cond(
+                    QueryAPI.sort_desc,
+                    rx.icon(tag="arrow-down", size=14),
+                    rx.icon(tag="arrow-up", size=14),
+                ),
+            ),
+            align="center",
+            spacing="1",
+        ),
+        on_click=QueryAPI.sort_by(title),
+        cursor="pointer",
+    )
 
 
-def create_query_rows(data: dict[str, str]):
-    def fill_rows_with_data(data_):
-        return rx.table.cell(
-            f"{data_[1]}",
-            on_click=QueryAPI.display_selected_row(data),
+def create_filter_badge(item: list[str]):
+    return rx.badge(f"{item[0]}: {item[1]}", variant="soft", color_scheme="gray")
+
+
+def create_search_bar():
+    return rx.hstack(
+        rx.debounce_input(
+            rx.input(
+                placeholder="Search rows...",
+                value=QueryAPI.search_query,
+                on_change=QueryAPI.search,
+                width="100%",
+            ),
+            debounce_timeout=300,
+        ),
+        rx.select(
+            QueryAPI.get_table_headers,
+            placeholder="Filter column",
+            on_change=QueryAPI.set_filter_column,
+        ),
+        rx.debounce_input(
+            rx.input(
+                placeholder="contains...",
+                value=QueryAPI.column_filters[QueryAPI.filter_column],
+                on_change=QueryAPI.apply_filter,
+            ),
+            debounce_timeout=300,
+        ),
+        rx.foreach(QueryAPI.column_filters, create_filter_badge),
+        rx.button(
+            "Clear",
+            size="1",
+            variant="soft",
+            on_click=QueryAPI.clear_filters,
             cursor="pointer",
-        )
+        ),
+        width="100%",
+        align="center",
+        spacing="2",
+    )
+
+
+def create_nested_badge(column: str):
+    return rx.badge(
+        rx.icon(tag="chevrons-right", size=12),
+        column,
+        variant="outline",
+        cursor="pointer",
+        on_click=QueryAPI.expand_column(column),
+    )
+
+
+# Where the rows came from in the body and the nested columns left to open ...
+def create_shape_bar():
+    return rx.hstack(
+        rx.text("Nesting depth", size="1"),
+        rx.select(
+            ["0", "1", "2", "3", "4"],
+            value=QueryAPI.flatten_depth.to_string(),
+            on_change=QueryAPI.set_flatten_depth,
+            size="1",
+        ),
+        rx.cond(
+            QueryAPI.records_path,
+            rx.text(f"Records at {QueryAPI.records_path}", size="1"),
+        ),
+        rx.foreach(QueryAPI.nested_columns, create_nested_badge),
+        rx.cond(
+            QueryAPI.shape_note,
+            rx.badge(QueryAPI.shape_note, color_scheme="amber", variant="soft"),
+        ),
+        width="100%",
+        align="center",
+        spacing="2",
+        wrap="wrap",
+    )
+
+
+def create_query_rows(data: dict[str, str], index: int):
+    def fill_rows_with_data(data_):
+        return rx.table.cell(f"{data_[1]}")
 
     return rx.table.row(
         rx.foreach(data, fill_rows_with_data),
+        on_click=QueryAPI.display_selected_row(index),
+        cursor="pointer",
         _hover={"bg": rx.color(color="gray", shade=4)},
     )
 
 
+def create_edit_field(item: list[str]):
+    return rx.hstack(
+        rx.text(item[0], width="30%", weight="bold", size="2"),
+        rx.input(
+            default_value=f"{item[1]}",
+            on_change=lambda value: QueryAPI.update_data(value, item),
+            width="70%",
+        ),
+        width="100%",
+        align="center",
+    )
+
+
+def render_edit_dialog():
+    return rx.dialog.root(
+        rx.dialog.content(
+            rx.dialog.title("Edit row"),
+            rx.vstack(
+                rx.foreach(QueryAPI.selected_entry, create_edit_field),
+                rx.hstack(
+                    rx.button(
+                        "Cancel",
+                        variant="soft",
+                        color_scheme="gray",
+                        on_click=QueryAPI.delta_drawer,
+                    ),
+                    rx.button("Save", on_click=QueryAPI.commit_changes),
+                    justify="end",
+                    width="100%",
+                ),
+                spacing="2",
+            ),
+        ),
+        open=QueryAPI.is_open,
+    )
+
+
+def create_timing_row(row: dict[str, str]):
+    return rx.hstack(
+        rx.text(row["phase"], size="1", width="64px"),
+        rx.box(
+            rx.box(
+                position="absolute",
+                left=row["left"],
+                width=row["width"],
+                height="100%",
+                border_radius="2px",
+                background_color=rx.color("accent", 9),
+            ),
+            position="relative",
+            height="10px",
+            flex="1",
+            background_color=rx.color("gray", 3),
+        ),
+        rx.text(f"{row['ms']} ms", size="1", width="72px", align="right"),
+        width="100%",
+        align="center",
+        spacing="2",
+    )
+
+
+# Waterfall of the last request's phases, opened from its total time ...
+def render_timings():
+    return rx.cond(
+        QueryAPI.request_timings,
+        rx.popover.root(
+            rx.popover.trigger(
+                rx.badge(
+                    f"{QueryAPI.request_ms} ms",
+                    variant="soft",
+                    cursor="pointer",
+                ),
+            ),
+            rx.popover.content(
+                rx.vstack(
+                    rx.foreach(QueryAPI.request_timings, create_timing_row),
+                    rx.text(
+                        f"{QueryAPI.response_bytes} bytes received",
+                        size="1",
+                        color_scheme="gray",
+                    ),
+                    width="360px",
+                    spacing="1",
+                ),
+            ),
+        ),
+    )
+
+
 def create_pagination():
     return rx.hstack(
         rx.hstack(
             rx.text("Entries per page", weight="bold"),
             rx.select(
-                QueryAPI.limits, default_value="5", on_change=QueryAPI.delta_limit
+                QueryAPI.limits,
+                value=QueryAPI.current_limit.to_string(),
+                on_change=QueryAPI.delta_limit,
             ),
             align_items="center",
         ),
+        rx.hstack(
+            rx.text("Grid view", weight="bold"),
+            rx.switch(checked=QueryAPI.grid_mode, on_change=QueryAPI.toggle_grid),
+            align_items="center",
+        ),
         rx.hstack(
             rx.text(
                 f"Page {QueryAPI.current_page}/{QueryAPI.total_pages}",
@@ -46,6 +244,65 @@ def create_pagination():
             align_items="center",
             spacing="1",
         ),
+        rx.cond(
+            QueryAPI.is_loading,
+            rx.hstack(
+                rx.text(f"Loading... {QueryAPI.total_rows} rows", size="1"),
+                rx.text(
+                    rx.cond(
+                        QueryAPI.progress_total,
+                        f"{QueryAPI.progress_bytes} of {QueryAPI.progress_total} B",
+                        f"{QueryAPI.progress_bytes} B",
+                    ),
+                    size="1",
+                    color_scheme="gray",
+                ),
+                rx.cond(
+                    QueryAPI.fetch_note,
+                    rx.badge(QueryAPI.fetch_note, color_scheme="amber", variant="soft"),
+                ),
+                align="center",
+                spacing="2",
+            ),
+            rx.text(
+                f"{QueryAPI.number_of_rows} of {QueryAPI.total_rows} rows", size="1"
+            ),
+        ),
+        rx.cond(
+            QueryAPI.is_truncated,
+            rx.badge("Truncated", color_scheme="red", variant="soft"),
+        ),
+        rx.cond(
+            QueryAPI.crawl_pages,
+            rx.badge(
+                rx.cond(
+                    QueryAPI.crawl_has_more,
+                    f"{QueryAPI.crawl_pages} {QueryAPI.crawl_detected} pages, "
+                    "more upstream",
+                    f"{QueryAPI.crawl_pages} {QueryAPI.crawl_detected} pages",
+                ),
+                variant="soft",
+            ),
+        ),
+        rx.cond(
+            QueryAPI.request_error,
+            rx.text(QueryAPI.request_error, color_scheme="red", size="1"),
+        ),
+        render_timings(),
+        rx.cond(
+            QueryAPI.cache_status,
+            rx.badge(
+                f"Cache {QueryAPI.cache_status}",
+                color_scheme=rx.cond(QueryAPI.cache_status == "miss", "gray", "green"),
+                variant="soft",
+            ),
+        ),
+        rx.text(
+            f"Clients reused {QueryAPI.pool_stats['reused']} "
+            f"/ created {QueryAPI.pool_stats['created']}",
+            size="1",
+            color_scheme="gray",
+        ),
         align_items="center",
         spacing="4",
     )
@@ -83,10 +340,25 @@ def create_pagination():
 #         border_radius="10px",
 #         overflow="auto",
 #     )
+def _chat_key(token: str) -> str:
+    # tracked apart from the client's request in flight ...
+    return f"chat:{token}"
+
+
 # Chat state for showing/hiding the chat box
 class ChatState(QueryAPI):
     show_chat_box: bool = False
     user_query: str = ""
+    messages: list[dict[str, str]] = []
+    is_generating: bool = False
+    chat_error: str = ""
+    context_budget: int = CONTEXT_BUDGET
+    context_tokens: int = 0
+    # "Ask" answers questions about the data, "Plan" fills in the request
+    # builder from a description ...
+    chat_mode: str = "Ask"
+    plan_stats: dict[str, int]
+    answer_stats: dict[str, float]
 
     # Function to toggle the chat box visibility
     def toggle_chat_box(self):
@@ -96,30 +368,205 @@ class ChatState(QueryAPI):
     def set_user_query(self, value: str):
         self.user_query = value
 
-    # Function to handle submitting the query (e.g., send to OpenAI or other API)
+    def cancel_generation(self):
+        # Cancels the generating task outright, like a request in flight,
+        # so Stop works even while the model has not sent a token yet ...
+        running_requests.cancel(_chat_key(self.router.session.client_token))
+
+    def clear_chat(self):
+        if not self.is_generating:
+            self.messages = []
+            self.chat_error = ""
+
+    def set_chat_mode(self, value: str):
+        self.chat_mode = value
+
+    def _build_prompt(self, session, query: str, budget: int) -> tuple[str, str]:
+        context = session.context if len(session.result) else None
+        fingerprint = context.fingerprint if context is not None else "empty"
+        return system_prompt(context, query, budget), fingerprint
+
+    async def _stream_answer(self, token: str, session, query: str, history):
+        # The data summary is built once per loaded response, only the row
+        # selection runs for every question ...
+        prompt, fingerprint = await asyncio.to_thread(
+            self._build_prompt, session, query, self.context_budget
+        )
+        history.insert(0, {"role": "system", "content": prompt})
+
+        # Near-identical questions over the same data reuse the answer ...
+        cached = semantic_cache.lookup(query, fingerprint)
+        async with self:
+            self.context_tokens = estimate_tokens(prompt)
+            self.answer_stats = semantic_cache.stats()
+            if cached is not None:
+                self.messages[-1]["content"] = cached
+                return
+
+        started = time.perf_counter()
+        answer = ""
+        async with chat_engine.session_slot(token):
+            replies = chat_engine.stream(history)
+            try:
+                async for text in replies:
+                    answer += text
+                    async with self:
+                        self.messages[-1]["content"] += text
+            finally:
+                await replies.aclose()
+        if answer:
+            elapsed = time.perf_counter() - started
+            semantic_cache.store(query, fingerprint, answer, elapsed)
+
+    async def _compile_plan(self, token: str, query: str):
+        # Turn the sentence into builder fields, skipping the model when the
+        # same intent was compiled before ...
+        async with self:
+            method, url = self.current_req, self.req_url
+        async with chat_engine.session_slot(token):
+            plan, cached = await planner.plan(query, method, url, REQUEST_METHODS)
+        async with self:
+            self.apply_plan(plan)
+            self.plan_stats = planner.cache.stats()
+            source = "cached plan" if cached else "new plan"
+            self.messages[-1]["content"] = (
+                f"Filled in {plan['method']} {self.req_url} ({source}), press "
+                "Send to run it."
+            )
+
+    # Stream the reply into the last message as tokens arrive ...
+    @rx.background
     async def submit_query(self):
-        if self.user_query:
-            # You can send this query to your backend or OpenAI API here
-            print(f"User Query Submitted: {self.user_query}")
-            # Reset the input after submission
+        async with self:
+            query = self.user_query.strip()
+            if not query or self.is_generating:
+                return
+            token = self.router.session.client_token
+            session = self._session()
+            planning = self.chat_mode == "Plan"
+            self.messages.append({"role": "user", "content": query})
+            history = [dict(message) for message in self.messages]
+            self.messages.append({"role": "assistant", "content": ""})
             self.user_query = ""
+            self.chat_error = ""
+            self.is_generating = True
+
+        try:
+            with running_requests.track(_chat_key(token)):
+                if planning:
+                    await self._compile_plan(token, query)
+                else:
+                    await self._stream_answer(token, session, query, history)
+        except asyncio.CancelledError:
+            # Stopped, the partial answer stays but is not cached ...
+            pass
+        except (ChatBusy, ChatError, httpx.HTTPError, ValueError) as error:
+            async with self:
+                self.chat_error = str(error) or type(error).__name__
+        finally:
+            async with self:
+                if self.messages and not self.messages[-1]["content"]:
+                    self.messages.pop()
+                self.is_generating = False
+
+
+def create_chat_message(message: dict[str, str]):
+    return rx.box(
+        rx.text(message["content"], white_space="pre-wrap", size="2"),
+        align_self=rx.cond(message["role"] == "user", "flex-end", "flex-start"),
+        bg=rx.cond(
+            message["role"] == "user",
+            rx.color("blue", 4),
+            rx.color("gray", 3),
+        ),
+        padding="0.5em 0.75em",
+        border_radius="8px",
+        max_width="85%",
+    )
 
 
 # Render the input card for chatting
 def render_chat_box():
     return rx.box(
         rx.vstack(
-            rx.text("Chat with API", font_weight="bold", font_size="md"),
+            rx.hstack(
+                rx.text("Chat with API", font_weight="bold", font_size="md"),
+                rx.spacer(),
+                rx.segmented_control.root(
+                    rx.segmented_control.item("Ask", value="Ask"),
+                    rx.segmented_control.item("Plan", value="Plan"),
+                    value=ChatState.chat_mode,
+                    on_change=ChatState.set_chat_mode,
+                    size="1",
+                ),
+                rx.button(
+                    "Clear",
+                    size="1",
+                    variant="soft",
+                    color_scheme="gray",
+                    on_click=ChatState.clear_chat,
+                    disabled=ChatState.is_generating,
+                ),
+                width="100%",
+            ),
+            rx.vstack(
+                rx.foreach(ChatState.messages, create_chat_message),
+                width="100%",
+                max_height="360px",
+                overflow_y="auto",
+            ),
+            rx.cond(
+                ChatState.chat_error,
+                rx.text(ChatState.chat_error, color_scheme="red", size="1"),
+            ),
+            rx.cond(
+                ChatState.chat_mode == "Plan",
+                rx.text(
+                    f"Plans: {ChatState.plan_stats['hits']} cached, "
+                    f"{ChatState.plan_stats['misses']} compiled",
+                    color_scheme="gray",
+                    size="1",
+                ),
+            ),
+            rx.cond(
+                ChatState.answer_stats["lookups"],
+                rx.text(
+                    f"Answer cache: {ChatState.answer_stats['hits']} of "
+                    f"{ChatState.answer_stats['lookups']} reused, "
+                    f"{ChatState.answer_stats['saved_seconds']}s saved",
+                    color_scheme="gray",
+                    size="1",
+                ),
+            ),
+            rx.cond(
+                ChatState.context_tokens,
+                rx.text(
+                    f"~{ChatState.context_tokens} of {ChatState.context_budget} "
+                    "context tokens",
+                    color_scheme="gray",
+                    size="1",
+                ),
+            ),
             rx.input(
                 placeholder="Type your query...",
                 width="100%",
+                value=ChatState.user_query,
                 on_change=ChatState.set_user_query,  # Store input value
             ),
-            rx.button(
-                "Send",
-                size="sm",
-                on_click=ChatState.submit_query,  # Submit the query
-                color_scheme="blue",
+            rx.cond(
+                ChatState.is_generating,
+                rx.button(
+                    "Stop",
+                    size="sm",
+                    on_click=ChatState.cancel_generation,
+                    color_scheme="red",
+                ),
+                rx.button(
+                    "Send",
+                    size="sm",
+                    on_click=ChatState.submit_query,  # Submit the query
+                    color_scheme="blue",
+                ),
             ),
         ),
         padding="1em",
@@ -135,39 +582,52 @@ def render_chat_box():
 # Modify the render_output function to include the chat functionality
 def render_output():
     return rx.center(
-        rx.cond(
-            QueryAPI.get_data,
-            rx.vstack(
-                create_pagination(),
-                rx.table.root(
-                    rx.table.header(
-                        rx.table.row(
-                            rx.foreach(QueryAPI.get_table_headers, create_table_header)
+        rx.vstack(
+            rx.cond(
+                QueryAPI.total_rows,
+                rx.vstack(
+                    create_pagination(),
+                    create_search_bar(),
+                    create_shape_bar(),
+                    rx.cond(
+                        QueryAPI.grid_mode,
+                        render_grid(),
+                        rx.table.root(
+                            rx.table.header(
+                                rx.table.row(
+                                    rx.foreach(
+                                        QueryAPI.get_table_headers,
+                                        create_table_header,
+                                    )
+                                ),
+                            ),
+                            rx.table.body(
+                                rx.foreach(QueryAPI.paginated_data, create_query_rows)
+                            ),
+                            width="100%",
+                            variant="surface",
+                            size="1",
                         ),
                     ),
-                    rx.table.body(
-                        rx.foreach(QueryAPI.paginated_data, create_query_rows)
-                    ),
+                    render_edit_dialog(),
                     width="100%",
-                    variant="surface",
-                    size="1",
                 ),
-                # Add a "Chat" button that toggles the chat box
-                rx.button(
-                    "Chat",
-                    size="md",
-                    on_click=ChatState.toggle_chat_box,
-                    color_scheme="green",
-                ),
-                # Conditionally render the chat box if `show_chat_box` is True
-                rx.cond(
-                    ChatState.show_chat_box,
-                    render_chat_box(),  # Show the chat box when button is clicked
-                ),
-                width="70%",
-                overflow="auto",
             ),
-            rx.spacer(),
+            # The chat is there before any rows are loaded too, "Plan" fills
+            # in the request that loads them ...
+            rx.button(
+                "Chat",
+                size="md",
+                on_click=ChatState.toggle_chat_box,
+                color_scheme="green",
+            ),
+            # Conditionally render the chat box if `show_chat_box` is True
+            rx.cond(
+                ChatState.show_chat_box,
+                render_chat_box(),  # Show the chat box when button is clicked
+            ),
+            width="70%",
+            overflow="auto",
         ),
         flex="60%",
         bg=rx.color_mode_cond(
@@ -0,0 +1,147 @@
+import asyncio
+import time
+
+import httpx
+import reflex as rx
+
+from leomaine.backend.executor import FILE_PREFIX, resolve_file
+from leomaine.backend.fetcher import describe, running_requests
+from leomaine.backend.shape import RecordShaper
+from leomaine.backend.store import SessionData
+from leomaine.backend.transfer import (
+    ARROW_AVAILABLE,
+    ARROW_MISSING,
+    EXPORT_FORMATS,
+    IMPORT_FORMATS,
+    Importer,
+    import_format,
+)
+from leomaine.components.upload_panel import render_uploads
+from leomaine.queries import QueryAPI
+
+
+class TransferState(QueryAPI):
+
+    # vars for exporting the loaded rows and importing a file the session
+    # uploaded ...
+    show_transfer: bool = False
+    import_name: str = ""
+
+    def toggle_transfer(self):
+        self.show_transfer = not self.show_transfer
+
+    def set_import_name(self, value: str):
+        self.import_name = value
+
+    @rx.background
+    async def import_file(self):
+        # Read the file a chunk at a time into a new result set, showing the
+        # rows as they arrive, like a streamed response ...
+        async with self:
+            if self.is_loading:
+                return
+            try:
+                path = resolve_file(
+                    FILE_PREFIX + self.import_name, self._upload_dir()
+                )
+                importer = Importer(path, import_format(path))
+            except (OSError, ValueError) as error:
+                self.request_error = str(error)
+                return
+            token = self.router.session.client_token
+            shape = RecordShaper(self.flatten_depth)
+            session = SessionData(shape=shape)
+            self._store_session(session)
+            self._reset_view()
+            self.cache_status = ""
+            self._start_loading()
+            self.progress_total = importer.size
+            self._publish()
+
+        error = ""
+        try:
+            last_publish = 0.0
+            with running_requests.track(token):
+                async for records in importer.read():
+                    session.result.extend(shape.rows(records))
+                    if time.monotonic() - last_publish > 0.25:
+                        last_publish = time.monotonic()
+                        async with self:
+                            self.progress_bytes = importer.position
+                            self._publish()
+            session.result.compact()
+        except asyncio.CancelledError:
+            error = "Import cancelled"
+        except (OSError, ValueError, httpx.HTTPError) as exc:
+            error = describe(exc)
+        finally:
+            async with self:
+                self.is_loading = False
+                self.is_truncated = importer.truncated
+                self.request_error = error
+                self._publish()
+
+
+def export_href(fmt: str):
+    # The backend streams the export, the session's rows are looked up by
+    # the client token ...
+    return (
+        f"{rx.config.get_config().api_url}/export?format={fmt}&token="
+        + TransferState.router.session.client_token
+    )
+
+
+def create_export_link(fmt: str):
+    return rx.link(
+        rx.button(fmt.upper(), variant="soft", size="2"),
+        href=export_href(fmt),
+    )
+
+
+def render_transfer_panel():
+    return rx.cond(
+        TransferState.show_transfer,
+        rx.vstack(
+            rx.hstack(
+                rx.text("Export rows in view as", size="2"),
+                *[create_export_link(fmt) for fmt in EXPORT_FORMATS],
+                *(
+                    []
+                    if ARROW_AVAILABLE
+                    else [
+                        rx.text(
+                            ARROW_MISSING.format("Parquet and Arrow export"),
+                            size="1",
+                            color_scheme="gray",
+                        )
+                    ]
+                ),
+                align="center",
+                spacing="2",
+            ),
+            rx.hstack(
+                rx.text("Import", size="2"),
+                rx.input(
+                    placeholder="name of an uploaded file.csv",
+                    value=TransferState.import_name,
+                    on_change=TransferState.set_import_name,
+                    width="280px",
+                ),
+                rx.button(
+                    "Import",
+                    on_click=TransferState.import_file,
+                    loading=TransferState.is_loading,
+                ),
+                rx.text(
+                    ", ".join(IMPORT_FORMATS),
+                    size="1",
+                    color_scheme="gray",
+                ),
+                align="center",
+                spacing="2",
+            ),
+            render_uploads("import_uploads"),
+            width="100%",
+            padding="0.5em 0.75em",
+        ),
+    )
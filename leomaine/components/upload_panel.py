@@ -0,0 +1,71 @@
+import reflex as rx
+
+from leomaine.backend.executor import FILE_PREFIX, save_upload, uploaded_files
+from leomaine.queries import QueryAPI
+
+
+class UploadState(QueryAPI):
+
+    # the files this session uploaded, sent as "@name" body values or
+    # imported by name ...
+    uploads: list[str] = []
+    upload_error: str = ""
+
+    def list_uploads(self):
+        self.uploads = uploaded_files(self._upload_dir())
+
+    async def handle_upload(self, files: list[rx.UploadFile]):
+        root = self._upload_dir()
+        self.upload_error = ""
+        for file in files:
+            try:
+                await save_upload(root, file.filename, file.read)
+            except (OSError, ValueError) as error:
+                self.upload_error = str(error)
+        self.list_uploads()
+
+
+def create_upload_badge(name: str):
+    return rx.badge(FILE_PREFIX + name, variant="soft")
+
+
+def render_uploads(upload_id: str):
+    # Each place that takes a file has its own drop zone, `upload_id` tells
+    # them apart on the page ...
+    return rx.vstack(
+        rx.hstack(
+            rx.upload(
+                rx.text("Drop files or click to choose", size="1"),
+                id=upload_id,
+                multiple=True,
+                padding="0.5em 1em",
+                border="1px dashed",
+                border_radius="6px",
+                cursor="pointer",
+            ),
+            rx.button(
+                "Upload",
+                size="1",
+                variant="soft",
+                on_click=UploadState.handle_upload(
+                    rx.upload_files(upload_id=upload_id)
+                ),
+            ),
+            rx.foreach(rx.selected_files(upload_id), rx.text),
+            align="center",
+            spacing="2",
+            wrap="wrap",
+        ),
+        rx.cond(
+            UploadState.upload_error,
+            rx.text(UploadState.upload_error, color_scheme="red", size="1"),
+        ),
+        rx.hstack(
+            rx.foreach(UploadState.uploads, create_upload_badge),
+            spacing="1",
+            wrap="wrap",
+        ),
+        on_mount=UploadState.list_uploads,
+        width="100%",
+        spacing="1",
+    )
@@ -0,0 +1,115 @@
+from typing import Any
+
+import reflex as rx
+from reflex.components.el.elements.typography import Div
+from reflex.vars import BaseVar
+
+from leomaine.queries import (
+    GRID_COL_WIDTH,
+    GRID_ROW_HEIGHT,
+    QueryAPI,
+)
+
+# the grid only asks for a new window once scrolling pauses this long, not
+# on every scroll event the browser fires (one per frame) ...
+SCROLL_DEBOUNCE_MS = 60
+
+
+def _event_attr(event: BaseVar, path: str, type_: type) -> BaseVar:
+    return BaseVar(
+        _var_name=f"{event._var_name}.{path}", _var_type=type_, _var_is_local=True
+    )
+
+
+def _scroll_args(e0):
+    return [
+        _event_attr(e0, "target.scrollTop", int),
+        _event_attr(e0, "target.scrollLeft", int),
+    ]
+
+
+def _row_args(e0):
+    return [_event_attr(e0, "target.dataset.row", str)]
+
+
+class GridViewport(Div):
+    # Scroll container reporting its offsets, and a single click handler for
+    # every cell, which carries its row index in `data-row`.
+
+    def get_event_triggers(self) -> dict[str, Any]:
+        return {
+            **super().get_event_triggers(),
+            "on_scroll": _scroll_args,
+            "on_click": _row_args,
+        }
+
+
+grid_viewport = GridViewport.create
+
+
+def _cell_style(width: str = f"{GRID_COL_WIDTH}px") -> dict:
+    return {
+        "width": width,
+        "min_width": width,
+        "height": f"{GRID_ROW_HEIGHT}px",
+        "padding": "0 0.5em",
+        "line_height": f"{GRID_ROW_HEIGHT}px",
+        "overflow": "hidden",
+        "white_space": "nowrap",
+        "text_overflow": "ellipsis",
+        "border_bottom": "1px solid var(--gray-4)",
+    }
+
+
+def create_grid_row(row: dict[str, str], index: int):
+    return rx.el.div(
+        rx.foreach(
+            QueryAPI.grid_columns,
+            lambda column: rx.el.div(
+                f"{row[column]}",
+                custom_attrs={"data-row": index},
+                style=_cell_style(),
+                cursor="pointer",
+            ),
+        ),
+        display="flex",
+        _hover={"bg": rx.color(color="gray", shade=4)},
+    )
+
+
+def render_grid():
+    left = f"{QueryAPI.grid_col_start * GRID_COL_WIDTH}px"
+    return grid_viewport(
+        # Sized like the full result so the scrollbars cover every row ...
+        rx.el.div(
+            rx.el.div(
+                rx.foreach(
+                    QueryAPI.grid_columns,
+                    lambda column: rx.el.div(
+                        column, style=_cell_style(), font_weight="bold"
+                    ),
+                ),
+                display="flex",
+                position="sticky",
+                top="0",
+                padding_left=left,
+                bg=rx.color(color="gray", shade=2),
+                z_index="1",
+            ),
+            rx.el.div(
+                rx.foreach(QueryAPI.paginated_data, create_grid_row),
+                position="absolute",
+                top=f"{(QueryAPI.grid_row_start + 1) * GRID_ROW_HEIGHT}px",
+                left=left,
+            ),
+            position="relative",
+            height=f"{(QueryAPI.number_of_rows + 1) * GRID_ROW_HEIGHT}px",
+            width=f"{QueryAPI.get_table_headers.length() * GRID_COL_WIDTH}px",
+        ),
+        on_scroll=QueryAPI.scroll_grid.debounce(SCROLL_DEBOUNCE_MS),
+        on_click=QueryAPI.select_grid_row,
+        height="480px",
+        width="100%",
+        overflow="auto",
+        font_size="14px",
+    )
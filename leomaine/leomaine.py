@@ -1,3 +1,12 @@
+import contextlib
+
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+
+from .backend.http_pool import http_pool
+from .backend.metrics import metrics
+from .backend.store import result_store
+from .backend.transfer import export_chunks, file_name, media_type
 from .views.navbar import navbar
 from .views.manage import manage_ui
 import reflex as rx
@@ -54,6 +63,47 @@ app = rx.App(
         appearance="light", has_background=True, radius="large", accent_color="orange"
     ),
 )
+
+
+# Close the shared upstream connection pools when the backend shuts down ...
+@contextlib.asynccontextmanager
+async def close_http_pool():
+    yield
+    await http_pool.aclose()
+
+
+app.register_lifespan_task(close_http_pool)
+
+
+# Prometheus scrape target on the backend port ...
+async def metrics_endpoint() -> Response:
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+app.api.add_api_route("/metrics", metrics_endpoint, methods=["GET"])
+
+
+# Download of a session's rows, in its current sort/filter order. The file
+# is encoded while it is sent, a chunk of rows at a time ...
+async def export_endpoint(token: str, format: str = "csv") -> Response:
+    session = result_store.get(token)
+    if session is None:
+        return Response("No rows loaded for this session", status_code=404)
+    positions = None if session.view is None else list(session.view)
+    try:
+        chunks = export_chunks(session.result, positions, format)
+    except ValueError as error:
+        return Response(str(error), status_code=400)
+    return StreamingResponse(
+        chunks,
+        media_type=media_type(format),
+        headers={
+            "Content-Disposition": f'attachment; filename="{file_name(format)}"'
+        },
+    )
+
+
+app.api.add_api_route("/export", export_endpoint, methods=["GET"])
 app.add_page(
     index,
     title="Leomaine",
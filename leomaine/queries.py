@@ -1,89 +1,384 @@
+import asyncio
+import json
+import sqlite3
+import time
 import uuid
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
 import httpx
+import reflex as rx
+
+from leomaine.backend.cache import (
+    CacheEntry,
+    ResponseCache,
+    cache_directives,
+    cache_key,
+    response_cache,
+)
+from leomaine.backend.crawler import (
+    CRAWL_STYLES,
+    FIRST_PAGES,
+    MAX_CRAWL_ROWS,
+    MORE_PAGES,
+    Crawler,
+)
+from leomaine.backend.executor import (
+    BODY_MODES,
+    cookie_header,
+    request_kwargs,
+    session_dir,
+)
+from leomaine.backend.fetcher import (
+    Progress,
+    describe,
+    fetch,
+    running_requests,
+    send,
+)
+from leomaine.backend.history import MAX_BODY_BYTES, request_history
+from leomaine.backend.http_pool import http_pool
+from leomaine.backend.metrics import RequestTrace, metrics
+from leomaine.backend.semantic_cache import semantic_cache
+from leomaine.backend.shape import (
+    FLATTEN_DEPTH,
+    RecordShaper,
+    Subtree,
+    expand_values,
+)
+from leomaine.backend.store import ResultSet, SessionData, result_store
+from leomaine.backend.streaming import JSONArrayStream
 from leomaine.base_states import BaseState
 
 
+# choices offered by the request builder ...
+REQUEST_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE"]
+GET_BODY_MODES = ["JSON", "Raw", "None"]
+POST_BODY_MODES = BODY_MODES
+
+# builder rows, each entry's "identifier" names the list it belongs to ...
+ENTRY_LISTS = ("headers", "body", "cookies")
+
+# how long a browser keeps its history id, a year ...
+HISTORY_COOKIE_AGE = 365 * 24 * 3600
+
+# what a failed upstream request may raise, shown as the request's error ...
+REQUEST_ERRORS = (httpx.HTTPError, httpx.InvalidURL, OSError, ValueError)
+
+# longest cell text sent with a page, the edit dialog reads the full row ...
+PAGE_CELL_CHARS = 200
+
+# geometry of the virtualized grid, windows move in steps of GRID_STEP rows ...
+GRID_ROW_HEIGHT = 36
+GRID_COL_WIDTH = 180
+GRID_ROWS = 60
+GRID_COLS = 10
+GRID_STEP = 20
+
+
+def _new_entry(identifier: str, key: str = "", value: str = "") -> dict[str, str]:
+    return {
+        "id": str(uuid.uuid4()),
+        "identifier": identifier,
+        "key": key,
+        "value": value,
+    }
+
+
+# Cells as sent with a page: subtrees as their summary, other nested values
+# as JSON text, long text clipped ...
+def _cell(value):
+    if isinstance(value, Subtree):
+        return str(value)
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, default=str)
+    if isinstance(value, str) and len(value) > PAGE_CELL_CHARS:
+        return value[:PAGE_CELL_CHARS] + "..."
+    return value
+
+
+def _page_rows(rows: list[dict]) -> list[dict]:
+    return [{key: _cell(value) for key, value in row.items()} for row in rows]
+
+
+# Full text of a cell for the edit dialog ...
+def _detail(value):
+    return value.to_json() if isinstance(value, Subtree) else value
+
+
+# Keep edited cells the type they were loaded as where the text allows it ...
+def _coerce(value, original):
+    if not isinstance(value, str):
+        return value
+    if isinstance(original, Subtree):
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            return value
+        return Subtree(parsed) if isinstance(parsed, (dict, list)) else parsed
+    if isinstance(original, bool):
+        return {"true": True, "false": False}.get(value.strip().lower(), value)
+    if isinstance(original, (int, float)):
+        try:
+            return type(original)(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _shape_body(res: httpx.Response, raw: bytes, depth: int) -> SessionData:
+    # Rows of a response body, falling back to the status and raw text for
+    # bodies that are not JSON ...
+    shape = RecordShaper(depth)
+    try:
+        result = ResultSet(shape.records(json.loads(raw)))
+    except ValueError:
+        text = raw.decode(res.encoding or "utf-8", errors="replace")
+        result = ResultSet([{"status": res.status_code, "body": text}])
+    return SessionData(result, shape)
+
+
+async def _fetch_cached(
+    url: str,
+    request: dict,
+    depth: int,
+    trace: RequestTrace,
+    progress: Progress,
+) -> tuple[SessionData, int, bytes, str]:
+    # The rows, the status and body as seen by the user (a cache hit reads
+    # 200 with the cached body) and how the cache served them. `request` is
+    # the builder's request, headers and cookies included. A GET with a body
+    # isn't cached. A hit only shows in `trace` as the time taken to copy out
+    # the cached rows ...
+    headers = request["headers"]
+    directives = cache_directives(
+        next((v for k, v in headers.items() if k.lower() == "cache-control"), None)
+    )
+    if request.keys() - {"headers"}:
+        directives["no-store"] = None
+    key = cache_key("GET", url, headers)
+    entry = None if "no-store" in directives else await response_cache.get(key)
+
+    if entry is not None and entry.is_fresh and "no-cache" not in directives:
+        response_cache.hits += 1
+        with trace.phase("parse"):
+            session = SessionData(*entry.parsed(depth))
+        return session, 200, entry.raw, "hit"
+
+    conditional = entry.validators() if entry is not None else {}
+    async with http_pool.client(url) as client:
+        res, raw = await fetch(
+            client,
+            "GET",
+            url,
+            progress,
+            **{**request, "headers": {**headers, **conditional}},
+            extensions=trace.extensions,
+        )
+
+    if entry is not None and res.status_code == 304:
+        response_cache.revalidated += 1
+        entry.refresh(res.headers)
+        with trace.phase("parse"):
+            session = SessionData(*entry.parsed(depth))
+        return session, 200, entry.raw, "revalidated"
+
+    response_cache.misses += 1
+    with trace.phase("parse"):
+        shape = RecordShaper(depth)
+        try:
+            result = ResultSet(shape.records(json.loads(raw)))
+        except ValueError:
+            # Not JSON, shown as the status and text like any other method's
+            # response, and not cached ...
+            return _shape_body(res, raw, depth), res.status_code, raw, "miss"
+    if "no-store" not in directives and ResponseCache.is_storable(res):
+        await response_cache.put(
+            key, CacheEntry.from_headers(raw, res.headers, result.copy(), shape.copy())
+        )
+    return SessionData(result, shape), res.status_code, raw, "miss"
+
+
 class QueryState(BaseState):
 
-    # vars for handling request calls ...
-    req_methods: list[str] = ["GET", "POST"]
+    # vars for handling request calls, the choices themselves are module
+    # constants so they are not stored with every session ...
     req_url: str = "https://jsonplaceholder.typicode.com/posts"
     current_req: str = "GET"
-    get_params_body: list[str] = ["JSON", "Raw", "None"]
-    post_params_body: list[str] = [
-        "JSON",
-        "Raw",
-        "x-www-form-urlencoded",
-        "Form Data",
-        "Binary",
-        "None",
-    ]
+    body_mode: str = "JSON"
 
     # params. for triggering API calls ...
-    url_param: dict[str, str]
     headers: list[dict[str, str]]
     body: list[dict[str, str]]
     cookies: list[dict[str, str]]
 
-    # vars for GET request ...
-    get_data: list[dict[str, str]]
+    # edits typed into the builder rows since they were last sent, by row id.
+    # The inputs already show them, so applying one sends nothing back ...
+    _entry_edits: dict[str, dict[str, str]] = {}
+
+    # the browser's history id, the history only lists the requests and
+    # collections made from the same browser ...
+    history_owner: str = rx.Cookie(
+        "", name="leomaine_history", max_age=HISTORY_COOKIE_AGE, same_site="strict"
+    )
+
+    # vars for GET request, the full response lives in `result_store` ...
     get_table_headers: list[str]
     paginated_data: list[dict[str, str]]
 
-    # vars for pagination ...
+    # vars for pagination, `number_of_rows` counts the rows left after
+    # sorting/filtering and `total_rows` everything that was loaded ...
     number_of_rows: int
+    total_rows: int
     limits: list[str] = ["5","10", "20", "50"]
     current_limit: int = 5
     offset: int = 0
     current_page: int = 1
     total_pages: int = 1
-    formatted_headers: dict
+
+    # connection pool reuse counters and how the last response was served
+    # by the response cache ("hit", "revalidated", "miss" or "") ...
+    pool_stats: dict[str, int]
+    cache_status: str = ""
+
+    # vars for streamed responses, capped by MAX_STREAM_BYTES and
+    # MAX_STREAM_ROWS like the other limits ...
+    stream_mode: bool = False
+    is_loading: bool = False
+    is_truncated: bool = False
+
+    # vars for the request in flight: bytes received of the expected total
+    # (0 when unknown), a note while a retry waits and why the last request
+    # failed ...
+    progress_bytes: int = 0
+    progress_total: int = 0
+    fetch_note: str = ""
+    request_error: str = ""
+
+    # vars for shaping bodies into rows: how many levels of nested objects
+    # become dotted columns, where the records were found in the last body,
+    # which columns still hold objects that can be expanded and the columns
+    # the last expansion had to rename ...
+    flatten_depth: int = FLATTEN_DEPTH
+    records_path: str = ""
+    nested_columns: list[str] = []
+    shape_note: str = ""
+
+    # phases of the last request as waterfall rows (phase, ms, and the bar's
+    # left and width in percent of the whole request) ...
+    request_timings: list[dict[str, str]] = []
+    request_ms: float = 0
+    response_bytes: int = 0
+
+    # vars for following an upstream's pagination, the crawler itself is
+    # kept with the session's result set ...
+    crawl_mode: bool = False
+    crawl_style: str = "auto"
+    crawl_max_rows: int = MAX_CRAWL_ROWS
+    crawl_pages: int = 0
+    crawl_detected: str = ""
+    crawl_has_more: bool = False
+
+    # vars for sorting, filtering and searching the loaded rows ...
+    sort_column: str = ""
+    sort_desc: bool = False
+    search_query: str = ""
+    filter_column: str = ""
+    column_filters: dict[str, str] = {}
+
+    # vars for the virtualized grid, only the rows and columns around the
+    # viewport are sent as `paginated_data` ...
+    grid_mode: bool = False
+    grid_row_start: int = 0
+    grid_col_start: int = 0
+    grid_columns: list[str]
 
     def get_request(self, method: str):
         self.current_req = method
 
+    def _entries(self, identifier: str) -> list[dict[str, str]]:
+        return [
+            {**item, **self._entry_edits.get(item["id"], {})}
+            for item in getattr(self, identifier)
+        ]
+
+    def _flush_edits(self):
+        # Fold pending edits into the rows before a change resends them ...
+        if not self._entry_edits:
+            return
+        for identifier in ENTRY_LISTS:
+            rows = getattr(self, identifier)
+            if any(item["id"] in self._entry_edits for item in rows):
+                setattr(self, identifier, self._entries(identifier))
+        self._entry_edits = {}
+
+    def _add_entry(self, identifier: str):
+        self._flush_edits()
+        getattr(self, identifier).append(_new_entry(identifier))
+
     def add_header(self):
-        self.headers.append(
-            {"id": str(uuid.uuid4()), "identifier": "headers", "key": "", "value": ""}
-        )
+        self._add_entry("headers")
 
     def add_body(self):
-        self.body.append(
-            {"id": str(uuid.uuid4()), "identifier": "body", "key": "", "value": ""}
-        )
+        self._add_entry("body")
 
     def add_cookies(self):
-        self.cookies.append(
-            {"id": str(uuid.uuid4()), "identifier": "cookies", "key": "", "value": ""}
-        )
+        self._add_entry("cookies")
 
     def remove_entry(self, data: dict[str, str]):
-        if data["identifier"] == "headers":
-            self.headers = [item for item in self.headers if item["id"] != data["id"]]
-
-        if data["identifier"] == "body":
-            self.body = [item for item in self.body if item["id"] != data["id"]]
-
-        if data["identifier"] == "cookies":
-            self.cookies = [item for item in self.cookies if item["id"] != data["id"]]
+        if data["identifier"] not in ENTRY_LISTS:
+            return
+        self._flush_edits()
+        rows = getattr(self, data["identifier"])
+        setattr(
+            self,
+            data["identifier"],
+            [item for item in rows if item["id"] != data["id"]],
+        )
 
     async def update_attribute(self, data: dict[str, str], attribute: str, value: str):
-        data[attribute] = value
-
-        if data["identifier"] == "headers":
-            self.headers = [
-                data if item["id"] == data["id"] else item for item in self.headers
-            ]
-
-        if data["identifier"] == "body":
-            self.body = [
-                data if item["id"] == data["id"] else item for item in self.body
-            ]
+        # Debounced on the client, applied here by row id only ...
+        with metrics.timer("leomaine_handler_seconds", handler="update_attribute"):
+            if data["identifier"] in ENTRY_LISTS:
+                self._entry_edits.setdefault(data["id"], {})[attribute] = value
+
+    def _set_entries(self, identifier: str, pairs):
+        # Replace a list of builder rows, pending edits of the old rows are
+        # dropped with them on the next flush ...
+        setattr(
+            self,
+            identifier,
+            [_new_entry(identifier, key, value) for key, value in pairs],
+        )
 
-        if data["identifier"] == "cookies":
-            self.cookies = [
-                data if item["id"] == data["id"] else item for item in self.cookies
-            ]
+    def _snapshot(self) -> dict:
+        # The builder's request as recorded in the history ...
+        return {
+            "body_mode": self.body_mode,
+            **{
+                identifier: [
+                    [item["key"], item["value"]] for item in self._entries(identifier)
+                ]
+                for identifier in ENTRY_LISTS
+            },
+        }
+
+    def _upload_dir(self) -> Path:
+        # The files this session uploaded, the only ones it can send ...
+        return session_dir(rx.get_upload_dir(), self.router.session.client_token)
+
+    def _history_owner(self) -> str:
+        if not self.history_owner:
+            self.history_owner = uuid.uuid4().hex
+        return self.history_owner
+
+    def restore_request(self, method: str, url: str, snapshot: dict):
+        self.current_req = method
+        self.req_url = url
+        self.body_mode = snapshot.get("body_mode", self.body_mode)
+        for identifier in ENTRY_LISTS:
+            self._set_entries(identifier, snapshot.get(identifier, []))
 
     async def update_keyy(self, key: str, data: dict[str, str]):
         await self.update_attribute(data, "key", key)
@@ -94,38 +389,490 @@ class QueryState(BaseState):
 
 class QueryAPI(QueryState):
 
-    # vars to update row entries ...
+    # vars to update row entries, the row being edited is kept by its id in
+    # the result set it was opened from (see `SessionData.run_id`) ...
     is_open: bool = False
     selected_entry: dict[str, str]
-    original_entry: dict[str, str]
+    _selected_id: int = -1
+    _selected_run: str = ""
+    # edits typed into the dialog, kept on the backend until saved ...
+    _pending_edits: dict[str, str] = {}
+    # set when `next` ran past the loaded rows while more were fetched ...
+    _crawl_advance: bool = False
+
+    def _formatted_headers(self) -> dict[str, str]:
+        return {
+            item["key"]: item["value"]
+            for item in self._entries("headers")
+            if item["key"]
+        }
+
+    def _crawl_headers(self) -> dict[str, str]:
+        # A crawl sends no body, only the headers and cookies ...
+        headers = self._formatted_headers()
+        cookie = cookie_header(self._entries("cookies"))
+        if cookie:
+            headers["Cookie"] = cookie
+        return headers
+
+    def _request_kwargs(self):
+        # Encoded body, headers and cookies for the builder's current request.
+        # Files named in the body ("@name") are read from the session's
+        # uploads in chunks while the request is sent ...
+        return request_kwargs(
+            self._formatted_headers(),
+            self.body_mode,
+            self._entries("body"),
+            self._entries("cookies"),
+            self._upload_dir(),
+        )
 
-    async def process_headers(self):
-        for item in self.headers:
-            if item["key"]:
-                self.formatted_headers[item["key"]] = item["value"]
+    def run_request(self):
+        if self.crawl_mode and self.current_req == "GET":
+            return QueryAPI.crawl_request
+        if self.stream_mode:
+            return QueryAPI.stream_request
+        return QueryAPI.fetch_request
+
+    def cancel_request(self):
+        running_requests.cancel(self.router.session.client_token)
+
+    def _start_loading(self):
+        self.is_loading = True
+        self.is_truncated = False
+        self.request_error = ""
+        self.fetch_note = ""
+        self.progress_bytes = 0
+        self.progress_total = 0
+        # A crawl or an import leaves the waterfall empty, it times one
+        # request ...
+        self.request_timings = []
+        self.request_ms = 0
+        self.response_bytes = 0
+
+    async def _report(self, progress: Progress):
+        async with self:
+            self.progress_bytes = progress.received
+            self.progress_total = progress.total
+            self.fetch_note = progress.note
+
+    @rx.background
+    async def fetch_request(self):
+        # The state is only locked to read the request and to show progress
+        # and the result, the upstream is waited on without it, so the page
+        # stays usable while a slow request is in flight ...
+        async with self:
+            if self.is_loading:
+                return
+            method, url = self.current_req, self.req_url
+            snapshot = self._snapshot()
+            owner = self._history_owner()
+            request = self._request_kwargs()
+            depth = self.flatten_depth
+            token = self.router.session.client_token
+            self._start_loading()
+
+        started = time.perf_counter()
+        trace = RequestTrace()
+        progress = Progress(self._report)
+        session, status, raw, cache_status, error = None, None, None, "", ""
+        try:
+            with running_requests.track(token), request as kwargs:
+                if method == "GET":
+                    session, status, raw, cache_status = await _fetch_cached(
+                        url, kwargs, depth, trace, progress
+                    )
+                else:
+                    async with http_pool.client(url) as client:
+                        res, raw = await fetch(
+                            client,
+                            method,
+                            url,
+                            progress,
+                            extensions=trace.extensions,
+                            **kwargs,
+                        )
+                    status = res.status_code
+                    with trace.phase("parse"):
+                        session = _shape_body(res, raw, depth)
+        except asyncio.CancelledError:
+            error = "Request cancelled"
+        except REQUEST_ERRORS as exc:
+            error = describe(exc)
+        finally:
+            async with self:
+                self.is_loading = False
+                self.request_error = error
+                self.fetch_note = ""
+                self.pool_stats = http_pool.stats()
+                if session is not None:
+                    with trace.phase("state"):
+                        self._store_session(session, (method, url))
+                        self._reset_view()
+                        self.cache_status = cache_status
+                        self._publish()
+                    trace.size = len(raw)
+                self._show_timings(trace, recorded=session is not None)
+            await self._remember(owner, method, url, snapshot, status, started, raw)
+
+    def _show_timings(self, trace: RequestTrace, recorded: bool = True):
+        # A failed request shows the phases it got through, only requests
+        # that loaded rows are recorded in the metrics ...
+        if recorded:
+            trace.record(metrics)
+        self.request_timings = trace.waterfall()
+        self.request_ms = round(trace.total_ms(), 2)
+        self.response_bytes = trace.size
+
+    @rx.background
+    async def stream_request(self):
+        async with self:
+            if self.is_loading:
+                return
+            method, url = self.current_req, self.req_url
+            snapshot = self._snapshot()
+            owner = self._history_owner()
+            request = self._request_kwargs()
+            token = self.router.session.client_token
+            parser = JSONArrayStream()
+            shape = RecordShaper(self.flatten_depth)
+            session = SessionData(shape=shape)
+            result = session.result
+            self._store_session(session, (method, url))
+            self._reset_view()
+            self.cache_status = ""
+            self._start_loading()
+            self._publish()
+
+        started = time.perf_counter()
+        trace = RequestTrace()
+        progress = Progress(self._report)
+        status, raw, error = None, bytearray(), ""
+        try:
+            with running_requests.track(token), request as kwargs:
+                async with http_pool.client(url) as client:
+                    res = await send(
+                        client,
+                        method,
+                        url,
+                        progress,
+                        extensions=trace.extensions,
+                        **kwargs,
+                    )
+                    try:
+                        status = res.status_code
+                        last_publish = 0.0
+                        async for chunk in res.aiter_bytes():
+                            trace.size += len(chunk)
+                            result.extend(shape.rows(parser.feed(chunk)))
+                            if raw is not None:
+                                raw += chunk
+                                if len(raw) > MAX_BODY_BYTES:
+                                    raw = None
+
+                            # Show the first page as soon as it is filled, then
+                            # refresh the counters a few times per second ...
+                            loaded = len(result)
+                            first_page = self.total_rows < self.current_limit <= loaded
+                            if first_page or time.monotonic() - last_publish > 0.25:
+                                last_publish = time.monotonic()
+                                async with self:
+                                    self.progress_bytes = res.num_bytes_downloaded
+                                    self._publish()
+
+                            if parser.done:
+                                break
+                    finally:
+                        await res.aclose()
+            # A root other than an array arrives whole, envelope and all. An
+            # empty body (a 204, say) has no rows. Rows parsed while the body
+            # arrived count as download, `parse` is what is left after it ...
+            with trace.phase("parse"):
+                closing = parser.close()
+                if parser.is_array:
+                    result.extend(shape.rows(closing))
+                elif closing:
+                    result.extend(shape.records(closing[0]))
+                result.compact()
+        except asyncio.CancelledError:
+            error = "Request cancelled"
+        except REQUEST_ERRORS as exc:
+            error = describe(exc)
+        finally:
+            async with self:
+                self.pool_stats = http_pool.stats()
+                self.is_loading = False
+                self.is_truncated = parser.truncated
+                self.request_error = error
+                self.fetch_note = ""
+                with trace.phase("state"):
+                    self._publish()
+                self._show_timings(trace, recorded=not error)
+            await self._remember(
+                owner,
+                method,
+                url,
+                snapshot,
+                status,
+                started,
+                bytes(raw) if raw is not None else None,
+            )
+
+    def set_crawl_max_rows(self, value: str):
+        self.crawl_max_rows = min(max(int(value or 0), 1), MAX_CRAWL_ROWS)
+
+    @rx.background
+    async def crawl_request(self):
+        async with self:
+            if self.is_loading:
+                return
+            url = self.req_url
+            snapshot = self._snapshot()
+            owner = self._history_owner()
+            session = SessionData(shape=RecordShaper(self.flatten_depth))
+            session.crawler = Crawler(
+                url, self._crawl_headers(), self.crawl_style, self.crawl_max_rows
+            )
+            token = self.router.session.client_token
+            self._store_session(session, ("GET", url))
+            self._reset_view()
+            self.cache_status = ""
+            self._start_loading()
+            self._publish()
+
+        started = time.perf_counter()
+        await self._crawl(session, FIRST_PAGES, token)
+        await self._remember(
+            owner, "GET", url, snapshot, session.crawler.status, started, None
+        )
 
-    async def run_get_request(self):
-        await self.process_headers()
-        async with httpx.AsyncClient() as client:
-            res = await client.get(self.req_url, headers=self.formatted_headers)
+    @rx.background
+    async def crawl_more(self):
+        async with self:
+            session = self._session()
+            crawler = session.crawler
+            if self.is_loading or crawler is None or not crawler.has_more:
+                return
+            token = self.router.session.client_token
+            self._start_loading()
+        await self._crawl(session, MORE_PAGES, token)
+
+    async def _crawl(self, session: SessionData, pages: int, token: str):
+        # Append up to `pages` upstream pages to the session's rows, showing
+        # progress a few times per second ...
+        crawler = session.crawler
+        error = ""
+        try:
+            last_publish = 0.0
+            with running_requests.track(token):
+                async for rows in crawler.fetch(pages):
+                    session.result.extend(session.shape.rows(rows))
+                    if time.monotonic() - last_publish > 0.25:
+                        last_publish = time.monotonic()
+                        async with self:
+                            self._publish_crawl(crawler)
+        except asyncio.CancelledError:
+            error = "Request cancelled"
+        except REQUEST_ERRORS as exc:
+            error = describe(exc)
+        finally:
+            session.result.compact()
+            async with self:
+                self.request_error = error
+                self.is_loading = False
+                self.pool_stats = http_pool.stats()
+                self._publish_crawl(crawler)
+                if self._crawl_advance:
+                    self._crawl_advance = False
+                    if self.offset + self.current_limit < self.number_of_rows:
+                        self.offset += self.current_limit
+                        self.paginate()
+
+    def _publish_crawl(self, crawler: Crawler):
+        self.crawl_pages = crawler.pages
+        self.crawl_detected = crawler.style if crawler.pages else ""
+        self.crawl_has_more = crawler.has_more
+        self.is_truncated = crawler.truncated
+        self._publish()
+
+    def _has_upstream_pages(self) -> bool:
+        crawler = self._session().crawler
+        return crawler is not None and crawler.has_more
+
+    async def _remember(
+        self,
+        owner: str,
+        method: str,
+        url: str,
+        snapshot: dict,
+        status: Optional[int],
+        started: float,
+        body: Optional[bytes],
+    ):
+        # Record the request in the history, off the event loop. Called once
+        # the request is shown, a failed write is only reported ...
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        try:
+            await asyncio.to_thread(
+                request_history.record,
+                owner,
+                method,
+                url,
+                snapshot,
+                status,
+                elapsed_ms,
+                body,
+            )
+        except (sqlite3.Error, OSError) as exc:
+            async with self:
+                if not self.request_error:
+                    self.request_error = f"Not saved to history: {exc}"
+
+    def _session(self) -> SessionData:
+        return result_store.get(self.router.session.client_token) or SessionData()
+
+    def _store_session(
+        self, session: SessionData, request: Optional[tuple[str, str]] = None
+    ):
+        # The result being replaced stays around as the previous run, see
+        # `SessionData.replaces`. `request` is the method and URL the rows
+        # are fetched with ...
+        session.request = request
+        current = result_store.get(self.router.session.client_token)
+        if current is not None:
+            session.replaces(current)
+        result_store.put(self.router.session.client_token, session)
+        self.shape_note = ""
+        self.crawl_pages = 0
+        self.crawl_detected = ""
+        self.crawl_has_more = False
+
+    def _reset_view(self):
+        self.offset = 0
+        self.sort_column = ""
+        self.sort_desc = False
+        self.search_query = ""
+        self.column_filters = {}
+
+    def _publish(self):
+        session = self._session()
+        if self.sort_column or self.search_query or any(self.column_filters.values()):
+            session.view = session.index.query(
+                self.sort_column,
+                self.sort_desc,
+                self.column_filters,
+                self.search_query,
+            )
+        else:
+            session.view = None
 
-            self.get_data = res.json()
-            self.number_of_rows = len(self.get_data)
-            self.get_table_headers = list(self.get_data[0].keys())
+        self.total_rows = len(session.result)
+        self.records_path = session.shape.path
+        self.nested_columns = sorted(session.shape.nested)
+        self.number_of_rows = len(session)
+        self.get_table_headers = session.result.headers
 
-            # Calculate the total number of pages
-            self.total_pages = (
-                self.number_of_rows + self.current_limit - 1
-            ) // self.current_limit
+        # Calculate the total number of pages
+        self.total_pages = max(
+            (self.number_of_rows + self.current_limit - 1) // self.current_limit, 1
+        )
 
-            # Initialize the data to the first page
-            self.paginate()
+        # Initialize the data to the current page
+        self.paginate()
 
     def paginate(self):
-        start = self.offset
-        end = start + self.current_limit
-        self.paginated_data = self.get_data[start:end]
-        self.current_page = (self.offset // self.current_limit) + 1
+        with metrics.timer("leomaine_handler_seconds", handler="paginate"):
+            # Rows live in the backend process that loaded them, after a
+            # restart, an eviction or a reconnect to another backend only
+            # the shared state still counts them ...
+            token = self.router.session.client_token
+            if self.total_rows and result_store.get(token) is None:
+                self.request_error = "The loaded rows are gone, send the request again"
+                self._publish()
+                return
+            if self.grid_mode:
+                self._fill_grid()
+                return
+            self.paginated_data = _page_rows(
+                self._session().page(self.offset, self.current_limit)
+            )
+            self.current_page = (self.offset // self.current_limit) + 1
+
+    def _fill_grid(self):
+        session = self._session()
+        start = self.grid_col_start
+        self.grid_columns = session.result.headers[start : start + GRID_COLS]
+        self.paginated_data = [
+            {key: _cell(row[key]) for key in self.grid_columns}
+            for row in session.page(self.grid_row_start, GRID_ROWS)
+        ]
+
+    def toggle_grid(self, value: bool):
+        self.grid_mode = value
+        self.grid_row_start = 0
+        self.grid_col_start = 0
+        self.paginate()
+
+    def scroll_grid(self, top: int, left: int):
+        # Keep a block of rows above the viewport and only move the window
+        # once the viewport crosses a block boundary ...
+        row = max(int(top or 0) // GRID_ROW_HEIGHT - GRID_STEP, 0)
+        row_start = row // GRID_STEP * GRID_STEP
+        col_start = max(int(left or 0) // GRID_COL_WIDTH - 1, 0)
+        if (row_start, col_start) == (self.grid_row_start, self.grid_col_start):
+            return
+        self.grid_row_start = row_start
+        self.grid_col_start = col_start
+        self._fill_grid()
+
+    def select_grid_row(self, index: str):
+        if index:
+            self.display_selected_row(int(index))
+
+    def sort_by(self, column: str):
+        if self.sort_column == column:
+            self.sort_desc = not self.sort_desc
+        else:
+            self.sort_column = column
+            self.sort_desc = False
+        self.offset = 0
+        self._publish()
+
+    def search(self, text: str):
+        self.search_query = text
+        self.offset = 0
+        self._publish()
+
+    def apply_filter(self, value: str):
+        if not self.filter_column:
+            return
+        self.column_filters[self.filter_column] = value
+        self.offset = 0
+        self._publish()
+
+    def clear_filters(self):
+        self._reset_view()
+        self._publish()
+
+    def apply_plan(self, plan: dict):
+        # Fill the builder from a compiled plan (see `backend.planner`). A
+        # new page size re-pages the rows already loaded ...
+        url = plan["url"]
+        if plan["params"]:
+            parts = urlsplit(url)
+            query = parse_qsl(parts.query, keep_blank_values=True)
+            query += list(plan["params"].items())
+            url = urlunsplit(parts._replace(query=urlencode(query)))
+        self.current_req = plan["method"]
+        self.req_url = url
+        self._set_entries("headers", plan["headers"].items())
+        self._set_entries("body", plan["body"].items())
+        if plan["limit"]:
+            self.current_limit = plan["limit"]
+            if str(plan["limit"]) not in self.limits:
+                self.limits = sorted({*self.limits, str(plan["limit"])}, key=int)
+            self.offset = 0
+            self._publish()
 
     def delta_limit(self, limit: str):
         self.current_limit = int(limit)
@@ -146,25 +893,92 @@ class QueryAPI(QueryState):
     def next(self):
         if self.offset + self.current_limit < self.number_of_rows:
             self.offset += self.current_limit
+        elif self._has_upstream_pages():
+            # Paging past the loaded rows fetches the next upstream pages ...
+            self._crawl_advance = True
+            return QueryAPI.crawl_more
 
         self.paginate()
 
+        # and reaching the last loaded page fetches them ahead of time ...
+        last_page = self.offset + 2 * self.current_limit > self.number_of_rows
+        if last_page and not self.is_loading and self._has_upstream_pages():
+            return QueryAPI.crawl_more
+
     def delta_drawer(self):
         self.is_open = not self.is_open
 
-    def display_selected_row(self, data: dict[str, str]):
+    def display_selected_row(self, index: int):
+        session = self._session()
+        if not 0 <= index < len(session.page_ids):
+            return
         self.delta_drawer()
-        self.selected_entry = data.copy()
-        self.original_entry = data
+        self._selected_id = session.page_ids[index]
+        self._selected_run = session.run_id
+        row = session.result.row(self._selected_id)
+        self.selected_entry = {key: _detail(value) for key, value in row.items()}
+        self._pending_edits = {}
+
+    def set_flatten_depth(self, value: str):
+        # Applies from the next response on ...
+        self.flatten_depth = min(max(int(value or 0), 0), 8)
+
+    def expand_column(self, column: str):
+        # Flatten one more level of a column holding nested objects ...
+        session = self._session()
+        if column not in session.shape.nested:
+            return
+        if self.sort_column == column:
+            self.sort_column = ""
+        self.column_filters.pop(column, None)
+        # Children still holding objects stay expandable, under the name
+        # they end up with ...
+        inner: set[str] = set()
+        children = expand_values(column, session.result.column(column), inner)
+        renamed = session.result.splice_column(column, children)
+        session.shape.nested.discard(column)
+        session.shape.nested.update(renamed.get(name, name) for name in inner)
+        self.shape_note = ", ".join(
+            f"{name} renamed to {new}, the name was taken"
+            for name, new in renamed.items()
+        )
+        self._publish()
 
     def update_data(self, value: str, data: tuple[str, str]):
-        self.selected_entry[data[0]] = value
+        self._pending_edits[data[0]] = value
 
     def commit_changes(self):
-        self.get_data = [
-            self.selected_entry if item == self.original_entry else item
-            for item in self.get_data
-        ]
-
-        self.paginate()
+        session = self._session()
+        row_id, self._selected_id = self._selected_id, -1
         self.delta_drawer()
+        if session.run_id != self._selected_run or not 0 <= row_id < len(
+            session.result
+        ):
+            # The rows were replaced while the dialog was open ...
+            self.request_error = "The rows were reloaded, the edit was not saved"
+            return
+
+        # Write only the edited fields, straight to the row's id. Rows are
+        # only ever appended, so the id holds whatever the page shows now ...
+        with metrics.timer("leomaine_handler_seconds", handler="commit_changes"):
+            current = session.result.row(row_id)
+            changes = {
+                key: _coerce(value, current[key])
+                for key, value in self._pending_edits.items()
+                if key in current and value != current[key]
+            }
+            if not changes:
+                return
+            # Chat answers given over the unedited rows no longer hold ...
+            if session.fingerprint is not None:
+                semantic_cache.invalidate(session.fingerprint)
+            session.result.set_row(row_id, changes)
+            # Reflex sends a changed list var whole, so the page is only
+            # touched if it still shows the row ...
+            if row_id in session.page_ids:
+                position = session.page_ids.index(row_id)
+                shown = self.paginated_data[position]
+                self.paginated_data[position] = {
+                    key: _cell(changes[key]) if key in changes else value
+                    for key, value in shown.items()
+                }
@@ -1,7 +1,20 @@
 import reflex as rx
-from leomaine.queries import QueryState, QueryAPI, BaseState
+from leomaine.queries import (
+    CRAWL_STYLES,
+    GET_BODY_MODES,
+    POST_BODY_MODES,
+    REQUEST_METHODS,
+    BaseState,
+    QueryAPI,
+    QueryState,
+)
 from typing import Optional
+from leomaine.components.batch_runner import BatchState, render_batch_panel
+from leomaine.components.diff_panel import DiffState, render_diff_panel
+from leomaine.components.history_panel import HistoryState, render_history_panel
 from leomaine.components.query_output import render_output
+from leomaine.components.transfer_panel import TransferState, render_transfer_panel
+from leomaine.components.upload_panel import render_uploads
 
 
 # Helper for the title or head of sections
@@ -32,24 +45,36 @@ def item_add_event(event_trigger: callable):
 
 # Function to handle form entries (key-value pairs)
 def form_entry(data: dict[str, list[str, str]]):
-    def create_entry(title: str, function: callable):
-        return rx.input(
-            placeholder=title,
-            width="100%",
-            on_change=function,
-            variant="soft",
+    # Keystrokes are coalesced on the client and sent after a pause or when
+    # the input loses focus, one event per edit instead of per character ...
+    def create_entry(title: str, value, function: callable):
+        return rx.debounce_input(
+            rx.input(
+                placeholder=title,
+                value=value,
+                width="100%",
+                on_change=function,
+                variant="soft",
+            ),
+            debounce_timeout=300,
+            force_notify_on_blur=True,
         )
 
     return rx.hstack(
-        create_entry("key", lambda key: QueryState.update_keyy(key, data)),
-        create_entry("value", lambda value: QueryState.update_value(value, data)),
+        create_entry(
+            "key", data["key"], lambda key: QueryState.update_keyy(key, data)
+        ),
+        create_entry(
+            "value", data["value"], lambda value: QueryState.update_value(value, data)
+        ),
         rx.button(
             "DEL",
-            on_click=lambda: QueryState.remove_entry(),
+            on_click=QueryState.remove_entry(data),
             color_scheme="red",
             cursor="pointer",
             variant="soft",
         ),
+        key=data["id"],
         width="100%",
         spacing="2",
     )
@@ -83,31 +108,45 @@ def form_body_param_item(
         header="Body",  # Title for the body section
         content=rx.box(
             rx.match(
-                QueryState.req_methods,  # Matching the current request method (GET/POST)
+                QueryState.current_req,  # Matching the current request method
                 (
                     "GET",
                     rx.select(
-                        items=QueryState.get_params_body,
-                        default_value="None",
+                        items=GET_BODY_MODES,
+                        value=QueryState.body_mode,
+                        on_change=QueryState.set_body_mode,
                         width="100%",
                     ),
                 ),
-                (
-                    "POST",
-                    rx.vstack(
-                        rx.hstack(
-                            item_add_event(event_trigger),
-                            width="100%",
-                            justify="flex-end",
-                        ),
-                        rx.select(
-                            items=QueryState.post_params_body,
-                            default_value="JSON",
+                # POST, PUT, PATCH and DELETE all take a body ...
+                rx.vstack(
+                    rx.hstack(
+                        item_add_event(event_trigger),
+                        width="100%",
+                        justify="flex-end",
+                    ),
+                    rx.select(
+                        items=POST_BODY_MODES,
+                        value=QueryState.body_mode,
+                        on_change=QueryState.set_body_mode,
+                        width="100%",
+                    ),
+                    rx.cond(
+                        (QueryState.body_mode == "Form Data")
+                        | (QueryState.body_mode == "Binary"),
+                        rx.vstack(
+                            rx.text(
+                                "Use @file.name as a value to stream a file you "
+                                "uploaded.",
+                                size="1",
+                                color_scheme="gray",
+                            ),
+                            render_uploads("body_uploads"),
                             width="100%",
                         ),
-                        rx.vstack(rx.foreach(state, func), width="100%", spacing="1"),
-                        width="100%",
                     ),
+                    rx.vstack(rx.foreach(state, func), width="100%", spacing="1"),
+                    width="100%",
                 ),
             ),
         ),
@@ -121,9 +160,9 @@ def form_request_item():
         content=rx.box(
             rx.hstack(
                 rx.select(
-                    items=QueryState.req_methods,
+                    items=REQUEST_METHODS,
                     width="120px",
-                    default_value="GET",
+                    value=QueryState.current_req,
                     on_change=QueryState.get_request,
                 ),
                 rx.input(
@@ -155,9 +194,9 @@ def render_query_header():
     return rx.hstack(
         rx.hstack(
             rx.select(
-                items=QueryState.req_methods,
+                items=REQUEST_METHODS,
                 width="100px",
-                default_value="GET",
+                value=QueryState.current_req,
                 on_change=QueryState.get_request,
                 size="3",
             ),
@@ -174,8 +213,82 @@ def render_query_header():
             width="100%",
             spacing="1",
         ),
-        rx.button(
-            "Send", size="3", on_click=QueryAPI.run_get_request, cursor="pointer"
+        rx.hstack(
+            rx.text("Stream", size="2"),
+            rx.switch(
+                checked=QueryAPI.stream_mode,
+                on_change=QueryAPI.set_stream_mode,
+            ),
+            rx.text("Pages", size="2"),
+            rx.switch(
+                checked=QueryAPI.crawl_mode,
+                on_change=QueryAPI.set_crawl_mode,
+            ),
+            rx.cond(
+                QueryAPI.crawl_mode,
+                rx.hstack(
+                    rx.select(
+                        CRAWL_STYLES,
+                        value=QueryAPI.crawl_style,
+                        on_change=QueryAPI.set_crawl_style,
+                        width="100px",
+                    ),
+                    rx.input(
+                        value=QueryAPI.crawl_max_rows,
+                        on_change=QueryAPI.set_crawl_max_rows,
+                        type="number",
+                        title="Most rows to load",
+                        width="100px",
+                    ),
+                    spacing="1",
+                ),
+            ),
+            rx.cond(
+                QueryAPI.is_loading,
+                rx.button(
+                    "Cancel",
+                    size="3",
+                    color_scheme="red",
+                    on_click=QueryAPI.cancel_request,
+                    cursor="pointer",
+                ),
+                rx.button(
+                    "Send",
+                    size="3",
+                    on_click=QueryAPI.run_request,
+                    cursor="pointer",
+                ),
+            ),
+            rx.button(
+                "Batch",
+                size="3",
+                variant="soft",
+                on_click=BatchState.toggle_batch,
+                cursor="pointer",
+            ),
+            rx.button(
+                "History",
+                size="3",
+                variant="soft",
+                on_click=HistoryState.toggle_history,
+                cursor="pointer",
+            ),
+            rx.button(
+                "Diff",
+                size="3",
+                variant="soft",
+                on_click=DiffState.toggle_diff,
+                cursor="pointer",
+            ),
+            rx.button(
+                "Transfer",
+                size="3",
+                variant="soft",
+                on_click=TransferState.toggle_transfer,
+                cursor="pointer",
+            ),
+            align="center",
+            spacing="2",
         ),
         width="100%",
         border_bottom=rx.color_mode_cond(
@@ -209,6 +322,10 @@ def manage_ui():
     return rx.vstack(
         render_query_header(),
         render_expandable_section(),
+        render_batch_panel(),
+        render_history_panel(),
+        render_diff_panel(),
+        render_transfer_panel(),
         render_output(),
         width="100%",
         padding_bottom="0.75em",
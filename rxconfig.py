@@ -1,5 +1,23 @@
+import os
+
 import reflex as rx
 
+
+# One backend process keeps every session in memory. For several backends,
+# set REDIS_URL so they share session state, run each backend with a single
+# worker and route each browser to the same backend, see "Running several
+# backends" in the README ...
 config = rx.Config(
     app_name="leomaine",
-)
\ No newline at end of file
+    redis_url=os.environ.get("REDIS_URL") or None,
+    gunicorn_workers=1,
+)
+
+# Loaded rows live in the process that fetched them, a second worker would
+# serve a session's events without its rows (Reflex reads GUNICORN_WORKERS
+# from the environment) ...
+if config.gunicorn_workers != 1:
+    raise ValueError(
+        f"GUNICORN_WORKERS={config.gunicorn_workers}: leomaine runs one worker "
+        "per backend, start more backends to use more cores"
+    )
@@ -0,0 +1,48 @@
+import asyncio
+
+import httpx
+
+from leomaine.backend.batch import BatchRun, percentile
+
+
+def test_failed_sends_are_recorded_per_request():
+    async def send(params):
+        if params["n"] % 2:
+            raise FileNotFoundError("no uploaded file named 'file:x'")
+        return httpx.Response(200, content=b"ok")
+
+    run = BatchRun(send, [{"n": i} for i in range(6)], concurrency=2)
+    asyncio.run(run.run())
+    assert run.histogram() == {"200": 3, "FileNotFoundError": 3}
+    assert run.summary()["errors"] == 3
+
+
+def test_only_concurrency_requests_are_in_flight():
+    in_flight, peak = 0, 0
+
+    async def send(params):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+        return httpx.Response(204)
+
+    run = BatchRun(send, [{}] * 50, concurrency=3)
+    asyncio.run(run.run())
+    assert run.completed == 50
+    assert peak == 3
+
+
+def test_percentile_is_the_nearest_rank():
+    hundred = [float(value) for value in range(1, 101)]
+    assert [percentile(hundred, share) for share in (0.5, 0.95, 0.99, 1)] == [
+        50,
+        95,
+        99,
+        100,
+    ]
+    assert percentile(hundred, 0.29) == 29
+    ten = [float(value) for value in range(1, 11)]
+    assert (percentile(ten, 0.5), percentile(ten, 0.99)) == (5, 10)
+    assert (percentile([7.0], 0.5), percentile([], 0.5)) == (7, 0)
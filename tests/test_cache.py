@@ -0,0 +1,66 @@
+import time
+
+import httpx
+
+from leomaine.backend.cache import CacheEntry, ResponseCache, cache_key
+
+URL = "https://api.example.com/posts"
+
+
+def response(headers: dict, status: int = 200, method: str = "GET") -> httpx.Response:
+    return httpx.Response(
+        status, headers=headers, request=httpx.Request(method, URL), content=b"[]"
+    )
+
+
+def test_key_ignores_header_case_order_and_validators():
+    first = cache_key("GET", URL, {"Accept": "application/json", "X-Team": "a"})
+    second = cache_key(
+        "get",
+        URL,
+        {"x-team": "a ", "accept": "application/json", "If-None-Match": '"v1"'},
+    )
+    assert first == second
+
+
+def test_key_separates_cookies_and_credentials():
+    base = cache_key("GET", URL, {})
+    alice = cache_key("GET", URL, {"Cookie": "sid=alice"})
+    bob = cache_key("GET", URL, {"Cookie": "sid=bob"})
+    token = cache_key("GET", URL, {"Authorization": "Bearer t"})
+    assert len({base, alice, bob, token}) == 4
+
+
+def test_key_separates_urls_and_methods():
+    assert cache_key("GET", URL, {}) != cache_key("GET", URL + "?page=2", {})
+    assert cache_key("GET", URL, {}) != cache_key("HEAD", URL, {})
+
+
+def test_storable_responses():
+    assert ResponseCache.is_storable(response({"Cache-Control": "max-age=60"}))
+    assert ResponseCache.is_storable(response({"Vary": "Accept, Cookie"}))
+    assert not ResponseCache.is_storable(response({"Cache-Control": "no-store"}))
+    assert not ResponseCache.is_storable(response({}, status=201))
+    assert not ResponseCache.is_storable(response({}, method="POST"))
+
+
+def test_vary_on_headers_left_out_of_the_key_is_not_stored():
+    assert not ResponseCache.is_storable(response({"Vary": "*"}))
+    assert not ResponseCache.is_storable(response({"Vary": "Accept, Cache-Control"}))
+
+
+def test_freshness_from_headers():
+    fresh = CacheEntry.from_headers(
+        b"[]", httpx.Headers({"Cache-Control": "max-age=60"})
+    )
+    assert fresh.is_fresh
+    aged = CacheEntry.from_headers(
+        b"[]", httpx.Headers({"Cache-Control": "max-age=60", "Age": "61"})
+    )
+    assert not aged.is_fresh
+    stale = CacheEntry.from_headers(
+        b"[]", httpx.Headers({"Cache-Control": "no-cache", "ETag": '"v1"'})
+    )
+    assert not stale.is_fresh and stale.can_revalidate
+    assert stale.validators() == {"If-None-Match": '"v1"'}
+    assert fresh.expires_at > time.time()
@@ -0,0 +1,77 @@
+import asyncio
+
+import httpx
+import pytest
+
+from leomaine.backend import fetcher
+from leomaine.backend.crawler import Crawler
+from leomaine.backend.http_pool import http_pool
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    # pages of two rows, `failures` maps a page to the statuses it answers
+    # with before it succeeds, pages past `last` are missing ...
+    state = {"last": 5, "failures": {}, "asked": []}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params["page"])
+        state["asked"].append(page)
+        failures = state["failures"].get(page)
+        if failures:
+            return httpx.Response(failures.pop(0))
+        if page > state["last"]:
+            return httpx.Response(404)
+        return httpx.Response(200, json=[{"page": page}, {"page": page}])
+
+    monkeypatch.setattr(fetcher, "BACKOFF_BASE", 0)
+    monkeypatch.setattr(
+        http_pool,
+        "_create_client",
+        lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    http_pool._clients.clear()
+    yield state
+    http_pool._clients.clear()
+
+
+def crawl(crawler: Crawler, pages: int) -> list:
+    async def collect():
+        rows = []
+        async for chunk in crawler.fetch(pages):
+            rows += chunk
+        return rows
+
+    return asyncio.run(collect())
+
+
+def test_missing_page_ends_the_crawl(upstream):
+    crawler = Crawler("http://api/items?page=1", {}, "auto", 1000)
+    rows = crawl(crawler, 20)
+    assert len(rows) == 10
+    assert not crawler.has_more
+
+
+@pytest.mark.parametrize("status", [401, 403])
+def test_auth_errors_are_reported(upstream, status):
+    upstream["failures"] = {3: [status]}
+    crawler = Crawler("http://api/items?page=1", {}, "page", 1000)
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        crawl(crawler, 20)
+    assert error.value.response.status_code == status
+    assert crawler.has_more
+    assert fetcher.describe(error.value).startswith(f"Upstream answered {status}")
+
+
+def test_rate_limit_backs_off_and_resumes_at_the_failed_page(upstream):
+    # more 429s than the fetcher retries ...
+    upstream["failures"] = {3: [429] * (fetcher.MAX_RETRIES + 1)}
+    crawler = Crawler("http://api/items?page=1", {}, "page", 1000)
+    with pytest.raises(httpx.HTTPStatusError):
+        crawl(crawler, 20)
+    assert crawler.concurrency == 1
+    assert crawler.has_more
+
+    rows = crawl(crawler, 20)
+    assert sorted({row["page"] for row in rows}) == [3, 4, 5]
+    assert crawler.rows == 10
@@ -0,0 +1,102 @@
+import pytest
+
+from leomaine.backend.diff import diff_results
+from leomaine.backend.shape import RecordShaper
+from leomaine.backend.store import ResultSet, SessionData
+
+
+def result(records: list, compact: bool = True) -> ResultSet:
+    rows = ResultSet(RecordShaper(depth=0).rows(records))
+    if compact:
+        rows.compact()
+    return rows
+
+
+BEFORE = [
+    {"id": 1, "name": "a", "tags": ["x"], "meta": {"n": 1, "m": [1]}},
+    {"id": 2, "name": "b", "tags": ["y"], "meta": {"n": 2, "m": [2]}},
+    {"id": 3, "name": "c", "tags": ["z"], "meta": {"n": 3, "m": [3]}},
+]
+
+
+def test_keyed_diff():
+    after = [
+        {"id": 2, "name": "b", "tags": ["y"], "meta": {"m": [2], "n": 2}},
+        {"id": 3, "name": "c", "tags": ["z", "w"], "meta": {"n": 3, "m": [3]}},
+        {"id": 4, "name": "d", "tags": [], "meta": {}},
+    ]
+    diff = diff_results(result(BEFORE), result(after), "id")
+    assert diff.summary() == {
+        "before": 3,
+        "after": 3,
+        "added": 1,
+        "removed": 1,
+        "modified": 1,
+        "unchanged": 1,
+    }
+    assert (diff.added, diff.removed, diff.modified) == ([2], [0], [(2, 1)])
+    [change] = diff.changes()
+    assert change["key"] == 3
+    assert change["fields"] == {"tags": (["z"], ["z", "w"])}
+
+
+def test_keyless_diff_reads_a_change_as_removed_plus_added():
+    after = [dict(BEFORE[0]), dict(BEFORE[1], name="B"), dict(BEFORE[2])]
+    diff = diff_results(result(BEFORE), result(after))
+    assert (diff.added, diff.removed, diff.modified) == ([1], [1], [])
+    assert diff.unchanged == 2
+
+
+def test_repeated_rows_pair_in_order():
+    before = [{"v": 1}, {"v": 1}, {"v": 2}]
+    after = [{"v": 1}, {"v": 2}, {"v": 2}]
+    diff = diff_results(result(before), result(after))
+    assert (diff.added, diff.removed, diff.unchanged) == ([2], [1], 2)
+
+
+def test_packed_and_unpacked_columns_compare_equal():
+    # the same numbers on both sides, packed on one side only ...
+    before = result([{"id": i, "score": i * 0.5} for i in range(5)])
+    after = result([{"id": i, "score": i * 0.5} for i in range(5)], compact=False)
+    diff = diff_results(before, after, "id")
+    assert diff.unchanged == 5 and not diff.modified
+
+
+def test_columns_on_one_side_only():
+    diff = diff_results(result([{"id": 1}]), result([{"id": 1, "extra": None}]), "id")
+    assert diff.headers == ["id", "extra"]
+    assert diff.unchanged == 1
+    diff = diff_results(result([{"id": 1}]), result([{"id": 1, "extra": 0}]), "id")
+    assert diff.modified == [(0, 0)]
+
+
+def test_key_must_be_in_both_results():
+    with pytest.raises(ValueError, match="key column"):
+        diff_results(result([{"id": 1}]), result([{"other": 1}]), "id")
+
+
+def test_values_with_equal_hashes_or_equal_values_differ():
+    # hash(-1) == hash(-2), and 1 == 1.0 == True ...
+    before = result([{"id": 1, "balance": -1}, {"id": 2, "flag": 1}])
+    after = result([{"id": 1, "balance": -2}, {"id": 2, "flag": True}])
+    diff = diff_results(before, after, "id")
+    assert diff.modified == [(0, 0), (1, 1)] and diff.unchanged == 0
+    assert [change["fields"] for change in diff.changes()] == [
+        {"balance": (-1, -2)},
+        {"flag": (1, True)},
+    ]
+    diff = diff_results(result([{"v": 1}]), result([{"v": 1.0}]))
+    assert (diff.added, diff.removed) == ([0], [0])
+
+
+def test_previous_run_is_kept_per_request():
+    first = SessionData(result([{"v": 1}]))
+    first.request = ("GET", "/a")
+    other = SessionData(result([{"v": 2}]))
+    other.request = ("GET", "/b")
+    other.replaces(first)
+    assert other.previous_run is None
+    second = SessionData(result([{"v": 3}]))
+    second.request = ("GET", "/a")
+    second.replaces(other)
+    assert second.previous_run is first.result
@@ -0,0 +1,39 @@
+import asyncio
+import io
+
+import pytest
+
+from leomaine.backend.executor import (
+    resolve_file,
+    save_upload,
+    session_dir,
+    uploaded_files,
+)
+
+
+def upload(root, filename: str, content: bytes) -> str:
+    file = io.BytesIO(content)
+
+    async def read(size: int) -> bytes:
+        return file.read(size)
+
+    return asyncio.run(save_upload(root, filename, read))
+
+
+def test_uploads_are_kept_per_session(tmp_path):
+    mine, theirs = session_dir(tmp_path, "token-a"), session_dir(tmp_path, "token-b")
+    assert mine != theirs and mine.is_relative_to(tmp_path)
+    assert upload(mine, "data.csv", b"a,b\n1,2\n") == "data.csv"
+    assert resolve_file("@data.csv", mine).read_bytes() == b"a,b\n1,2\n"
+    assert uploaded_files(mine) == ["data.csv"] and uploaded_files(theirs) == []
+    with pytest.raises(FileNotFoundError):
+        resolve_file("@data.csv", theirs)
+    with pytest.raises(FileNotFoundError):
+        resolve_file(f"@../{mine.name}/data.csv", theirs)
+
+
+def test_uploads_are_stored_under_their_base_name(tmp_path):
+    assert upload(tmp_path, "../../etc/passwd", b"x") == "passwd"
+    assert (tmp_path / "passwd").read_bytes() == b"x"
+    with pytest.raises(ValueError):
+        upload(tmp_path, "..", b"x")
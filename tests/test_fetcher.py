@@ -0,0 +1,94 @@
+import asyncio
+
+import httpx
+import pytest
+
+from leomaine.backend import fetcher
+from leomaine.backend.fetcher import Progress, describe, fetch
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    # `answers` are returned (or raised) in turn, the last one repeats ...
+    state = {"answers": [], "calls": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        answers = state["answers"]
+        answer = answers[min(state["calls"], len(answers) - 1)]
+        state["calls"] += 1
+        if isinstance(answer, type):
+            raise answer("upstream", request=request)
+        return answer
+
+    monkeypatch.setattr(fetcher, "BACKOFF_BASE", 0)
+    state["client"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return state
+
+
+def send(upstream, method: str = "GET", **kwargs):
+    async def run():
+        reports = []
+
+        async def report(progress: Progress):
+            reports.append(progress.note)
+
+        res, body = await fetch(
+            upstream["client"], method, "http://api/x", Progress(report), **kwargs
+        )
+        return res.status_code, body, reports
+
+    return asyncio.run(run())
+
+
+def test_idempotent_requests_are_retried_until_they_succeed(upstream):
+    upstream["answers"] = [
+        httpx.Response(503),
+        httpx.ReadTimeout,
+        httpx.Response(200, content=b"ok"),
+    ]
+    status, body, reports = send(upstream)
+    assert (status, body, upstream["calls"]) == (200, b"ok", 3)
+    assert reports[0].startswith("Retry 1/3")
+    assert reports[1].endswith("(Upstream read timed out)")
+
+
+def test_retries_stop_after_max_retries(upstream):
+    upstream["answers"] = [httpx.ReadTimeout]
+    with pytest.raises(httpx.ReadTimeout) as error:
+        send(upstream)
+    assert upstream["calls"] == fetcher.MAX_RETRIES + 1
+    assert describe(error.value) == "Upstream read timed out"
+
+    upstream["calls"] = 0
+    upstream["answers"] = [httpx.Response(503)]
+    assert send(upstream)[0] == 503
+    assert upstream["calls"] == fetcher.MAX_RETRIES + 1
+
+
+def test_other_methods_are_only_retried_when_nothing_was_sent(upstream):
+    upstream["answers"] = [httpx.Response(503)]
+    assert send(upstream, "POST")[0] == 503
+    upstream["answers"] = [httpx.ReadTimeout]
+    with pytest.raises(httpx.ReadTimeout):
+        send(upstream, "POST")
+    assert upstream["calls"] == 2
+
+    upstream["answers"] = [httpx.ConnectTimeout, httpx.Response(201)]
+    upstream["calls"] = 0
+    assert send(upstream, "POST")[0] == 201
+    assert upstream["calls"] == 2
+
+
+def test_long_retry_after_and_streamed_bodies_are_not_retried(upstream):
+    wait = str(int(fetcher.BACKOFF_MAX) + 1)
+    upstream["answers"] = [httpx.Response(429, headers={"Retry-After": wait})]
+    assert send(upstream)[0] == 429
+    assert upstream["calls"] == 1
+
+    async def chunks():
+        yield b"data"
+
+    upstream["answers"] = [httpx.Response(503)]
+    upstream["calls"] = 0
+    assert send(upstream, "PUT", content=chunks())[0] == 503
+    assert upstream["calls"] == 1
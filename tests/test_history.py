@@ -0,0 +1,66 @@
+from leomaine.backend.history import RequestHistory, redact, redact_url
+
+
+SNAPSHOT = {
+    "body_mode": "JSON",
+    "headers": [
+        ["Authorization", "Bearer abc"],
+        ["X-Api-Key", "k"],
+        ["Accept", "application/json"],
+    ],
+    "body": [["name", "Ann"], ["password", "hunter2"], ["client_secret", "cs"]],
+    "cookies": [["sid", "s3cret"]],
+}
+
+
+def test_redact_blanks_credentials():
+    assert redact(SNAPSHOT) == {
+        "body_mode": "JSON",
+        "headers": [
+            ["Authorization", ""],
+            ["X-Api-Key", ""],
+            ["Accept", "application/json"],
+        ],
+        "body": [["name", "Ann"], ["password", ""], ["client_secret", ""]],
+        "cookies": [["sid", ""]],
+    }
+
+
+def test_redact_url_blanks_credential_parameters():
+    assert redact_url("http://x/a?page=2&api_key=k&access_token=t") == (
+        "http://x/a?page=2&api_key=&access_token="
+    )
+    assert redact_url("https://ann:pw@x/a?q=a%20b") == "https://ann:@x/a?q=a%20b"
+    assert redact_url("http://x/a?q=a%20b&limit=5") == "http://x/a?q=a%20b&limit=5"
+
+
+def test_requests_are_stored_redacted(tmp_path):
+    history = RequestHistory(str(tmp_path / "history.db"))
+    url = "http://x/?client_secret=cs2&page=1"
+    request_id = history.record("a", "POST", url, SNAPSHOT, 200, 1.0, b"[]")
+    entry = history.get("a", request_id)
+    assert entry["request"] == redact(SNAPSHOT)
+    assert entry["url"] == "http://x/?client_secret=&page=1"
+    stored = history.db.execute("SELECT url || request FROM requests").fetchone()[0]
+    for secret in ("abc", "s3cret", "hunter2", "cs2"):
+        assert secret not in stored
+
+
+def test_owners_only_see_their_own_history(tmp_path):
+    history = RequestHistory(str(tmp_path / "history.db"))
+    mine = history.record("a", "GET", "http://x/a", SNAPSHOT, 200, 1.0, b"[1]")
+    theirs = history.record("b", "GET", "http://x/b", SNAPSHOT, 200, 1.0, b"[2]")
+    assert [entry["id"] for entry in history.page("a")] == [mine]
+    assert history.get("a", theirs) is None
+    assert history.stats("a")["requests"] == 1
+
+    collection = history.create_collection("a", "saved")
+    assert history.create_collection("b", "saved") != collection
+    history.add_to_collection("a", collection, theirs)
+    history.add_to_collection("b", collection, theirs)
+    assert history.collection_page("a", collection) == []
+    history.add_to_collection("a", collection, mine)
+    assert [entry["id"] for entry in history.collection_page("a", collection)] == [
+        mine
+    ]
+    assert [item["name"] for item in history.collections("b")] == ["saved"]
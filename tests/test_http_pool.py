@@ -0,0 +1,43 @@
+import asyncio
+
+import httpx
+
+from leomaine.backend.http_pool import ClientPool
+
+
+def make_pool(max_hosts: int) -> ClientPool:
+    pool = ClientPool(max_hosts=max_hosts)
+    pool._create_client = lambda: httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200))
+    )
+    return pool
+
+
+def test_evicted_client_is_closed_by_its_last_user():
+    async def run():
+        pool = make_pool(max_hosts=1)
+        async with pool.client("http://a/") as first:
+            async with pool.client("http://b/"):
+                # `a` left the pool but is still in use ...
+                assert not first.is_closed
+                assert (await first.get("http://a/x")).status_code == 200
+            assert not first.is_closed
+        assert first.is_closed
+        assert pool.stats() == {"created": 2, "reused": 0, "hosts": 1}
+
+    asyncio.run(run())
+
+
+def test_idle_clients_are_closed_on_eviction_and_reuse_is_counted():
+    async def run():
+        pool = make_pool(max_hosts=1)
+        async with pool.client("http://a/") as first:
+            pass
+        async with pool.client("http://a/other") as again:
+            assert again is first
+        async with pool.client("http://b/"):
+            assert first.is_closed
+        assert pool.stats() == {"created": 2, "reused": 1, "hosts": 1}
+        await pool.aclose()
+
+    asyncio.run(run())
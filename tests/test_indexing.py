@@ -0,0 +1,68 @@
+from leomaine.backend.indexing import ResultIndex
+from leomaine.backend.shape import Subtree
+from leomaine.backend.store import ResultSet, SessionData
+
+
+ROWS = [
+    {"id": 3, "name": "banana split", "tag": None},
+    {"id": 1, "name": "Apple pie", "tag": "Fruit"},
+    {"id": None, "name": "cherry", "tag": Subtree({"kind": "stone fruit"})},
+    {"id": 2.5, "name": "apple juice", "tag": "drink"},
+]
+
+
+def test_sort_order_puts_numbers_first_text_ignoring_case_none_last():
+    index = ResultIndex(ResultSet(ROWS))
+    assert index.sort_order("id") == [1, 3, 0, 2]
+    assert index.sort_order("name") == [3, 1, 0, 2]
+    assert index.sort_order("tag") == [3, 1, 2, 0]
+    assert index.query("id", descending=True) == [2, 0, 3, 1]
+    # A permutation is built once and then reused ...
+    assert index.sort_order("id") is index.sort_order("id")
+
+
+def test_value_postings_lowercase_values_and_search_subtrees_by_content():
+    index = ResultIndex(ResultSet(ROWS))
+    assert index.value_postings("tag") == {
+        "": [0],
+        "fruit": [1],
+        '{"kind": "stone fruit"}': [2],
+        "drink": [3],
+    }
+    assert index.filter("tag", "FRUIT") == {1, 2}
+    assert index.query(filters={"tag": "fruit"}, sort_column="name") == [1, 2]
+
+
+def test_token_postings_and_prefix_search():
+    index = ResultIndex(ResultSet(ROWS))
+    tokens = index.token_postings()
+    assert tokens["apple"] == [1, 3]
+    assert tokens["fruit"] == [1, 2]
+    assert tokens["kind"] == [2]
+    assert index.search("apple") == {1, 3}
+    # The last term matches as a prefix, the earlier ones whole ...
+    assert index.search("apple ju") == {3}
+    assert index.search("app") == {1, 3}
+    assert index.search("ap pie") == set()
+    assert index.search("stone") == {2}
+
+
+def test_index_is_rebuilt_after_set_row_and_extend():
+    session = SessionData(ResultSet(ROWS))
+    index = session.index
+    assert index.search("cherry") == {2}
+    assert session.index is index
+
+    session.result.set_row(2, {"name": "plum"})
+    assert index.is_stale
+    index = session.index
+    assert index.search("cherry") == set()
+    assert index.search("plum") == {2}
+    assert index.sort_order("name") == [3, 1, 0, 2]
+
+    session.result.extend([{"id": 0, "name": "Avocado"}])
+    assert index.is_stale
+    index = session.index
+    assert index.sort_order("id") == [4, 1, 3, 0, 2]
+    assert index.value_postings("tag")[""] == [0, 4]
+    assert index.search("avo") == {4}
@@ -0,0 +1,96 @@
+import asyncio
+import re
+
+import pytest
+
+from leomaine.backend.planner import (
+    PlanCache,
+    PlanError,
+    Planner,
+    plan_key,
+    validate,
+)
+
+
+METHODS = ["GET", "POST"]
+BASE = "https://api.example.com/posts"
+
+
+@pytest.mark.parametrize(
+    "reply, message",
+    [
+        ("no plan here", "did not reply with a JSON object"),
+        ('{"method": "GET",}', "invalid JSON"),
+        ([], "must be a JSON object"),
+        ({"method": "TRACE"}, "unsupported method 'TRACE'"),
+        ({"url": "ftp://files.example.com/x"}, "not an http(s) URL"),
+        ({"url": "mailto:ann@example.com"}, "not an http(s) URL"),
+        ({"limit": "many"}, "limit must be an integer"),
+        ({"limit": 0}, "limit must be between 1 and 500"),
+        ({"limit": 501}, "limit must be between 1 and 500"),
+        ({"params": ["userId", 3]}, "params must be an object"),
+        ({"headers": "Accept: */*"}, "headers must be an object"),
+    ],
+)
+def test_invalid_plans_are_rejected(reply, message):
+    with pytest.raises(PlanError, match=re.escape(message)):
+        validate(reply, METHODS, BASE)
+
+
+def test_valid_plan_is_normalized():
+    reply = (
+        'Sure: {"method": "post", "url": "/comments", "params": {"page": 2},'
+        ' "headers": {" ": "x"}, "body": {"tags": ["a"]}, "limit": "20"}'
+    )
+    assert validate(reply, METHODS, BASE) == {
+        "method": "POST",
+        "url": "https://api.example.com/comments",
+        "params": {"page": "2"},
+        "headers": {},
+        "body": {"tags": '["a"]'},
+        "limit": 20,
+    }
+
+
+def test_plan_key_ignores_filler_and_case_but_not_the_base_url():
+    key = plan_key("Show me all posts by user 3", BASE)
+    assert plan_key("posts  by USER 3, please", BASE + " ") == key
+    assert plan_key("posts by user 4", BASE) != key
+    assert plan_key("posts by user 3", "https://other.example.com/") != key
+
+
+class Engine:
+    def __init__(self, reply: str):
+        self.reply = reply
+        self.calls = 0
+
+    async def complete(self, messages, json_output=False) -> str:
+        self.calls += 1
+        return self.reply
+
+
+def test_cached_plans_are_reused_for_the_same_intent():
+    engine = Engine('{"method": "GET", "url": "?userId=3", "limit": 20}')
+    planner = Planner(engine, PlanCache(max_plans=1))
+
+    async def plan(text: str, base_url: str = BASE):
+        return await planner.plan(text, "GET", base_url, METHODS)
+
+    first, cached = asyncio.run(plan("posts by user 3"))
+    assert (first["url"], cached) == (BASE + "?userId=3", False)
+    again, cached = asyncio.run(plan("Show all posts by user 3"))
+    assert (again, cached, engine.calls) == (first, True, 1)
+    # A copy is returned, editing it leaves the cached plan alone ...
+    again["limit"] = 5
+    assert asyncio.run(plan("posts by user 3"))[0]["limit"] == 20
+
+    assert asyncio.run(plan("posts by user 3", BASE + "/1"))[1] is False
+    # ... which pushed the first plan out of the one plan cache.
+    assert asyncio.run(plan("posts by user 3"))[1] is False
+    assert engine.calls == 3
+    assert planner.cache.stats() == {"hits": 2, "misses": 3, "plans": 1}
+
+    engine.reply = '{"method": "DELETE"}'
+    with pytest.raises(PlanError):
+        asyncio.run(plan("remove post 1"))
+    assert planner.cache.get(plan_key("remove post 1", BASE)) is None
@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+import pytest
+from reflex.state import RouterData, StateProxy
+
+from leomaine.backend import fetcher
+from leomaine.backend.history import request_history
+from leomaine.backend.http_pool import http_pool
+from leomaine.leomaine import app
+from leomaine.queries import QueryAPI
+
+
+class Namespace:
+    # Takes the deltas a background handler sends to its browser ...
+    async def emit_update(self, update, sid):
+        pass
+
+
+def upstream(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/down":
+        raise httpx.ConnectError("connection refused", request=request)
+    return httpx.Response(200, json=[{"a": 1}, {"a": 2}])
+
+
+@pytest.fixture
+def state(monkeypatch, tmp_path):
+    monkeypatch.setattr(request_history, "path", str(tmp_path / "history.db"))
+    monkeypatch.setattr(request_history, "_db", None)
+    monkeypatch.setattr(fetcher, "BACKOFF_BASE", 0)
+    monkeypatch.setattr(
+        http_pool,
+        "_create_client",
+        lambda: httpx.AsyncClient(transport=httpx.MockTransport(upstream)),
+    )
+    monkeypatch.setattr(app, "event_namespace", Namespace())
+    http_pool._clients.clear()
+    app._enable_state()
+    yield f"tok_{QueryAPI.get_full_name()}"
+    http_pool._clients.clear()
+    request_history.close()
+
+
+def run(key: str, handler: str, url: str) -> QueryAPI:
+    async def send():
+        async with app.state_manager.modify_state(key) as root:
+            root.router_data = {"token": "tok"}
+            root.router = RouterData(root.router_data)
+            query = await root.get_state(QueryAPI)
+            query.req_url = url
+        await getattr(QueryAPI, handler).fn(StateProxy(query))
+        async with app.state_manager.modify_state(key) as root:
+            return await root.get_state(QueryAPI)
+
+    return asyncio.run(send())
+
+
+@pytest.mark.parametrize("handler", ["fetch_request", "stream_request"])
+@pytest.mark.parametrize(
+    "url, error",
+    [("http://api:port/x", "Port could not be cast"), ("http://api/down", "refused")],
+)
+def test_failed_requests_always_clear_the_loading_state(state, handler, url, error):
+    query = run(state, handler, url)
+    assert not query.is_loading
+    assert error in query.request_error
+    # ... so the next request of the session goes through.
+    query = run(state, handler, "http://api/rows")
+    assert not query.is_loading
+    assert (query.request_error, query.total_rows) == ("", 2)
@@ -0,0 +1,45 @@
+from leomaine.backend.semantic_cache import SemanticCache, literals
+
+
+def test_literals_are_numbers_identifiers_and_quoted_values():
+    assert literals("How many orders has user 3?") == ("3",)
+    assert literals('Rows where user_id is 3.5 and name is "Ann".') == (
+        "user_id",
+        "3.5",
+        '"Ann"',
+    )
+    assert literals("What is the average price?") == ()
+
+
+def test_rephrased_question_hits():
+    cache = SemanticCache(threshold=0.7)
+    cache.store("How many orders does user 3 have?", "fp", "12", 1.0)
+    assert cache.lookup("how many orders does user 3 have", "fp") == "12"
+    assert cache.stats()["hits"] == 1
+
+
+def test_different_numbers_miss_each_other():
+    cache = SemanticCache(threshold=0.5)
+    cache.store("How many orders does user 3 have?", "fp", "12", 1.0)
+    cache.store("How many orders does user 10 have?", "fp", "4", 1.0)
+    assert cache.lookup("How many orders does user 7 have?", "fp") is None
+    assert cache.lookup("How many orders does user 10 have?", "fp") == "4"
+    assert cache.lookup("How many orders does user 3 have?", "fp") == "12"
+
+
+def test_other_dataset_misses():
+    cache = SemanticCache()
+    cache.store("What is the average price?", "fp", "9.5", 1.0)
+    assert cache.lookup("What is the average price?", "other") is None
+    cache.invalidate("fp")
+    assert cache.lookup("What is the average price?", "fp") is None
+    assert len(cache) == 0
+
+
+def test_grows_and_replaces_least_recently_used():
+    cache = SemanticCache(max_entries=128)
+    for i in range(200):
+        cache.store(f"value of row {i}", "fp", str(i), 0.0)
+    assert len(cache) == 128
+    assert cache.lookup("value of row 199", "fp") == "199"
+    assert cache.lookup("value of row 0", "fp") is None
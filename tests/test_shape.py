@@ -0,0 +1,85 @@
+from leomaine.backend.shape import Subtree, expand_values, flatten
+from leomaine.backend.store import ResultSet
+
+
+RECORD = {
+    "id": 1,
+    "user": {"name": "Ann", "address": {"city": "Oslo", "geo": {"lat": 59.9}}},
+    "tags": ["a", "b"],
+    "events": [{"at": 1}],
+    "empty": {},
+}
+
+
+def test_flatten_stops_at_depth():
+    nested: set[str] = set()
+    assert flatten(RECORD, 0, nested) == {
+        "id": 1,
+        "user": Subtree(RECORD["user"]),
+        "tags": ["a", "b"],
+        "events": Subtree([{"at": 1}]),
+        "empty": {},
+    }
+    assert nested == {"user"}
+
+    nested = set()
+    row = flatten(RECORD, 1, nested)
+    assert list(row) == [
+        "id",
+        "user.name",
+        "user.address",
+        "tags",
+        "events",
+        "empty",
+    ]
+    assert row["user.address"] == Subtree(RECORD["user"]["address"])
+    assert nested == {"user.address"}
+
+    nested = set()
+    row = flatten(RECORD, 8, nested)
+    assert (row["user.address.city"], row["user.address.geo.lat"]) == ("Oslo", 59.9)
+    assert nested == set()
+
+
+def test_flatten_wraps_non_objects():
+    assert flatten(5) == {"value": 5}
+    assert flatten(["a"]) == {"value": ["a"]}
+    assert flatten([[1]]) == {"value": Subtree([[1]])}
+
+
+def test_expand_values_opens_one_level():
+    values = [
+        Subtree({"name": "Ann", "address": {"city": "Oslo"}}),
+        None,
+        Subtree({"name": "Bo", "age": 40}),
+        "unknown",
+    ]
+    nested = {"user", "other"}
+    assert expand_values("user", values, nested) == {
+        "user.name": ["Ann", None, "Bo", None],
+        "user.address": [Subtree({"city": "Oslo"}), None, None, None],
+        "user.age": [None, None, 40, None],
+        "user": [None, None, None, "unknown"],
+    }
+    assert nested == {"other", "user.address"}
+
+
+def test_splice_column_renames_taken_names():
+    result = ResultSet(
+        [
+            {"id": 1, "a": Subtree({"b": 1, "c": 2}), "a.b": "x", "a.b_2": "y"},
+            {"id": 2, "a": 7, "a.b": "z", "a.b_2": "w"},
+        ]
+    )
+    children = expand_values("a", result.column("a"))
+    assert result.splice_column("a", children) == {"a.b": "a.b_3"}
+    assert result.headers == ["id", "a.b_3", "a.c", "a", "a.b", "a.b_2"]
+    assert result.rows() == [
+        {"id": 1, "a.b_3": 1, "a.c": 2, "a": None, "a.b": "x", "a.b_2": "y"},
+        {"id": 2, "a.b_3": None, "a.c": None, "a": 7, "a.b": "z", "a.b_2": "w"},
+    ]
+    assert result.column("a.b") == ["x", "z"]
+
+    plain = ResultSet([{"a": Subtree({"b": 1})}])
+    assert plain.splice_column("a", expand_values("a", plain.column("a"))) == {}
+    assert plain.headers == ["a.b"]
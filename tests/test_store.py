@@ -0,0 +1,78 @@
+from array import array
+
+from leomaine.backend.store import ResultSet
+
+
+def kinds(result: ResultSet) -> dict[str, str]:
+    # "q"/"d" for a packed column, "list" for one holding Python objects ...
+    return {
+        name: column.typecode if isinstance(column, array) else "list"
+        for name, column in zip(result.headers, result.columns)
+    }
+
+
+def test_homogeneous_numbers_are_packed():
+    result = ResultSet([{"n": 1, "x": 0.5, "s": "a", "b": True}])
+    assert kinds(result) == {"n": "q", "x": "d", "s": "list", "b": "list"}
+    assert result.column("b") == [True]
+    assert ResultSet([{"n": 2**63}]).column("n") == [2**63]
+
+
+def test_extend_widens_packed_columns_and_keeps_value_types():
+    result = ResultSet([{"n": 1}, {"n": 2}])
+    result.extend([{"n": 3}])
+    assert kinds(result) == {"n": "q"}
+
+    # An int column taking a float, then text, becomes a list, the ints are
+    # not turned into floats ...
+    result.extend([{"n": 2.5}])
+    assert kinds(result) == {"n": "list"}
+    result.extend([{"n": "x"}])
+    result.compact()
+    assert kinds(result) == {"n": "list"}
+    assert [type(value) for value in result.column("n")] == [
+        int,
+        int,
+        int,
+        float,
+        str,
+    ]
+
+    floats = ResultSet([{"x": 0.5}])
+    floats.extend([{"x": 1}, {"x": True}])
+    assert floats.column("x") == [0.5, 1, True]
+    assert [type(value) for value in floats.column("x")] == [float, int, bool]
+
+
+def test_set_row_widens_a_packed_column():
+    result = ResultSet([{"n": 1}, {"n": 2}])
+    result.set_row(0, {"n": 3})
+    assert kinds(result) == {"n": "q"}
+    result.set_row(1, {"n": 2.5})
+    assert kinds(result) == {"n": "list"}
+    result.set_row(0, {"n": "three"})
+    assert result.column("n") == ["three", 2.5]
+    assert result.version == 4
+
+
+def test_none_and_missing_values():
+    result = ResultSet([{"n": 1, "s": None}, {"n": None}])
+    assert kinds(result) == {"n": "list", "s": "list"}
+    assert result.rows() == [{"n": 1, "s": None}, {"n": None, "s": None}]
+
+    # Columns first seen later read None for the earlier rows, and rows
+    # without a column read None for it ...
+    result = ResultSet([{"n": 1}, {"n": 2}])
+    result.extend([{"t": "x"}])
+    assert result.headers == ["n", "t"]
+    assert result.rows() == [
+        {"n": 1, "t": None},
+        {"n": 2, "t": None},
+        {"n": None, "t": "x"},
+    ]
+
+    # Setting None unpacks a packed column rather than storing 0 ...
+    packed = ResultSet([{"n": 1}, {"n": 2}])
+    packed.set_row(1, {"n": None, "new": None})
+    assert packed.rows() == [{"n": 1, "new": None}, {"n": None, "new": None}]
+    assert kinds(packed) == {"n": "list", "new": "list"}
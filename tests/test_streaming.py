@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from leomaine.backend.streaming import JSONArrayStream, StreamLimitExceeded
+
+
+def feed_all(parser: JSONArrayStream, body: bytes, size: int) -> list:
+    rows = []
+    for start in range(0, len(body), size):
+        rows += parser.feed(body[start : start + size])
+    return rows + parser.close()
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1024])
+def test_array_split_across_chunks(size):
+    records = [{"id": i, "name": f"row {i}", "tags": [i, None]} for i in range(20)]
+    body = json.dumps(records).encode()
+    assert feed_all(JSONArrayStream(), body, size) == records
+
+
+def test_multibyte_characters_split_across_chunks():
+    records = [{"name": "Zoë ☃ 日本"}, {"name": "𝄞"}]
+    body = json.dumps(records, ensure_ascii=False).encode()
+    assert feed_all(JSONArrayStream(), body, 1) == records
+
+
+def test_number_at_chunk_end_waits_for_the_rest():
+    parser = JSONArrayStream()
+    assert parser.feed(b"[12") == []
+    assert parser.feed(b"34, 5]") == [1234, 5]
+    assert parser.close() == []
+
+
+def test_non_array_root_is_decoded_on_close():
+    parser = JSONArrayStream()
+    assert parser.feed(b' {"data": [1, 2]}') == []
+    assert parser.is_array is False
+    assert parser.close() == [{"data": [1, 2]}]
+
+
+def test_empty_body_closes_to_no_rows():
+    parser = JSONArrayStream()
+    assert parser.feed(b"  ") == []
+    assert parser.close() == []
+
+
+def test_max_rows_truncates():
+    parser = JSONArrayStream(max_rows=3)
+    rows = parser.feed(json.dumps(list(range(10))).encode())
+    assert rows == [0, 1, 2]
+    assert parser.done and parser.truncated
+
+
+def test_max_bytes_stops_an_array_with_the_rows_read():
+    parser = JSONArrayStream(max_bytes=8)
+    assert parser.feed(b"[1, 2, ") == [1, 2]
+    assert parser.feed(b"3, 4, 5]") == []
+    assert parser.truncated
+
+
+def test_max_bytes_on_other_roots_is_a_value_error():
+    parser = JSONArrayStream(max_bytes=8)
+    with pytest.raises(ValueError):
+        parser.feed(b'{"data": [1, 2, 3]}')
+    assert issubclass(StreamLimitExceeded, ValueError)
+
+
+def test_unterminated_array_raises():
+    parser = JSONArrayStream()
+    parser.feed(b"[1, 2")
+    with pytest.raises(json.JSONDecodeError):
+        parser.close()
@@ -0,0 +1,67 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from leomaine.backend.store import ResultSet
+from leomaine.backend.transfer import (
+    ARROW_AVAILABLE,
+    Importer,
+    export_chunks,
+    import_format,
+)
+
+
+def read_all(path: Path) -> list:
+    async def collect():
+        records = []
+        async for chunk in Importer(path, import_format(path)).read():
+            records += chunk
+        return records
+
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("name", ["empty.json", "empty.ndjson", "empty.csv"])
+def test_empty_files_have_no_records(tmp_path, name):
+    path = tmp_path / name
+    path.write_bytes(b"")
+    assert read_all(path) == []
+
+
+def test_json_envelope_is_unwrapped(tmp_path):
+    path = tmp_path / "wrapped.json"
+    path.write_text('{"meta": {"page": 1}, "data": [{"id": 1}, {"id": 2}]}')
+    assert read_all(path) == [{"id": 1}, {"id": 2}]
+
+
+def export_bytes(records: list, fmt: str) -> bytes:
+    return b"".join(export_chunks(ResultSet(records), None, fmt))
+
+
+def test_csv_round_trip_keeps_text_that_looks_numeric(tmp_path):
+    records = [
+        {"id": 1, "zip": "007", "score": 1.5, "ok": True},
+        {"id": 2, "zip": "1_000", "score": None, "ok": False},
+        {"id": 3, "zip": "12", "score": 2.0, "ok": None},
+    ]
+    path = tmp_path / "rows.csv"
+    path.write_bytes(export_bytes(records, "csv"))
+    assert read_all(path) == records
+
+
+def test_csv_numeric_columns_are_read_as_numbers(tmp_path):
+    path = tmp_path / "rows.csv"
+    path.write_text("id,price,code\n1,2.5,01\n2,,10\n")
+    assert read_all(path) == [
+        {"id": 1, "price": 2.5, "code": "01"},
+        {"id": 2, "price": None, "code": "10"},
+    ]
+
+
+@pytest.mark.skipif(ARROW_AVAILABLE, reason="pyarrow is installed")
+def test_arrow_formats_explain_the_missing_extra(tmp_path):
+    with pytest.raises(ValueError, match="pyarrow"):
+        import_format(tmp_path / "rows.parquet")
+    with pytest.raises(ValueError, match="pyarrow"):
+        export_chunks(ResultSet([{"id": 1}]), None, "parquet")